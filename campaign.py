@@ -0,0 +1,72 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class CampaignRun(db.Model):
+    __tablename__ = 'campaign_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_type = db.Column(db.String(20), nullable=False)  # 'outreach', 'follow_up'
+    config = db.Column(db.Text)  # JSON string with campaign configuration
+    config_hash = db.Column(db.String(64), index=True)
+    lead_ids = db.Column(db.Text)  # JSON list, snapshot of leads selected at start
+    status = db.Column(db.String(20), default='running')  # 'running', 'completed'
+    total_leads = db.Column(db.Integer, default=0)
+    processed_leads = db.Column(db.Integer, default=0)  # checkpoint: leads already processed
+    sent_count = db.Column(db.Integer, default=0)
+    failed_count = db.Column(db.Integer, default=0)
+    skipped_count = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    sends = db.relationship('CampaignSend', backref='run', lazy='dynamic')
+
+    def get_config(self):
+        return json.loads(self.config) if self.config else {}
+
+    def set_config(self, config_dict):
+        self.config = json.dumps(config_dict, sort_keys=True)
+
+    def get_lead_ids(self):
+        return json.loads(self.lead_ids) if self.lead_ids else []
+
+    def set_lead_ids(self, lead_ids):
+        self.lead_ids = json.dumps(lead_ids)
+
+    def to_dict(self):
+        end = self.finished_at or self.updated_at or datetime.utcnow()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0
+
+        return {
+            'id': self.id,
+            'campaign_type': self.campaign_type,
+            'config': self.get_config(),
+            'status': self.status,
+            'total_leads': self.total_leads,
+            'processed_leads': self.processed_leads,
+            'remaining_leads': max((self.total_leads or 0) - (self.processed_leads or 0), 0),
+            'sent': self.sent_count,
+            'failed': self.failed_count,
+            'skipped': self.skipped_count,
+            'throughput_per_second': round(self.sent_count / elapsed, 2) if elapsed > 0 else None,
+            'last_error': self.last_error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class CampaignSend(db.Model):
+    __tablename__ = 'campaign_sends'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('campaign_runs.id'), nullable=False, index=True)
+    lead_id = db.Column(db.Integer, nullable=False)
+    channel = db.Column(db.String(20), nullable=False)  # 'email', 'linkedin', 'instagram'
+    step = db.Column(db.String(20), nullable=False)  # 'initial', 'follow_up'
+    idempotency_key = db.Column(db.String(120), unique=True, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'queued', 'sent', 'failed', 'unknown'
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
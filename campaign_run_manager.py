@@ -0,0 +1,188 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from src.models.campaign import db, CampaignRun, CampaignSend
+
+# Chaves de configuração que não alteram a seleção de leads da campanha
+NON_IDENTIFYING_CONFIG_KEYS = ('run_id', 'write_batch_size', 'deferred')
+
+class CampaignRunManager:
+    """Persiste execuções de campanha, checkpoints e chaves de idempotência"""
+
+    @staticmethod
+    def _config_hash(campaign_type: str, config: Dict) -> str:
+        identifying = {k: v for k, v in config.items() if k not in NON_IDENTIFYING_CONFIG_KEYS}
+        payload = json.dumps({'type': campaign_type, 'config': identifying}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def idempotency_key(run: CampaignRun, lead_id: int, channel: str, step: str) -> str:
+        return f"{run.campaign_type}:{run.id}:{lead_id}:{channel}:{step}"
+
+    def start_or_resume(self, campaign_type: str, config: Dict,
+                        load_lead_ids: Callable[[], List[int]], run_id: Optional[int] = None) -> CampaignRun:
+        """
+        Retoma uma execução existente ou cria uma nova
+
+        Args:
+            campaign_type: Tipo da campanha ('outreach', 'follow_up')
+            config: Configuração da campanha
+            load_lead_ids: Função que seleciona os leads de uma nova execução
+            run_id: ID de execução a retomar (opcional)
+
+        Returns:
+            CampaignRun em andamento
+        """
+
+        if run_id:
+            run = CampaignRun.query.get(run_id)
+            if not run or run.campaign_type != campaign_type:
+                raise ValueError('Execução de campanha não encontrada')
+            if run.status == 'completed':
+                return run
+        else:
+            # Uma execução interrompida com a mesma configuração é retomada automaticamente
+            run = CampaignRun.query.filter_by(
+                campaign_type=campaign_type,
+                config_hash=self._config_hash(campaign_type, config),
+                status='running'
+            ).order_by(CampaignRun.started_at.desc()).first()
+
+        if run:
+            run.status = 'running'
+            run.finished_at = None
+            self._mark_uncertain_sends(run)
+            db.session.commit()
+            return run
+
+        lead_ids = load_lead_ids()
+
+        run = CampaignRun(
+            campaign_type=campaign_type,
+            config_hash=self._config_hash(campaign_type, config),
+            total_leads=len(lead_ids)
+        )
+        run.set_config({k: v for k, v in config.items() if k != 'run_id'})
+        run.set_lead_ids(lead_ids)
+
+        db.session.add(run)
+        db.session.commit()
+
+        return run
+
+    def _mark_uncertain_sends(self, run: CampaignRun):
+        """
+        Envios reivindicados mas não concluídos antes de uma queda podem ter sido
+        entregues. Eles são marcados como 'unknown' e nunca reenviados.
+        """
+
+        CampaignSend.query.filter_by(run_id=run.id, status='pending').update(
+            {'status': 'unknown', 'completed_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+
+    def claim_sends(self, run: CampaignRun, planned: List[Tuple[int, str, str]]) -> Dict[str, CampaignSend]:
+        """
+        Reivindica envios de um bloco antes de executá-los
+
+        Args:
+            run: Execução da campanha
+            planned: Lista de (lead_id, channel, step)
+
+        Returns:
+            Dict idempotency_key -> CampaignSend apenas para envios ainda não feitos
+            (IntegrityError se a gravação falhar sem que outro processo tenha reivindicado as chaves)
+        """
+
+        if not planned:
+            return {}
+
+        keyed = {self.idempotency_key(run, lead_id, channel, step): (lead_id, channel, step)
+                 for lead_id, channel, step in planned}
+
+        # Cada conflito significa que outro processo reivindicou parte do bloco:
+        # repete com o que sobrou enquanto houver progresso
+        known = -1
+        conflict = None
+        while True:
+            existing = {
+                key for (key,) in db.session.query(CampaignSend.idempotency_key).filter(
+                    CampaignSend.idempotency_key.in_(list(keyed.keys()))
+                )
+            }
+            if len(existing) == known:
+                # Conflito sem chave nova reivindicada: não é concorrência, e pular o
+                # bloco deixaria os leads sem envio; o erro mantém a execução retomável aqui
+                raise conflict
+
+            known = len(existing)
+            claimed = {}
+            for key, (lead_id, channel, step) in keyed.items():
+                if key in existing:
+                    continue
+                claimed[key] = CampaignSend(
+                    run_id=run.id,
+                    lead_id=lead_id,
+                    channel=channel,
+                    step=step,
+                    idempotency_key=key
+                )
+
+            if not claimed:
+                return claimed
+
+            db.session.add_all(claimed.values())
+
+            try:
+                db.session.commit()
+                return claimed
+            except IntegrityError as e:
+                db.session.rollback()
+                conflict = e
+
+    def complete_send(self, run: CampaignRun, send: CampaignSend, result: Dict):
+        """Registra o resultado de um envio (gravado junto com o próximo checkpoint)"""
+
+        send.completed_at = datetime.utcnow()
+
+        if result.get('success'):
+            # Enfileirado no outbox (entrega adiada ou limite do canal): o worker entrega
+            send.status = 'queued' if result.get('queued') else 'sent'
+            run.sent_count = (run.sent_count or 0) + 1
+        else:
+            send.status = 'failed'
+            send.error_message = result.get('error')
+            run.failed_count = (run.failed_count or 0) + 1
+
+    def record_skipped(self, run: CampaignRun, count: int):
+        if count:
+            run.skipped_count = (run.skipped_count or 0) + count
+
+    def checkpoint(self, run: CampaignRun, processed_leads: int):
+        """Grava o progresso da execução"""
+
+        run.processed_leads = processed_leads
+        run.updated_at = datetime.utcnow()
+        db.session.commit()
+
+    def finish(self, run: CampaignRun, error: Optional[str] = None):
+        """Finaliza a execução, ou a deixa retomável se parou antes do fim"""
+
+        if error:
+            run.last_error = error
+
+        if run.processed_leads >= run.total_leads:
+            run.status = 'completed'
+            run.finished_at = datetime.utcnow()
+
+        db.session.commit()
+
+    def get_run_progress(self, run_id: int) -> Optional[Dict]:
+        run = CampaignRun.query.get(run_id)
+        return run.to_dict() if run else None
+
+    def list_runs(self, limit: int = 20) -> List[Dict]:
+        runs = CampaignRun.query.order_by(CampaignRun.started_at.desc()).limit(limit).all()
+        return [run.to_dict() for run in runs]
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Simulador de vazão de campanhas de outreach
+
+Executa OutreachManager contra um banco SQLite semeado, com backends de canal
+falsos (latência, taxa de erro e limite de envio configuráveis), e reporta
+leads/s, tempo de banco versus tempo de envio e latências de cauda.
+
+Uso:
+    python -m src.services.campaign_simulator --leads 50000 --profile realistic
+    python -m src.services.campaign_simulator --leads 2000 --min-leads-per-second 500  # regressão no CI
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+from flask import Flask
+from sqlalchemy import event
+from src.models.user import db
+from src.models.lead import Lead
+from src.services.channel_backends import ChannelBackend, register_channel_backend
+from src.services.outreach_manager import OutreachManager
+from src.services.template_manager import TemplateManager
+
+# Perfis de canal: latência média (ms), dispersão lognormal, taxa de erro e envios/s (None = sem limite)
+CHANNEL_PROFILES = {
+    'fast': {
+        'email': {'latency_ms': 5, 'jitter': 0.3, 'error_rate': 0.0, 'rate_limit': None},
+        'linkedin': {'latency_ms': 10, 'jitter': 0.3, 'error_rate': 0.0, 'rate_limit': None},
+        'instagram': {'latency_ms': 10, 'jitter': 0.3, 'error_rate': 0.0, 'rate_limit': None}
+    },
+    'realistic': {
+        'email': {'latency_ms': 80, 'jitter': 0.5, 'error_rate': 0.01, 'rate_limit': 50},
+        'linkedin': {'latency_ms': 400, 'jitter': 0.7, 'error_rate': 0.03, 'rate_limit': 2},
+        'instagram': {'latency_ms': 300, 'jitter': 0.7, 'error_rate': 0.03, 'rate_limit': 3}
+    },
+    'degraded': {
+        'email': {'latency_ms': 400, 'jitter': 1.0, 'error_rate': 0.1, 'rate_limit': 20},
+        'linkedin': {'latency_ms': 1500, 'jitter': 1.0, 'error_rate': 0.2, 'rate_limit': 1},
+        'instagram': {'latency_ms': 1200, 'jitter': 1.0, 'error_rate': 0.2, 'rate_limit': 1}
+    }
+}
+
+SECTORS = ['Indústria', 'Comércio', 'Serviços', 'Construção', 'Tecnologia', 'Outros']
+COMPANY_SIZES = ['Micro', 'Pequena', 'Média']
+
+def _percentile(sorted_values: List[float], percentile: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class FakeChannelBackend(ChannelBackend):
+    """Backend em processo que simula latência, erros e limite de envio de um canal"""
+
+    def __init__(self, name: str, latency_ms: float, jitter: float = 0.5, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, time_scale: float = 1.0, seed: int = 0):
+        """
+        Args:
+            name: Nome do canal
+            latency_ms: Latência mediana por envio
+            jitter: Sigma da distribuição lognormal da latência
+            error_rate: Fração de envios que falham
+            rate_limit: Envios por segundo permitidos (None = sem limite)
+            time_scale: Fator aplicado às esperas reais (0.01 = 100x mais rápido)
+            seed: Semente do gerador aleatório
+        """
+
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.time_scale = time_scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0  # tempo modelado (s) do próximo envio permitido
+        self._modeled_clock = 0.0
+        self.latencies_ms: List[float] = []
+        self.throttled_seconds = 0.0
+        self.errors = 0
+
+    def send(self, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        with self._lock:
+            latency = self.latency_ms * self._random.lognormvariate(0, self.jitter) if self.jitter else self.latency_ms
+            failed = self._random.random() < self.error_rate
+
+            # Espaçamento imposto pelo limite de envio do canal (token bucket de 1 ficha)
+            wait = 0.0
+            if self.rate_limit:
+                wait = max(0.0, self._next_slot - self._modeled_clock)
+                self._next_slot = max(self._next_slot, self._modeled_clock) + 1.0 / self.rate_limit
+
+            self._modeled_clock += wait + latency / 1000
+            self.throttled_seconds += wait
+            self.latencies_ms.append(latency + wait * 1000)
+            if failed:
+                self.errors += 1
+
+        if self.time_scale:
+            time.sleep((wait + latency / 1000) * self.time_scale)
+
+        if failed:
+            return {'success': False, 'error': f'Erro simulado no canal {self.name}'}
+
+        return {'success': True, 'message': f'Envio simulado ({self.name})', 'message_id': dedupe_key}
+
+    def report(self) -> Dict:
+        latencies = sorted(self.latencies_ms)
+        return {
+            'sends': len(latencies),
+            'errors': self.errors,
+            'modeled_send_seconds': round(sum(latencies) / 1000, 3),
+            'throttled_seconds': round(self.throttled_seconds, 3),
+            'p50_ms': round(_percentile(latencies, 50), 2) if latencies else None,
+            'p95_ms': round(_percentile(latencies, 95), 2) if latencies else None,
+            'p99_ms': round(_percentile(latencies, 99), 2) if latencies else None,
+            'max_ms': round(latencies[-1], 2) if latencies else None
+        }
+
+class DatabaseTimer:
+    """Acumula tempo e número de comandos SQL executados em um engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.seconds = 0.0
+        self.statements = 0
+        self._starts = threading.local()
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self._starts.value = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.seconds += time.perf_counter() - self._starts.value
+        self.statements += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before)
+        event.listen(self.engine, 'after_cursor_execute', self._after)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, 'before_cursor_execute', self._before)
+        event.remove(self.engine, 'after_cursor_execute', self._after)
+        return False
+
+def create_simulation_app(database_path: str) -> Flask:
+    """App Flask isolado apontando para um banco SQLite descartável"""
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def seed_leads(count: int, seed: int = 0):
+    """Semeia leads sintéticos com contatos em todos os canais"""
+
+    rng = random.Random(seed)
+    rows = []
+
+    for index in range(count):
+        rows.append({
+            'company_name': f'Empresa Simulada {index} Ltda',
+            'cnpj': f'{index:014d}',
+            'sector': rng.choice(SECTORS),
+            'company_size': rng.choice(COMPANY_SIZES),
+            'contact_name': f'Contato {index}',
+            'email': f'contato{index}@empresa{index}.com.br',
+            'linkedin_profile': f'https://www.linkedin.com/in/contato{index}',
+            'instagram_profile': f'https://www.instagram.com/empresa{index}',
+            'source': 'simulation',
+            'status': 'new',
+            'score': rng.randint(50, 100)
+        })
+
+        if len(rows) >= 5000:
+            db.session.bulk_insert_mappings(Lead, rows)
+            rows = []
+
+    if rows:
+        db.session.bulk_insert_mappings(Lead, rows)
+
+    db.session.commit()
+
+def run_simulation(leads: int = 1000, channels: Optional[List[str]] = None, profile: str = 'fast',
+                   time_scale: float = 1.0, seed: int = 42, write_batch_size: int = 200,
+                   database_path: Optional[str] = None) -> Dict:
+    """
+    Executa uma campanha simulada e retorna o relatório de desempenho
+
+    Args:
+        leads: Número de leads semeados e contatados
+        channels: Canais da campanha (padrão: ['email'])
+        profile: Perfil de canal de CHANNEL_PROFILES
+        time_scale: Fator das esperas reais; o relatório projeta o tempo com espera real
+        seed: Semente para dados e backends
+        write_batch_size: Tamanho do lote de gravação de interações
+        database_path: Arquivo SQLite (temporário por padrão)
+    """
+
+    channels = channels or ['email']
+    temporary = database_path is None
+    if temporary:
+        handle, database_path = tempfile.mkstemp(suffix='.db', prefix='campaign_sim_')
+        os.close(handle)
+
+    app = create_simulation_app(database_path)
+    backends = {
+        channel: FakeChannelBackend(channel, time_scale=time_scale, seed=seed + offset, **CHANNEL_PROFILES[profile][channel])
+        for offset, channel in enumerate(['email', 'linkedin', 'instagram'])
+    }
+    previous_backends = {channel: register_channel_backend(channel, backend) for channel, backend in backends.items()}
+
+    try:
+        with app.app_context():
+            db.create_all()
+            TemplateManager.initialize_default_templates()
+            seed_leads(leads, seed)
+
+            manager = OutreachManager(deferred_delivery=False)
+
+            with DatabaseTimer(db.engine) as db_timer:
+                start = time.perf_counter()
+                result = manager.run_outreach_campaign({
+                    'min_score': 0,
+                    'max_leads': leads,
+                    'channels': channels,
+                    'write_batch_size': write_batch_size
+                })
+                wall_seconds = time.perf_counter() - start
+
+        if not result['success']:
+            return {'success': False, 'error': result['error']}
+
+        channel_reports = {channel: backends[channel].report() for channel in channels}
+        modeled_send = sum(report['modeled_send_seconds'] for report in channel_reports.values())
+        scaled_send = modeled_send * time_scale
+        other_seconds = max(wall_seconds - db_timer.seconds - scaled_send, 0.0)
+        projected_seconds = db_timer.seconds + modeled_send + other_seconds
+        campaign = result['campaign_results']
+
+        return {
+            'success': True,
+            'leads': leads,
+            'channels': channels,
+            'profile': profile,
+            'time_scale': time_scale,
+            'sends': sum(report['sends'] for report in channel_reports.values()),
+            'send_errors': len(campaign['errors']),
+            'measured_wall_seconds': round(wall_seconds, 3),
+            'db_seconds': round(db_timer.seconds, 3),
+            'db_statements': db_timer.statements,
+            'modeled_send_seconds': round(modeled_send, 3),
+            'other_seconds': round(other_seconds, 3),
+            'projected_wall_seconds': round(projected_seconds, 3),
+            'projected_leads_per_second': round(leads / projected_seconds, 2) if projected_seconds else None,
+            'measured_leads_per_second': round(leads / wall_seconds, 2) if wall_seconds else None,
+            'interaction_writes': campaign['interaction_writes'],
+            'channels_report': channel_reports
+        }
+    finally:
+        for channel, backend in previous_backends.items():
+            register_channel_backend(channel, backend)
+        if temporary and os.path.exists(database_path):
+            os.remove(database_path)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Simulador de vazão de campanhas de outreach')
+    parser.add_argument('--leads', type=int, default=1000)
+    parser.add_argument('--channels', default='email', help='Lista separada por vírgula: email,linkedin,instagram')
+    parser.add_argument('--profile', choices=sorted(CHANNEL_PROFILES), default='fast')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='Fator das esperas reais (0 = não dorme; o relatório projeta a espera real)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--write-batch-size', type=int, default=200)
+    parser.add_argument('--min-leads-per-second', type=float,
+                        help='Falha (código 1) se a vazão projetada ficar abaixo deste valor')
+    args = parser.parse_args(argv)
+
+    report = run_simulation(
+        leads=args.leads,
+        channels=[channel.strip() for channel in args.channels.split(',') if channel.strip()],
+        profile=args.profile,
+        time_scale=args.time_scale,
+        seed=args.seed,
+        write_batch_size=args.write_batch_size
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if not report['success']:
+        return 1
+
+    if args.min_leads_per_second and report['projected_leads_per_second'] < args.min_leads_per_second:
+        print(f"❌ Regressão: {report['projected_leads_per_second']} leads/s < {args.min_leads_per_second}")
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+from datetime import datetime
+from typing import Dict, Optional
+from src.services.smtp_backend import build_message, get_default_pool
+from src.services.rate_limiter import reserve_send
+
+class ChannelBackend:
+    """Entrega uma mensagem em um canal. Implementações retornam Dict com 'success'."""
+
+    name = 'base'
+
+    def send(self, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        raise NotImplementedError
+
+class EmailBackend(ChannelBackend):
+    """E-mail pelo pool SMTP configurado (SMTP_*) ou envio simulado"""
+
+    name = 'email'
+
+    def send(self, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        pool = get_default_pool()
+        lead_id = payload.get('lead_id')
+
+        if pool:
+            message = build_message(
+                from_addr=os.environ.get('SMTP_FROM_EMAIL', 'contato@jusfiscal.com.br'),
+                to_addr=payload['to_email'],
+                subject=payload['subject'],
+                body=payload['content'],
+                lead_id=lead_id,
+                html_body=payload.get('html_content')
+            )
+            if dedupe_key:
+                # Reentregas do outbox repetem o cabeçalho, permitindo deduplicação no destino
+                message['X-Dedupe-Key'] = dedupe_key
+
+            result = pool.send_message(message)
+
+            if result['success']:
+                return {
+                    'success': True,
+                    'message': 'E-mail enviado com sucesso',
+                    'email_id': result['message_id']
+                }
+            if result.get('unknown'):
+                # Conexão caiu depois do MAIL FROM: o outbox não reenvia
+                return {'success': False, 'error': f"Erro ao enviar e-mail: {result['error']}", 'retryable': False, 'unknown': True}
+            return {'success': False, 'error': f"Erro ao enviar e-mail: {result['error']}"}
+
+        # Aqui você integraria com serviços como SendGrid, Mailchimp, etc.
+        # Sem SMTP configurado, simula o envio
+        print(f"📧 E-mail enviado para {payload['to_email']}")
+        print(f"Assunto: {payload['subject']}")
+        print(f"Lead ID: {lead_id}")
+
+        return {
+            'success': True,
+            'message': 'E-mail enviado com sucesso (simulado)',
+            'email_id': f'email_{lead_id}_{datetime.now().timestamp()}'
+        }
+
+class LinkedInMessageBackend(ChannelBackend):
+    """Mensagem LinkedIn (simulado - integrar com API)"""
+
+    name = 'linkedin'
+
+    def send(self, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        lead_id = payload.get('lead_id')
+
+        limited = reserve_send('linkedin', payload.get('account') or os.environ.get('LINKEDIN_ACCOUNT_ID'))
+        if limited:
+            return limited
+
+        print(f"💼 Mensagem LinkedIn enviada para {payload['profile_url']}")
+        print(f"Lead ID: {lead_id}")
+
+        return {
+            'success': True,
+            'message': 'Mensagem LinkedIn enviada com sucesso (simulado)',
+            'message_id': f'linkedin_{lead_id}_{datetime.now().timestamp()}'
+        }
+
+class InstagramDMBackend(ChannelBackend):
+    """DM Instagram (simulado - integrar com API)"""
+
+    name = 'instagram'
+
+    def send(self, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        lead_id = payload.get('lead_id')
+
+        limited = reserve_send('instagram', payload.get('account') or os.environ.get('INSTAGRAM_ACCOUNT_ID'))
+        if limited:
+            return limited
+
+        print(f"📱 DM Instagram enviado para {payload['profile_url']}")
+        print(f"Lead ID: {lead_id}")
+
+        return {
+            'success': True,
+            'message': 'DM Instagram enviado com sucesso (simulado)',
+            'message_id': f'instagram_{lead_id}_{datetime.now().timestamp()}'
+        }
+
+class PublicationBackend(ChannelBackend):
+    """Publicação de conteúdo em um PublicationChannel"""
+
+    name = 'publication'
+
+    def send(self, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        from src.models.content import GeneratedContent
+        from src.services.channel_registry import channel_registry
+        from src.services.publication_manager import PublicationManager
+
+        content = GeneratedContent.query.get(payload['content_id'])
+        channel = channel_registry.get(payload['channel_id'])
+
+        if not content or not channel:
+            return {'success': False, 'error': 'Conteúdo ou canal não encontrado', 'retryable': False}
+
+        return PublicationManager()._dispatch(content, channel)
+
+_backends: Dict[str, ChannelBackend] = {
+    'email': EmailBackend(),
+    'linkedin': LinkedInMessageBackend(),
+    'instagram': InstagramDMBackend(),
+    'publication': PublicationBackend()
+}
+
+def get_channel_backend(channel: str) -> ChannelBackend:
+    """Retorna o backend registrado para o canal"""
+
+    if channel not in _backends:
+        raise ValueError(f'Canal sem backend de entrega: {channel}')
+    return _backends[channel]
+
+def register_channel_backend(channel: str, backend: ChannelBackend) -> ChannelBackend:
+    """Substitui o backend de um canal e retorna o anterior"""
+
+    previous = _backends.get(channel)
+    _backends[channel] = backend
+    return previous
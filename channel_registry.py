@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from sqlalchemy import event
+from src.models.publication import db, PublicationChannel
+from src.services.instagram_manager import InstagramManager
+
+class ChannelEntry:
+    """
+    Canal de publicação em cache: configuração decodificada e cliente prontos
+
+    Usado no lugar de PublicationChannel pelo PublicationManager (mesmos
+    atributos id, name, channel_type, is_active e get_api_config()). A
+    configuração é compartilhada entre threads: trate-a como somente leitura.
+    """
+
+    def __init__(self, channel: PublicationChannel):
+        self.id = channel.id
+        self.name = channel.name
+        self.channel_type = channel.channel_type
+        self.is_active = channel.is_active
+        self.config_version = channel.config_version
+        self._config = channel.get_api_config()
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def get_api_config(self) -> Dict:
+        return self._config
+
+    def client(self):
+        """Cliente da API do canal, criado uma vez por versão da configuração (None se o tipo não tem cliente)"""
+
+        if self._client is None and self.channel_type == 'instagram':
+            with self._client_lock:
+                if self._client is None:
+                    self._client = InstagramManager(self._config.get('access_token'), self._config.get('page_id'))
+        return self._client
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'channel_type': self.channel_type,
+            'is_active': self.is_active,
+            'config_version': self.config_version
+        }
+
+class ChannelRegistry:
+    """
+    Cache em processo dos canais de publicação
+
+    Cada canal é lido e tem o api_config decodificado uma vez; publicações
+    seguintes reutilizam a entrada. Alterações feitas neste processo
+    invalidam a entrada na hora (evento do mapper); alterações de outros
+    processos são detectadas pelo config_version, conferido para todos os
+    canais em cache com uma consulta a cada revalidate_seconds.
+    """
+
+    def __init__(self, revalidate_seconds: float = 5.0):
+        """
+        Args:
+            revalidate_seconds: Intervalo entre conferências de config_version no banco
+        """
+
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: Dict[int, ChannelEntry] = {}
+        self._lock = threading.Lock()
+        self._last_validation = time.monotonic()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'configs_parsed': 0,
+            'invalidations': 0,
+            'revalidations': 0
+        }
+
+    def get(self, channel_id: int) -> Optional[ChannelEntry]:
+        """Canal em cache (lido do banco na primeira vez); None se não existir"""
+
+        return self.get_many([channel_id]).get(channel_id)
+
+    def get_many(self, channel_ids: Iterable[int]) -> Dict[int, ChannelEntry]:
+        """Canais em cache por ID; os ausentes do cache são lidos em uma única consulta"""
+
+        self._revalidate_if_due()
+
+        found: Dict[int, ChannelEntry] = {}
+        missing = []
+        with self._lock:
+            for channel_id in dict.fromkeys(channel_ids):
+                entry = self._entries.get(channel_id)
+                if entry is None:
+                    missing.append(channel_id)
+                else:
+                    found[channel_id] = entry
+            self.stats['hits'] += len(found)
+            self.stats['misses'] += len(missing)
+
+        if missing:
+            loaded = [ChannelEntry(channel) for channel in PublicationChannel.query.filter(PublicationChannel.id.in_(missing))]
+            with self._lock:
+                for entry in loaded:
+                    # Outra thread pode ter carregado o mesmo canal: fica a entrada já em cache
+                    found[entry.id] = self._entries.setdefault(entry.id, entry)
+                self.stats['configs_parsed'] += len(loaded)
+
+        return found
+
+    def invalidate(self, channel_id: Optional[int] = None):
+        """Remove um canal (ou todos) do cache"""
+
+        with self._lock:
+            if channel_id is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                removed = 1 if self._entries.pop(channel_id, None) else 0
+            self.stats['invalidations'] += removed
+
+    def _revalidate_if_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_validation < self.revalidate_seconds or not self._entries:
+                return
+            # Só uma thread confere; as demais seguem com o cache atual
+            self._last_validation = now
+            cached = {channel_id: entry.config_version for channel_id, entry in self._entries.items()}
+
+        try:
+            versions = dict(
+                db.session.query(PublicationChannel.id, PublicationChannel.config_version).filter(
+                    PublicationChannel.id.in_(list(cached))
+                )
+            )
+        except Exception as e:
+            print(f"Erro ao revalidar o cache de canais: {e}")
+            return
+
+        with self._lock:
+            self.stats['revalidations'] += 1
+            for channel_id, version in cached.items():
+                entry = self._entries.get(channel_id)
+                if entry is not None and entry.config_version == version and versions.get(channel_id) != version:
+                    del self._entries[channel_id]
+                    self.stats['invalidations'] += 1
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            return dict(
+                self.stats,
+                revalidate_seconds=self.revalidate_seconds,
+                channels=[entry.to_dict() for entry in self._entries.values()]
+            )
+
+channel_registry = ChannelRegistry(
+    revalidate_seconds=float(os.environ.get('CHANNEL_REGISTRY_REVALIDATE_SECONDS', 5))
+)
+
+@event.listens_for(PublicationChannel, 'after_update')
+@event.listens_for(PublicationChannel, 'after_delete')
+def _publication_channel_changed(mapper, connection, target):
+    channel_registry.invalidate(target.id)
@@ -0,0 +1,107 @@
+import threading
+import time
+from typing import Dict, Hashable, Optional
+
+class CircuitBreaker:
+    """
+    Circuit breaker por chave (ex.: ID do canal de publicação)
+
+    Após failure_threshold falhas transitórias seguidas o circuito abre e as
+    chamadas ao canal são suspensas por cooldown segundos (dobrando a cada
+    reabertura, até max_cooldown). Passado o cooldown, uma única chamada de
+    teste é liberada (meio-aberto): sucesso fecha o circuito, falha reabre.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 60.0, max_cooldown: float = 900.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._states: Dict[Hashable, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, key: Hashable) -> Dict:
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = {
+                'status': 'closed',
+                'failures': 0,
+                'opened_until': 0.0,
+                'cooldown': self.cooldown,
+                'probe_in_flight': False,
+                'times_opened': 0,
+                'last_error': None
+            }
+        return state
+
+    def allow(self, key: Hashable) -> Optional[float]:
+        """Retorna None se a chamada pode seguir, ou os segundos até o circuito aceitar um teste"""
+
+        with self._lock:
+            state = self._state(key)
+
+            if state['status'] == 'closed':
+                return None
+
+            remaining = state['opened_until'] - time.monotonic()
+            if remaining > 0:
+                return remaining
+
+            # Meio-aberto: só uma chamada de teste por vez
+            if state['probe_in_flight']:
+                return state['cooldown']
+
+            state['status'] = 'half_open'
+            state['probe_in_flight'] = True
+            return None
+
+    def record_success(self, key: Hashable):
+        with self._lock:
+            state = self._state(key)
+            state.update(status='closed', failures=0, probe_in_flight=False, cooldown=self.cooldown)
+
+    def record_failure(self, key: Hashable, error: Optional[str] = None):
+        """Registra uma falha transitória (erros permanentes não indicam canal fora do ar)"""
+
+        with self._lock:
+            state = self._state(key)
+            state['failures'] += 1
+            state['last_error'] = error
+
+            if state['status'] == 'half_open':
+                # Teste falhou: reabre com cooldown maior
+                state['cooldown'] = min(state['cooldown'] * 2, self.max_cooldown)
+                self._open(state)
+            elif state['status'] == 'closed' and state['failures'] >= self.failure_threshold:
+                self._open(state)
+
+    def release(self, key: Hashable):
+        """Libera a chamada de teste sem resultado conclusivo (ex.: erro permanente)"""
+
+        with self._lock:
+            state = self._state(key)
+            if state['status'] == 'half_open':
+                state['probe_in_flight'] = False
+                state['opened_until'] = 0.0
+
+    @staticmethod
+    def _open(state: Dict):
+        state['status'] = 'open'
+        state['opened_until'] = time.monotonic() + state['cooldown']
+        state['probe_in_flight'] = False
+        state['times_opened'] += 1
+
+    def get_status(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                str(key): {
+                    'status': state['status'],
+                    'failures': state['failures'],
+                    'retry_in': round(max(0.0, state['opened_until'] - now), 1) if state['status'] == 'open' else 0,
+                    'times_opened': state['times_opened'],
+                    'last_error': state['last_error']
+                }
+                for key, state in self._states.items()
+            }
+
+publication_breaker = CircuitBreaker()
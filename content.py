@@ -1,7 +1,14 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from src.models.content import db, ContentTemplate, GeneratedContent, ContentTopic
+from src.models.publication import PublicationChannel
 from src.services.content_generator import ContentGenerator
+from src.services.publication_manager import PublicationManager
+from src.services import publication_stats, variant_renderer
+from src.services.wordpress_taxonomy import wordpress_taxonomy
+from src.services.instagram_sync import get_instagram_analytics, instagram_sync
+from src.services.due_scheduler import due_scheduler
+from src.models.scheduled_job import ScheduledJob
 import json
 import sys
 import os
@@ -133,6 +140,109 @@ def update_content_status(content_id):
     
     return jsonify({'message': 'Status atualizado com sucesso'})
 
+@content_bp.route('/content/<int:content_id>/variants', methods=['GET'])
+def preview_content_variants(content_id):
+    """Retorna o texto do conteúdo renderizado para cada canal"""
+    content = GeneratedContent.query.get_or_404(content_id)
+    return jsonify({
+        'content_id': content.id,
+        'variants': variant_renderer.get_variants(content)
+    })
+
+@content_bp.route('/content/<int:content_id>/publish', methods=['POST'])
+def publish_content_to_channels(content_id):
+    """Publica o conteúdo em vários canais simultaneamente"""
+    data = request.get_json() or {}
+    channel_ids = data.get('channel_ids') or []
+    
+    if not channel_ids:
+        return jsonify({'error': 'channel_ids é obrigatório'}), 400
+    
+    try:
+        result = PublicationManager().publish_to_channels(content_id, channel_ids)
+        
+        if 'results' not in result:
+            return jsonify(result), 404
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@content_bp.route('/channels/<int:channel_id>/wordpress-terms/refresh', methods=['POST'])
+def refresh_wordpress_terms(channel_id):
+    """Aquece ou atualiza o cache de tags e categorias do site WordPress do canal"""
+    channel = PublicationChannel.query.get_or_404(channel_id)
+    
+    if channel.channel_type != 'wordpress':
+        return jsonify({'error': 'Canal não é WordPress'}), 400
+    
+    data = request.get_json(silent=True) or {}
+    result = wordpress_taxonomy.refresh(channel.get_api_config(), full=bool(data.get('full')))
+    result['cache'] = wordpress_taxonomy.get_status()
+    
+    return jsonify(result), (200 if result['success'] else 502)
+
+@content_bp.route('/channels/<int:channel_id>/wordpress-batch', methods=['POST'])
+def publish_wordpress_batch(channel_id):
+    """Publica vários conteúdos no site WordPress do canal usando a API de lote"""
+    data = request.get_json() or {}
+    content_ids = data.get('content_ids') or []
+    
+    if not content_ids:
+        return jsonify({'error': 'content_ids é obrigatório'}), 400
+    
+    try:
+        result = PublicationManager().publish_wordpress_batch(content_ids, channel_id)
+        
+        if 'results' not in result:
+            return jsonify(result), 400
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@content_bp.route('/publication-stats', methods=['GET'])
+def get_publication_stats():
+    """Estatísticas de publicação da janela e série diária para dashboards"""
+    days = request.args.get('days', 30, type=int)
+    channel_id = request.args.get('channel_id', type=int)
+    
+    stats = publication_stats.get_window_stats(days, channel_id)
+    stats['series'] = publication_stats.get_daily_series(days, channel_id)
+    stats['period_days'] = days
+    
+    return jsonify(stats)
+
+@content_bp.route('/instagram/sync', methods=['POST'])
+def sync_instagram():
+    """Sincroniza mídias e métricas do Instagram agora ou agenda a sincronização periódica"""
+    data = request.get_json(silent=True) or {}
+    payload = {key: data[key] for key in ('channel_id', 'interval_seconds') if key in data}
+    
+    if data.get('schedule'):
+        pending = ScheduledJob.query.filter_by(job_type='instagram_sync', status='pending').first()
+        if pending:
+            return jsonify({'success': True, 'job': pending.to_dict(), 'message': 'Sincronização já agendada'})
+        
+        result = due_scheduler.schedule_job('instagram_sync', payload)
+        return jsonify(result), (201 if result['success'] else 400)
+    
+    if payload.get('channel_id'):
+        channel = PublicationChannel.query.get_or_404(payload['channel_id'])
+        return jsonify(instagram_sync.sync_channel(channel))
+    
+    return jsonify(instagram_sync.sync_all())
+
+@content_bp.route('/instagram/analytics', methods=['GET'])
+def instagram_analytics():
+    """Engajamento dos posts do Instagram (dados sincronizados, sem chamar a Graph API)"""
+    days = request.args.get('days', 30, type=int)
+    channel_id = request.args.get('channel_id', type=int)
+    
+    return jsonify(get_instagram_analytics(channel_id, days))
+
 @content_bp.route('/topics', methods=['GET'])
 def get_topics():
     """Retorna todos os tópicos de conteúdo"""
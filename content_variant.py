@@ -0,0 +1,32 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class ContentVariant(db.Model):
+    __tablename__ = 'content_variants'
+    __table_args__ = (
+        db.UniqueConstraint('content_id', 'channel_type', name='uq_content_variants_content_channel'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_id = db.Column(db.Integer, db.ForeignKey('generated_content.id'), nullable=False, index=True)
+    channel_type = db.Column(db.String(50), nullable=False)  # 'linkedin', 'instagram', 'wordpress', 'email'
+    content_hash = db.Column(db.String(64), nullable=False)  # hash de título/texto/keywords + versão do renderizador
+    payload = db.Column(db.Text)  # JSON string with the rendered fields
+    rendered_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def set_payload(self, payload_dict):
+        self.payload = json.dumps(payload_dict)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content_id': self.content_id,
+            'channel_type': self.channel_type,
+            'content_hash': self.content_hash,
+            'payload': self.get_payload(),
+            'rendered_at': self.rendered_at.isoformat() if self.rendered_at else None
+        }
@@ -0,0 +1,511 @@
+import heapq
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import and_, func, or_
+from src.models.scheduled_job import db, ScheduledJob
+from src.models.publication import ScheduledPublication
+
+PUBLICATION = 'publication'
+JOB = 'job'
+
+def _timestamp(value: datetime) -> float:
+    # Datas do banco são UTC ingênuas
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+def _utc_from_timestamp(value: float) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(seconds=value)
+
+def generate_content_job(payload: Dict) -> Dict:
+    """Gera e salva conteúdo (mesmo fluxo de POST /api/content/generate)"""
+
+    from src.models.content import GeneratedContent
+    from src.services.content_generator import ContentGenerator
+
+    content = ContentGenerator().generate_content(
+        content_type=payload['content_type'],
+        topic=payload['topic'],
+        target_sector=payload.get('target_sector'),
+        template_id=payload.get('template_id')
+    )
+
+    generated_content = GeneratedContent(
+        title=content['title'],
+        content=content['content'],
+        content_type=payload['content_type'],
+        target_sector=payload.get('target_sector'),
+        template_id=payload.get('template_id')
+    )
+    if 'keywords' in content:
+        generated_content.set_keywords(content['keywords'])
+
+    db.session.add(generated_content)
+    db.session.commit()
+
+    return {'content_id': generated_content.id, 'title': generated_content.title}
+
+def instagram_sync_job(payload: Dict) -> Dict:
+    """Sincroniza mídias e métricas do Instagram e agenda a próxima execução (mesmo se esta falhar)"""
+
+    from src.models.publication import PublicationChannel
+    from src.services.instagram_sync import SYNC_INTERVAL, instagram_sync
+
+    try:
+        channel_id = payload.get('channel_id')
+        if channel_id:
+            channel = PublicationChannel.query.get(channel_id)
+            result = instagram_sync.sync_channel(channel) if channel else {'success': False, 'error': 'Canal não encontrado'}
+        else:
+            result = instagram_sync.sync_all()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        interval = payload.get('interval_seconds', SYNC_INTERVAL)
+        # Um job reexecutado após lease vencido não abre uma segunda cadeia de execuções
+        already_scheduled = ScheduledJob.query.filter_by(
+            job_type='instagram_sync', status='pending', payload=json.dumps(payload)
+        ).first()
+        if interval and not already_scheduled:
+            due_scheduler.schedule_job('instagram_sync', payload, datetime.utcnow() + timedelta(seconds=interval))
+
+    return result
+
+class DueScheduler:
+    """
+    Agendador em processo baseado em um min-heap de horários
+
+    A thread dorme exatamente até o próximo item vencer (Condition.wait com
+    timeout) e é acordada antes se algo mais cedo for agendado via notify().
+    Publicações vencidas disparam process_scheduled_publications (que
+    reivindica atomicamente todas as vencidas); jobs de scheduled_jobs são
+    reivindicados um a um e executados pelo handler do tipo.
+
+    O heap é montado do banco na partida e completado periodicamente com os
+    itens que vencem nos próximos resync_interval segundos. Itens gravados
+    por outros processos (workers web, seguidores) antecipam esse resync: a
+    cada wake_poll_interval o líder lê o maior ID de scheduled_jobs e de
+    scheduled_publications (só o índice da chave primária) e, se mudou,
+    sincroniza na hora.
+
+    Jobs em execução têm lease, renovado enquanto o handler roda; um job
+    'running' cujo lease venceu (processo caiu) volta a ser reivindicado,
+    até max_job_attempts tentativas.
+    """
+
+    def __init__(self, max_workers: int = 4, resync_interval: float = 30.0,
+                 job_lease_seconds: float = 300.0, max_job_attempts: int = 3,
+                 wake_poll_interval: float = 1.0):
+        """
+        Args:
+            max_workers: Threads que executam publicações e jobs
+            resync_interval: Intervalo (segundos) entre leituras incrementais do banco
+            wake_poll_interval: Intervalo (segundos) entre conferências de itens novos gravados por outros processos
+            job_lease_seconds: Validade da reivindicação de um job sem renovação
+            max_job_attempts: Execuções de um job antes de marcá-lo como falho
+        """
+
+        self.max_workers = max_workers
+        self.resync_interval = resync_interval
+        self.job_lease_seconds = job_lease_seconds
+        self.max_job_attempts = max_job_attempts
+        self.wake_poll_interval = wake_poll_interval
+        self._heap = []
+        self._due: Dict[Tuple[str, int], float] = {}  # entrada válida de cada item (remoção preguiçosa)
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._app = None
+        self._handlers: Dict[str, Callable[[Dict], Dict]] = {
+            'content_generation': generate_content_job,
+            'instagram_sync': instagram_sync_job
+        }
+        self._publications_requested = threading.Event()
+        self._publications_lock = threading.Lock()
+        self._lags = deque(maxlen=1000)
+        self._last_resync = 0.0
+        self._last_wake_check = 0.0
+        self._item_ids: Optional[Tuple] = None  # maiores IDs vistos no último resync
+        self.stats = {
+            'fired': 0,
+            'publication_runs': 0,
+            'jobs_run': 0,
+            'jobs_failed': 0,
+            'resyncs': 0,
+            'early_resyncs': 0,
+            'max_lag_seconds': 0.0,
+            'last_error': None
+        }
+
+    def register_handler(self, job_type: str, handler: Callable[[Dict], Dict]):
+        """Registra a função que executa jobs do tipo (recebe o payload, retorna Dict)"""
+
+        self._handlers[job_type] = handler
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        """Monta o heap a partir do banco e inicia a thread do agendador"""
+
+        if self.running:
+            return
+
+        self._app = app
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='due-scheduler')
+
+        with app.app_context():
+            self.rebuild()
+
+        self._thread = threading.Thread(target=self._run, name='due-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def notify(self, kind: str, item_id: int, due_at: datetime):
+        """
+        Insere/atualiza um item no heap; acorda a thread se ele vence antes do atual primeiro
+
+        Só tem efeito no processo líder. Itens gravados em outros processos
+        (workers web, seguidores) chegam ao heap do líder pela conferência de
+        IDs novos, em até wake_poll_interval segundos.
+        """
+
+        # Processos sem o agendador ativo (ex.: workers web) não mantêm heap
+        if not self.running or due_at is None:
+            return
+
+        due = _timestamp(due_at)
+        with self._condition:
+            key = (kind, item_id)
+            if self._due.get(key) == due:
+                return
+            self._due[key] = due
+            heapq.heappush(self._heap, (due, kind, item_id))
+            if self._heap[0][0] == due:
+                self._condition.notify()
+
+    def schedule_job(self, job_type: str, payload: Dict, due_at: Optional[datetime] = None) -> Dict:
+        """
+        Grava um job em scheduled_jobs e o coloca no heap
+
+        Args:
+            job_type: Tipo com handler registrado (ex.: 'content_generation')
+            payload: Argumentos do handler
+            due_at: Horário de execução (UTC; padrão: agora)
+
+        Returns:
+            Dict com resultado do agendamento
+        """
+
+        if job_type not in self._handlers:
+            return {'success': False, 'error': f'Tipo de job desconhecido: {job_type}'}
+
+        try:
+            job = ScheduledJob(job_type=job_type, due_at=due_at or datetime.utcnow())
+            job.set_payload(payload)
+            db.session.add(job)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+
+        self.notify(JOB, job.id, job.due_at)
+
+        return {
+            'success': True,
+            'job_id': job.id,
+            'due_at': job.due_at.isoformat(),
+            'message': 'Job agendado com sucesso'
+        }
+
+    def rebuild(self):
+        """Recria o heap com todos os itens pendentes (só IDs e horários)"""
+
+        # Lidos antes dos itens: o que for gravado no meio é visto na próxima conferência
+        self._item_ids = self._max_item_ids()
+        entries = []
+        for kind, item_id, due_at in self._load_pending():
+            entries.append((_timestamp(due_at), kind, item_id))
+
+        heapq.heapify(entries)
+        with self._condition:
+            self._heap = entries
+            self._due = {(kind, item_id): due for due, kind, item_id in entries}
+            self._condition.notify()
+
+        self._last_resync = time.monotonic()
+        self.stats['resyncs'] += 1
+
+    def resync(self):
+        """Acrescenta itens que vencem até o próximo resync (agendados por outros processos)"""
+
+        self._item_ids = self._max_item_ids()
+        horizon = datetime.utcnow() + timedelta(seconds=self.resync_interval * 2)
+        for kind, item_id, due_at in self._load_pending(horizon):
+            self.notify(kind, item_id, due_at)
+
+        self._last_resync = time.monotonic()
+        self.stats['resyncs'] += 1
+
+    @staticmethod
+    def _max_item_ids() -> Tuple:
+        return (
+            db.session.query(func.max(ScheduledJob.id)).scalar(),
+            db.session.query(func.max(ScheduledPublication.id)).scalar()
+        )
+
+    def _check_new_items(self):
+        """Resync antecipado se outro processo gravou jobs ou publicações desde o último"""
+
+        self._last_wake_check = time.monotonic()
+        try:
+            with self._app.app_context():
+                item_ids = self._max_item_ids()
+                db.session.rollback()
+                if item_ids != self._item_ids:
+                    self.resync()
+                    self.stats['early_resyncs'] += 1
+        except Exception as e:
+            self.stats['last_error'] = str(e)
+            print(f"Erro ao conferir itens novos do agendador: {e}")
+
+    @staticmethod
+    def _load_pending(until: Optional[datetime] = None):
+        publication_due = [
+            and_(ScheduledPublication.status == 'scheduled', ScheduledPublication.next_attempt_at.isnot(None)),
+            # Reivindicações cujo processo caiu voltam a valer quando o lease expira
+            and_(ScheduledPublication.status == 'processing', ScheduledPublication.lease_expires_at.isnot(None))
+        ]
+        publications = db.session.query(
+            ScheduledPublication.id, ScheduledPublication.status,
+            ScheduledPublication.next_attempt_at, ScheduledPublication.lease_expires_at
+        ).filter(or_(*publication_due))
+
+        jobs = db.session.query(
+            ScheduledJob.id, ScheduledJob.status, ScheduledJob.due_at, ScheduledJob.lease_expires_at
+        ).filter(or_(
+            ScheduledJob.status == 'pending',
+            and_(ScheduledJob.status == 'running', ScheduledJob.lease_expires_at.isnot(None))
+        ))
+
+        if until is not None:
+            publications = publications.filter(or_(
+                ScheduledPublication.next_attempt_at <= until,
+                ScheduledPublication.lease_expires_at <= until
+            ))
+            jobs = jobs.filter(or_(
+                and_(ScheduledJob.status == 'pending', ScheduledJob.due_at <= until),
+                ScheduledJob.lease_expires_at <= until
+            ))
+
+        for pub_id, status, next_attempt_at, lease_expires_at in publications:
+            yield PUBLICATION, pub_id, next_attempt_at if status == 'scheduled' else lease_expires_at
+
+        for job_id, status, due_at, lease_expires_at in jobs:
+            yield JOB, job_id, due_at if status == 'pending' else lease_expires_at
+
+        db.session.rollback()
+
+    def _run(self):
+        while not self._stop.is_set():
+            due_items = []
+
+            with self._condition:
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    due, kind, item_id = heapq.heappop(self._heap)
+                    if self._due.get((kind, item_id)) != due:
+                        continue  # entrada substituída por um notify mais recente
+                    del self._due[(kind, item_id)]
+                    due_items.append((due, kind, item_id))
+
+                if not due_items:
+                    until_resync = self.resync_interval - (time.monotonic() - self._last_resync)
+                    until_wake_check = self.wake_poll_interval - (time.monotonic() - self._last_wake_check)
+                    timeout = min(until_resync, until_wake_check)
+                    if self._heap:
+                        timeout = min(timeout, self._heap[0][0] - now)
+                    if timeout > 0:
+                        self._condition.wait(timeout)
+
+            if due_items:
+                self._fire(due_items)
+            elif time.monotonic() - self._last_resync >= self.resync_interval:
+                try:
+                    with self._app.app_context():
+                        self.resync()
+                except Exception as e:
+                    self.stats['last_error'] = str(e)
+                    print(f"Erro ao sincronizar o agendador: {e}")
+                    self._last_resync = time.monotonic()
+            elif time.monotonic() - self._last_wake_check >= self.wake_poll_interval:
+                self._check_new_items()
+
+    def _fire(self, due_items):
+        now = time.time()
+        publications_due = False
+
+        for due, kind, item_id in due_items:
+            lag = max(0.0, now - due)
+            self._lags.append(lag)
+            self.stats['max_lag_seconds'] = max(self.stats['max_lag_seconds'], round(lag, 3))
+            self.stats['fired'] += 1
+
+            if kind == PUBLICATION:
+                publications_due = True
+            else:
+                self._executor.submit(self._run_job, item_id)
+
+        # Uma execução reivindica todas as publicações vencidas de uma vez
+        if publications_due:
+            self._trigger_publications()
+
+    def _trigger_publications(self):
+        self._publications_requested.set()
+        if self._publications_lock.acquire(blocking=False):
+            self._executor.submit(self._drain_publications)
+
+    def _drain_publications(self):
+        from src.services.publication_manager import PublicationManager
+
+        try:
+            with self._app.app_context():
+                while self._publications_requested.is_set():
+                    self._publications_requested.clear()
+                    try:
+                        PublicationManager().process_scheduled_publications()
+                        self.stats['publication_runs'] += 1
+                    except Exception as e:
+                        db.session.rollback()
+                        self.stats['last_error'] = str(e)
+                        print(f"Erro ao processar publicações agendadas: {e}")
+        finally:
+            self._publications_lock.release()
+            # Pedido feito entre a última verificação e a liberação do lock
+            if self._publications_requested.is_set() and not self._stop.is_set():
+                self._trigger_publications()
+
+    def _run_job(self, job_id: int):
+        with self._app.app_context():
+            now = datetime.utcnow()
+            # Lease vencido: o processo que rodava o job caiu sem gravar o resultado
+            expired = and_(ScheduledJob.status == 'running', ScheduledJob.lease_expires_at < now)
+
+            ScheduledJob.query.filter(
+                ScheduledJob.id == job_id, expired, ScheduledJob.attempts >= self.max_job_attempts
+            ).update({
+                'status': 'failed',
+                'last_error': 'Lease expirado sem resultado gravado',
+                'claimed_by': None,
+                'lease_expires_at': None,
+                'finished_at': now
+            }, synchronize_session=False)
+
+            # Reivindicação atômica: outro processo pode ter levado o job
+            claim_token = uuid.uuid4().hex
+            claimed = ScheduledJob.query.filter(
+                ScheduledJob.id == job_id,
+                or_(ScheduledJob.status == 'pending', expired)
+            ).update({
+                'status': 'running',
+                'started_at': now,
+                'claimed_by': claim_token,
+                'lease_expires_at': now + timedelta(seconds=self.job_lease_seconds),
+                'attempts': ScheduledJob.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if not claimed:
+                return
+
+            # O token identifica esta execução: só ela renova o lease e grava o resultado
+            finished = threading.Event()
+            renewer = threading.Thread(target=self._renew_job_lease, args=(job_id, claim_token, finished),
+                                       name=f'job-lease-{job_id}', daemon=True)
+            renewer.start()
+
+            job = ScheduledJob.query.get(job_id)
+            try:
+                result = self._handlers[job.job_type](job.get_payload())
+                values = {'status': 'done', 'result': json.dumps(result or {}, default=str)}
+                self.stats['jobs_run'] += 1
+            except Exception as e:
+                db.session.rollback()
+                values = {'status': 'failed', 'last_error': str(e)}
+                self.stats['jobs_failed'] += 1
+                print(f"Erro no job agendado {job_id}: {e}")
+            finally:
+                finished.set()
+                renewer.join()
+
+            values.update(finished_at=datetime.utcnow(), claimed_by=None, lease_expires_at=None)
+            owned = ScheduledJob.query.filter_by(id=job_id, status='running', claimed_by=claim_token).update(
+                values, synchronize_session=False)
+            db.session.commit()
+            if not owned:
+                print(f"Lease do job agendado {job_id} expirou antes da gravação do resultado")
+
+    def _renew_job_lease(self, job_id: int, claim_token: str, finished: threading.Event):
+        with self._app.app_context():
+            while not finished.wait(self.job_lease_seconds / 3):
+                try:
+                    ScheduledJob.query.filter_by(id=job_id, status='running', claimed_by=claim_token).update({
+                        'lease_expires_at': datetime.utcnow() + timedelta(seconds=self.job_lease_seconds)
+                    }, synchronize_session=False)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Erro ao renovar o lease do job agendado {job_id}: {e}")
+
+    @staticmethod
+    def get_backlog() -> Dict:
+        """Itens vencidos e não executados, lidos do banco (vale em qualquer processo)"""
+
+        now = datetime.utcnow()
+        overdue_publications, oldest_publication = db.session.query(
+            db.func.count(ScheduledPublication.id), db.func.min(ScheduledPublication.next_attempt_at)
+        ).filter(ScheduledPublication.status == 'scheduled', ScheduledPublication.next_attempt_at <= now).one()
+        overdue_jobs, oldest_job = db.session.query(
+            db.func.count(ScheduledJob.id), db.func.min(ScheduledJob.due_at)
+        ).filter(ScheduledJob.status == 'pending', ScheduledJob.due_at <= now).one()
+
+        oldest = min([value for value in (oldest_publication, oldest_job) if value], default=None)
+        return {
+            'overdue_publications': overdue_publications,
+            'overdue_jobs': overdue_jobs,
+            'oldest_overdue_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0
+        }
+
+    def get_status(self) -> Dict:
+        with self._condition:
+            pending = len(self._due)
+            next_due = self._heap[0][0] if self._heap else None
+
+        lags = sorted(self._lags)
+        return dict(
+            self.stats,
+            running=self.running,
+            pending=pending,
+            next_due_at=_utc_from_timestamp(next_due).isoformat() if next_due else None,
+            lag_p50_seconds=round(lags[len(lags) // 2], 3) if lags else None,
+            lag_p95_seconds=round(lags[min(len(lags) - 1, int(len(lags) * 0.95))], 3) if lags else None
+        )
+
+due_scheduler = DueScheduler()
@@ -0,0 +1,212 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# Timeouts padrão (conexão, leitura) em segundos; chamadas podem sobrescrever com timeout=
+DEFAULT_TIMEOUT = (
+    float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5)),
+    float(os.environ.get('HTTP_READ_TIMEOUT', 30))
+)
+
+# Só métodos idempotentes são repetidos após resposta ou erro de leitura; um POST
+# repetido pode duplicar um post publicado ou uma mídia criada
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+LATENCY_SAMPLES = 500  # amostras por host usadas nos percentis
+
+class HTTPClient:
+    """
+    Cliente HTTP de saída compartilhado pelas integrações (LinkedIn, Instagram, WordPress, CNPJ)
+
+    Mantém uma Session com pool de conexões por host (reaproveita TCP/TLS entre
+    chamadas), aplica timeouts padrão, repete chamadas idempotentes com backoff
+    exponencial com jitter e coleta latência e status por host.
+    """
+
+    def __init__(self, pool_size: int = 10, max_retries: int = 2, backoff: float = 0.5,
+                 max_backoff: float = 10.0, timeout: Optional[Tuple[float, float]] = None):
+        """
+        Args:
+            pool_size: Conexões mantidas por host
+            max_retries: Novas tentativas após a primeira (só métodos idempotentes)
+            backoff: Espera base (segundos) da primeira nova tentativa
+            max_backoff: Espera máxima; Retry-After acima disso não é aguardado
+            timeout: (conexão, leitura) padrão
+        """
+
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout or DEFAULT_TIMEOUT
+        self._sessions: Dict[str, requests.Session] = {}
+        self._metrics: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, host: str) -> requests.Session:
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    # Retentativas ficam a cargo de request(); o adapter só cuida do pool
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._sessions[host] = session
+        return session
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Executa a requisição pelo pool do host
+
+        Args:
+            method: Método HTTP
+            url: URL completa
+            retries: Sobrescreve max_retries para esta chamada
+            **kwargs: Repassados para requests (params, data, json, headers, auth, timeout...)
+
+        Returns:
+            Resposta da última tentativa; exceções de rede são propagadas após esgotar as tentativas
+        """
+
+        method = method.upper()
+        host = urlsplit(url).netloc.lower()
+        session = self._session_for(host)
+        kwargs.setdefault('timeout', self.timeout)
+
+        max_retries = self.max_retries if retries is None else retries
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+
+        while True:
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                self._record(host, time.monotonic() - started, error=type(e).__name__)
+                # Falha ao conectar não chegou a enviar nada: é seguro repetir qualquer método
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt >= max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+            else:
+                self._record(host, time.monotonic() - started, status=response.status_code)
+                if not idempotent or response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                elif delay > self.max_backoff:
+                    # O servidor pediu uma pausa longa; devolve a resposta para o chamador decidir
+                    return response
+                response.close()
+
+            attempt += 1
+            with self._lock:
+                self._metrics[host]['retries'] += 1
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter: espera aleatória entre 0 e o teto exponencial
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _record(self, host: str, elapsed: float, status: Optional[int] = None, error: Optional[str] = None):
+        with self._lock:
+            metrics = self._metrics.get(host)
+            if metrics is None:
+                metrics = self._metrics[host] = {
+                    'requests': 0,
+                    'errors': 0,
+                    'retries': 0,
+                    'statuses': {},
+                    'error_types': {},
+                    'total_seconds': 0.0,
+                    'latencies': deque(maxlen=LATENCY_SAMPLES),
+                    'last_status': None,
+                    'last_error': None
+                }
+
+            metrics['requests'] += 1
+            metrics['total_seconds'] += elapsed
+            metrics['latencies'].append(elapsed)
+            if status is not None:
+                key = str(status)
+                metrics['statuses'][key] = metrics['statuses'].get(key, 0) + 1
+                metrics['last_status'] = status
+            if error is not None:
+                metrics['errors'] += 1
+                metrics['error_types'][error] = metrics['error_types'].get(error, 0) + 1
+                metrics['last_error'] = error
+
+    def get_metrics(self) -> Dict:
+        """Latência (média, p50, p95, máx em ms) e contagem de status/erros por host"""
+
+        with self._lock:
+            snapshot = {host: dict(metrics, latencies=sorted(metrics['latencies']),
+                                   statuses=dict(metrics['statuses']), error_types=dict(metrics['error_types']))
+                        for host, metrics in self._metrics.items()}
+
+        result = {}
+        for host, metrics in snapshot.items():
+            latencies = metrics.pop('latencies')
+            total = metrics.pop('total_seconds')
+
+            def percentile(p):
+                if not latencies:
+                    return None
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+            metrics['latency_ms'] = {
+                'avg': round(total / metrics['requests'] * 1000, 1) if metrics['requests'] else None,
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'max': round(latencies[-1] * 1000, 1) if latencies else None
+            }
+            result[host] = metrics
+
+        return result
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics.clear()
+
+http_client = HTTPClient(
+    pool_size=int(os.environ.get('HTTP_POOL_SIZE', 10)),
+    max_retries=int(os.environ.get('HTTP_MAX_RETRIES', 2))
+)
@@ -1,16 +1,61 @@
-import requests
 import json
-from typing import Dict, List, Optional
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from datetime import datetime, timezone
+from src.services.http_client import http_client
+from src.services.rate_limiter import channel_keys, get_rate_limiter, reserve_send
+
+# Limite da Graph API para itens de um carousel
+CAROUSEL_MAX_ITEMS = 10
+# Containers de itens criados em paralelo (mantém a conta longe do limite de chamadas por hora)
+CAROUSEL_MAX_WORKERS = 4
+
+# Consulta do status_code dos containers: 1s, 2s, 4s, 8s, 8s... até CONTAINER_TIMEOUT
+CONTAINER_POLL_INITIAL_DELAY = 1.0
+CONTAINER_POLL_MAX_DELAY = 8.0
+CONTAINER_TIMEOUT = 120.0
+
+class InstagramRateLimited(Exception):
+    """Chamada à Graph API barrada pelo balde da conta; result é o Dict de reserve_send"""
+    
+    def __init__(self, result: Dict):
+        super().__init__(result['error'])
+        self.result = result
 
 class InstagramManager:
-    """Gerencia publicações no Instagram via Instagram Basic Display API e Graph API"""
+    """
+    Gerencia publicações no Instagram via Instagram Basic Display API e Graph API
+    
+    Toda chamada à Graph API consome uma ficha dos baldes 'instagram' da conta
+    (page_id) e devolve a resposta ao limitador, que ajusta o ritmo pelos
+    cabeçalhos X-App-Usage / X-Business-Use-Case-Usage.
+    """
     
-    def __init__(self, access_token: str = None, page_id: str = None):
+    def __init__(self, access_token: str = None, page_id: str = None, rate_limit_wait: Optional[float] = None):
+        """
+        Args:
+            access_token: Token da Graph API
+            page_id: ID da conta do Instagram
+            rate_limit_wait: Espera máxima por uma ficha (padrão: RATE_LIMIT_MAX_WAIT)
+        """
+        
         self.access_token = access_token
         self.page_id = page_id
+        self.rate_limit_wait = rate_limit_wait
         self.base_url = "https://graph.facebook.com/v18.0"
     
+    def _graph_request(self, method: str, url: str, **kwargs):
+        """Chamada à Graph API dentro do limite da conta; levanta InstagramRateLimited se não houver ficha"""
+        
+        limited = reserve_send('instagram', self.page_id, max_wait=self.rate_limit_wait)
+        if limited:
+            raise InstagramRateLimited(limited)
+        
+        response = http_client.request(method, url, **kwargs)
+        get_rate_limiter().record_response(channel_keys('instagram', self.page_id), response.status_code, response.headers)
+        return response
+    
     def publish_post(self, content: str, image_url: str = None, hashtags: List[str] = None) -> Dict:
         """
         Publica um post no Instagram
@@ -40,13 +85,17 @@ class InstagramManager:
             else:
                 # Publica post apenas com texto (story ou carousel)
                 return self._publish_text_post(caption)
-                
+        
+        except InstagramRateLimited as e:
+            return dict(e.result)
         except Exception as e:
             return {'success': False, 'error': f'Erro ao publicar no Instagram: {str(e)}'}
     
     def _publish_image_post(self, caption: str, image_url: str) -> Dict:
         """Publica post com imagem"""
         
+        started = time.monotonic()
+        
         # Primeiro, cria o container de mídia
         media_data = {
             'image_url': image_url,
@@ -54,42 +103,28 @@ class InstagramManager:
             'access_token': self.access_token
         }
         
-        media_response = requests.post(
-            f"{self.base_url}/{self.page_id}/media",
-            data=media_data
-        )
-        
-        if media_response.status_code != 200:
+        container = self._create_container(media_data)
+        if not container['success']:
             return {
                 'success': False,
-                'error': f'Erro ao criar mídia: {media_response.text}'
+                'error': f"Erro ao criar mídia: {container['error']}"
             }
         
-        media_id = media_response.json().get('id')
+        # Imagens grandes levam alguns segundos para serem processadas pelo Instagram
+        ready = self._wait_for_container(container['id'])
+        if not ready['success']:
+            return {'success': False, 'error': f"Erro ao processar mídia: {ready['error']}"}
         
         # Depois, publica o post
-        publish_data = {
-            'creation_id': media_id,
-            'access_token': self.access_token
+        publish_started = time.monotonic()
+        result = self._publish_container(container['id'])
+        result['timings'] = {
+            'container': round(container['seconds'] + ready['seconds'], 3),
+            'publish': round(time.monotonic() - publish_started, 3),
+            'total': round(time.monotonic() - started, 3)
         }
         
-        publish_response = requests.post(
-            f"{self.base_url}/{self.page_id}/media_publish",
-            data=publish_data
-        )
-        
-        if publish_response.status_code == 200:
-            post_id = publish_response.json().get('id')
-            return {
-                'success': True,
-                'post_id': post_id,
-                'url': f"https://www.instagram.com/p/{post_id}/"
-            }
-        else:
-            return {
-                'success': False,
-                'error': f'Erro ao publicar: {publish_response.text}'
-            }
+        return result
     
     def _publish_text_post(self, caption: str) -> Dict:
         """Publica post apenas com texto (como story)"""
@@ -101,7 +136,8 @@ class InstagramManager:
             'access_token': self.access_token
         }
         
-        response = requests.post(
+        response = self._graph_request(
+            'POST',
             f"{self.base_url}/{self.page_id}/media",
             data=story_data
         )
@@ -115,7 +151,8 @@ class InstagramManager:
                 'access_token': self.access_token
             }
             
-            publish_response = requests.post(
+            publish_response = self._graph_request(
+                'POST',
                 f"{self.base_url}/{self.page_id}/media_publish",
                 data=publish_data
             )
@@ -136,90 +173,213 @@ class InstagramManager:
         """
         Cria um post carousel (múltiplas imagens)
         
+        Os containers dos itens são criados em paralelo e cada um é consultado
+        até ficar pronto (status_code FINISHED) antes de montar o carousel, de
+        modo que o tempo total acompanha o item mais lento, não a soma deles.
+        
         Args:
             items: Lista de dicts com 'image_url' para cada item do carousel
             caption: Legenda do post
             hashtags: Lista de hashtags
         
         Returns:
-            Dict com resultado da publicação
+            Dict com resultado da publicação e tempos de cada etapa (timings)
         """
         
         if not self.access_token or not self.page_id:
             return {'success': False, 'error': 'Configuração do Instagram incompleta'}
         
+        if not 2 <= len(items) <= CAROUSEL_MAX_ITEMS:
+            return {'success': False, 'error': f'O carousel deve ter entre 2 e {CAROUSEL_MAX_ITEMS} itens'}
+        
         # Prepara a legenda com hashtags
         full_caption = caption
         if hashtags:
             hashtag_text = " ".join([f"#{tag}" for tag in hashtags])
             full_caption = f"{caption}\n\n{hashtag_text}"
         
+        started = time.monotonic()
+        timings = {}
+        
         try:
-            # Cria containers de mídia para cada item
-            media_ids = []
+            # Cria e aguarda os containers de cada item em paralelo (a ordem dos itens é mantida)
+            workers = min(CAROUSEL_MAX_WORKERS, len(items))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='instagram-carousel') as executor:
+                children = list(executor.map(self._create_carousel_item, items))
             
-            for item in items:
-                media_data = {
-                    'image_url': item['image_url'],
-                    'is_carousel_item': True,
-                    'access_token': self.access_token
+            timings['children'] = [child['seconds'] for child in children]
+            timings['children_wall'] = round(time.monotonic() - started, 3)
+            
+            failed = [child for child in children if not child['success']]
+            if failed:
+                return {
+                    'success': False,
+                    'error': f"Erro ao criar item do carousel: {failed[0]['error']}",
+                    'timings': timings
                 }
-                
-                response = requests.post(
-                    f"{self.base_url}/{self.page_id}/media",
-                    data=media_data
-                )
-                
-                if response.status_code == 200:
-                    media_ids.append(response.json().get('id'))
-                else:
-                    return {
-                        'success': False,
-                        'error': f'Erro ao criar item do carousel: {response.text}'
-                    }
             
             # Cria o container do carousel
+            step_started = time.monotonic()
             carousel_data = {
                 'media_type': 'CAROUSEL',
-                'children': ','.join(media_ids),
+                'children': ','.join(child['id'] for child in children),
                 'caption': full_caption,
                 'access_token': self.access_token
             }
             
-            carousel_response = requests.post(
+            container = self._create_container(carousel_data)
+            if container['success']:
+                ready = self._wait_for_container(container['id'])
+            timings['carousel_container'] = round(time.monotonic() - step_started, 3)
+            
+            if not container['success'] or not ready['success']:
+                error = container['error'] if not container['success'] else ready['error']
+                return {
+                    'success': False,
+                    'error': f'Erro ao publicar carousel: {error}',
+                    'timings': timings
+                }
+            
+            # Publica o carousel
+            step_started = time.monotonic()
+            result = self._publish_container(container['id'])
+            timings['publish'] = round(time.monotonic() - step_started, 3)
+            timings['total'] = round(time.monotonic() - started, 3)
+            
+            result['timings'] = timings
+            return result
+        
+        except InstagramRateLimited as e:
+            return dict(e.result, timings=timings)
+        except Exception as e:
+            return {'success': False, 'error': f'Erro ao criar carousel: {str(e)}'}
+    
+    def _create_carousel_item(self, item: Dict) -> Dict:
+        """Cria o container de um item do carousel e aguarda o processamento"""
+        
+        started = time.monotonic()
+        
+        container = self._create_container({
+            'image_url': item['image_url'],
+            'is_carousel_item': True,
+            'access_token': self.access_token
+        })
+        
+        if container['success']:
+            ready = self._wait_for_container(container['id'])
+            if not ready['success']:
+                container = {'success': False, 'error': ready['error']}
+        
+        container['seconds'] = round(time.monotonic() - started, 3)
+        return container
+    
+    def _create_container(self, media_data: Dict) -> Dict:
+        """Cria um container de mídia; retorna {'success', 'id' ou 'error', 'seconds'}"""
+        
+        started = time.monotonic()
+        
+        try:
+            response = self._graph_request(
+                'POST',
                 f"{self.base_url}/{self.page_id}/media",
-                data=carousel_data
+                data=media_data
             )
-            
-            if carousel_response.status_code == 200:
-                carousel_id = carousel_response.json().get('id')
-                
-                # Publica o carousel
-                publish_data = {
-                    'creation_id': carousel_id,
+        except InstagramRateLimited:
+            raise
+        except Exception as e:
+            return {'success': False, 'error': str(e), 'seconds': time.monotonic() - started}
+        
+        if response.status_code != 200:
+            return {'success': False, 'error': response.text, 'seconds': time.monotonic() - started}
+        
+        return {'success': True, 'id': response.json().get('id'), 'seconds': time.monotonic() - started}
+    
+    def _wait_for_container(self, container_id: str, timeout: float = CONTAINER_TIMEOUT) -> Dict:
+        """
+        Consulta o status_code do container até FINISHED, com backoff exponencial
+        
+        Args:
+            container_id: ID do container de mídia
+            timeout: Tempo máximo de espera em segundos
+        
+        Returns:
+            Dict com success, status_code e seconds (tempo de espera)
+        """
+        
+        started = time.monotonic()
+        delay = CONTAINER_POLL_INITIAL_DELAY
+        status_code = None
+        
+        while True:
+            response = self._graph_request(
+                'GET',
+                f"{self.base_url}/{container_id}",
+                params={
+                    'fields': 'status_code,status',
                     'access_token': self.access_token
                 }
-                
-                publish_response = requests.post(
-                    f"{self.base_url}/{self.page_id}/media_publish",
-                    data=publish_data
-                )
-                
-                if publish_response.status_code == 200:
-                    post_id = publish_response.json().get('id')
-                    return {
-                        'success': True,
-                        'post_id': post_id,
-                        'url': f"https://www.instagram.com/p/{post_id}/"
-                    }
+            )
+            
+            if response.status_code != 200:
+                return {
+                    'success': False,
+                    'error': f'Erro ao consultar container {container_id}: {response.text}',
+                    'seconds': time.monotonic() - started
+                }
+            
+            data = response.json()
+            status_code = data.get('status_code')
+            
+            if status_code == 'FINISHED' or status_code == 'PUBLISHED':
+                return {'success': True, 'status_code': status_code, 'seconds': time.monotonic() - started}
+            
+            if status_code in ('ERROR', 'EXPIRED'):
+                return {
+                    'success': False,
+                    'status_code': status_code,
+                    'error': f"Container {container_id} com status {status_code}: {data.get('status', '')}",
+                    'seconds': time.monotonic() - started
+                }
+            
+            # IN_PROGRESS: aguarda com backoff até o limite
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                return {
+                    'success': False,
+                    'status_code': status_code,
+                    'error': f'Container {container_id} não ficou pronto em {timeout:.0f}s (status {status_code})',
+                    'seconds': time.monotonic() - started
+                }
             
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, CONTAINER_POLL_MAX_DELAY)
+    
+    def _publish_container(self, container_id: str) -> Dict:
+        """Publica um container pronto"""
+        
+        publish_data = {
+            'creation_id': container_id,
+            'access_token': self.access_token
+        }
+        
+        publish_response = self._graph_request(
+            'POST',
+            f"{self.base_url}/{self.page_id}/media_publish",
+            data=publish_data
+        )
+        
+        if publish_response.status_code == 200:
+            post_id = publish_response.json().get('id')
             return {
-                'success': False,
-                'error': f'Erro ao publicar carousel: {carousel_response.text}'
+                'success': True,
+                'post_id': post_id,
+                'url': f"https://www.instagram.com/p/{post_id}/"
             }
-            
-        except Exception as e:
-            return {'success': False, 'error': f'Erro ao criar carousel: {str(e)}'}
+        
+        return {
+            'success': False,
+            'error': f'Erro ao publicar: {publish_response.text}'
+        }
     
     def get_account_info(self) -> Dict:
         """Retorna informações da conta do Instagram"""
@@ -228,7 +388,8 @@ class InstagramManager:
             return {'success': False, 'error': 'Configuração do Instagram incompleta'}
         
         try:
-            response = requests.get(
+            response = self._graph_request(
+                'GET',
                 f"{self.base_url}/{self.page_id}",
                 params={
                     'fields': 'id,username,account_type,media_count,followers_count',
@@ -257,7 +418,8 @@ class InstagramManager:
             return {'success': False, 'error': 'Configuração do Instagram incompleta'}
         
         try:
-            response = requests.get(
+            response = self._graph_request(
+                'GET',
                 f"{self.base_url}/{self.page_id}/media",
                 params={
                     'fields': 'id,caption,media_type,media_url,permalink,timestamp,like_count,comments_count',
@@ -280,6 +442,112 @@ class InstagramManager:
         except Exception as e:
             return {'success': False, 'error': f'Erro ao conectar com Instagram: {str(e)}'}
     
+    MEDIA_FIELDS = 'id,caption,media_type,media_url,permalink,timestamp,like_count,comments_count'
+    
+    def iter_media(self, since: Optional[datetime] = None, page_size: int = 50) -> Iterator[Dict]:
+        """
+        Percorre as mídias da conta, da mais nova para a mais antiga, seguindo os cursores
+        
+        Args:
+            since: Para ao encontrar mídia publicada antes deste horário (UTC)
+            page_size: Itens por página
+        
+        Yields:
+            Mídias com o timestamp convertido em 'posted_at' (datetime UTC)
+        """
+        
+        if not self.access_token or not self.page_id:
+            raise ValueError('Configuração do Instagram incompleta')
+        
+        params = {
+            'fields': self.MEDIA_FIELDS,
+            'limit': page_size,
+            'access_token': self.access_token
+        }
+        
+        while True:
+            response = self._graph_request('GET', f"{self.base_url}/{self.page_id}/media", params=params)
+            if response.status_code != 200:
+                raise RuntimeError(f'Erro ao obter posts: {response.status_code} - {response.text}')
+            
+            data = response.json()
+            for media in data.get('data', []):
+                media['posted_at'] = self.parse_timestamp(media.get('timestamp'))
+                if since and media['posted_at'] and media['posted_at'] < since:
+                    return
+                yield media
+            
+            after = data.get('paging', {}).get('cursors', {}).get('after')
+            if not after or not data.get('paging', {}).get('next'):
+                return
+            params = dict(params, after=after)
+    
+    def get_media_metrics(self, media_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Curtidas e comentários de várias mídias (até 50 por chamada via ?ids=)
+        
+        Mídias removidas da conta ficam fora do resultado. Como um único ID
+        inexistente faz a Graph API recusar a chamada inteira (400), o bloco
+        recusado é refeito com uma leitura por mídia.
+        """
+        
+        metrics = {}
+        for start in range(0, len(media_ids), 50):
+            chunk = media_ids[start:start + 50]
+            response = self._graph_request(
+                'GET',
+                f"{self.base_url}/",
+                params={
+                    'ids': ','.join(chunk),
+                    'fields': 'like_count,comments_count',
+                    'access_token': self.access_token
+                }
+            )
+            if response.status_code == 200:
+                metrics.update(response.json())
+            elif self._is_missing_object(response):
+                metrics.update(self._get_media_metrics_individually(chunk))
+            else:
+                raise RuntimeError(f'Erro ao obter métricas: {response.status_code} - {response.text}')
+        
+        return metrics
+    
+    def _get_media_metrics_individually(self, media_ids: List[str]) -> Dict[str, Dict]:
+        metrics = {}
+        for media_id in media_ids:
+            response = self._graph_request(
+                'GET',
+                f"{self.base_url}/{media_id}",
+                params={'fields': 'like_count,comments_count', 'access_token': self.access_token}
+            )
+            if response.status_code == 200:
+                metrics[media_id] = response.json()
+            elif not self._is_missing_object(response):
+                # Só "objeto inexistente" conta como mídia removida; token expirado, limite etc. interrompem
+                raise RuntimeError(f'Erro ao obter métricas: {response.status_code} - {response.text}')
+        
+        return metrics
+    
+    @staticmethod
+    def _is_missing_object(response) -> bool:
+        """Erro da Graph API para ID inexistente ou removido (código 100)"""
+        
+        if response.status_code not in (400, 404):
+            return False
+        try:
+            return response.json().get('error', {}).get('code') == 100
+        except (ValueError, AttributeError):
+            return False
+    
+    @staticmethod
+    def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+        """Converte o timestamp da Graph API ('2024-01-31T12:00:00+0000') em datetime UTC sem fuso"""
+        
+        if not value:
+            return None
+        parsed = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+        return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    
     @staticmethod
     def generate_hashtags_for_tax_content(content_type: str = "general") -> List[str]:
         """Gera hashtags relevantes para conteúdo tributário"""
@@ -0,0 +1,59 @@
+from src.models.user import db
+from datetime import datetime
+
+class InstagramMedia(db.Model):
+    __tablename__ = 'instagram_media'
+    __table_args__ = (
+        db.UniqueConstraint('channel_id', 'media_id', name='uq_instagram_media_channel_media'),
+        db.Index('ix_instagram_media_refresh', 'channel_id', 'next_refresh_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel_id = db.Column(db.Integer, db.ForeignKey('publication_channels.id'), nullable=False)
+    media_id = db.Column(db.String(100), nullable=False)  # ID da mídia na Graph API
+    publication_log_id = db.Column(db.Integer, db.ForeignKey('publication_logs.id'), index=True)
+    caption = db.Column(db.Text)
+    media_type = db.Column(db.String(30))  # 'IMAGE', 'VIDEO', 'CAROUSEL_ALBUM'
+    media_url = db.Column(db.String(1000))
+    permalink = db.Column(db.String(500))
+    posted_at = db.Column(db.DateTime, index=True)
+    like_count = db.Column(db.Integer, default=0)
+    comments_count = db.Column(db.Integer, default=0)
+    metrics_updated_at = db.Column(db.DateTime)
+    next_refresh_at = db.Column(db.DateTime)  # None: métricas estabilizadas, não atualiza mais
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    publication_log = db.relationship('PublicationLog', backref='instagram_media')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'channel_id': self.channel_id,
+            'media_id': self.media_id,
+            'publication_log_id': self.publication_log_id,
+            'caption': self.caption,
+            'media_type': self.media_type,
+            'media_url': self.media_url,
+            'permalink': self.permalink,
+            'posted_at': self.posted_at.isoformat() if self.posted_at else None,
+            'like_count': self.like_count,
+            'comments_count': self.comments_count,
+            'metrics_updated_at': self.metrics_updated_at.isoformat() if self.metrics_updated_at else None,
+            'next_refresh_at': self.next_refresh_at.isoformat() if self.next_refresh_at else None
+        }
+
+class InstagramSyncState(db.Model):
+    __tablename__ = 'instagram_sync_states'
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel_id = db.Column(db.Integer, db.ForeignKey('publication_channels.id'), unique=True, nullable=False)
+    media_watermark = db.Column(db.DateTime)  # mídia mais nova da última leitura completa; só avança ao fim da leitura
+    last_synced_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'channel_id': self.channel_id,
+            'media_watermark': self.media_watermark.isoformat() if self.media_watermark else None,
+            'last_synced_at': self.last_synced_at.isoformat() if self.last_synced_at else None
+        }
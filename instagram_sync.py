@@ -0,0 +1,246 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from src.models.publication import db, PublicationChannel, PublicationLog
+from src.models.instagram_media import InstagramMedia, InstagramSyncState
+from src.services.instagram_manager import InstagramManager
+
+# Intervalo de atualização das métricas pela idade do post: (idade máxima, intervalo).
+# Posts mais velhos que a última faixa param de ser atualizados
+METRICS_REFRESH_SCHEDULE = (
+    (timedelta(days=1), timedelta(hours=1)),
+    (timedelta(days=7), timedelta(hours=6)),
+    (timedelta(days=30), timedelta(days=1)),
+)
+
+# Intervalo entre execuções do job 'instagram_sync' agendado pelo DueScheduler
+SYNC_INTERVAL = float(os.environ.get('INSTAGRAM_SYNC_INTERVAL', 3600))
+
+# Espera máxima por uma ficha do balde da conta: a sincronização roda em segundo
+# plano e pode aguardar o ritmo de ~200 chamadas/hora em vez de falhar
+SYNC_RATE_LIMIT_WAIT = float(os.environ.get('INSTAGRAM_SYNC_RATE_LIMIT_WAIT', 60))
+
+def next_refresh_at(posted_at: Optional[datetime], now: datetime) -> Optional[datetime]:
+    """Próxima atualização de métricas de um post (None quando já estabilizaram)"""
+
+    if not posted_at:
+        return None
+    age = now - posted_at
+    for max_age, interval in METRICS_REFRESH_SCHEDULE:
+        if age < max_age:
+            return now + interval
+    return None
+
+class InstagramSync:
+    """
+    Sincroniza mídias e métricas das contas do Instagram em instagram_media
+
+    Mídias novas são lidas página a página (cursores da Graph API) até a
+    marca d'água do canal, que só avança depois de uma leitura completa: uma
+    execução interrompida no meio é refeita desde o topo na próxima. Métricas de posts recentes são atualizadas em lotes
+    de até 50 IDs por chamada, com frequência que diminui com a idade do
+    post. Relatórios consultam a tabela local, sem chamar a Graph API.
+    """
+
+    def __init__(self, page_size: int = 50, max_refresh: int = 500):
+        """
+        Args:
+            page_size: Mídias por página lida e por transação
+            max_refresh: Mídias com métricas atualizadas por canal e execução
+        """
+
+        self.page_size = page_size
+        self.max_refresh = max_refresh
+
+    def sync_all(self) -> Dict:
+        """Sincroniza todos os canais ativos do Instagram"""
+
+        channels = PublicationChannel.query.filter_by(channel_type='instagram', is_active=True).all()
+        results = [self.sync_channel(channel) for channel in channels]
+
+        return {
+            'success': all(result['success'] for result in results),
+            'channels': results
+        }
+
+    def sync_channel(self, channel: PublicationChannel) -> Dict:
+        """
+        Sincroniza um canal: mídias novas e métricas vencidas
+
+        Args:
+            channel: Canal do Instagram
+
+        Returns:
+            Dict com contagens de mídias inseridas, atualizadas, ligadas a logs e métricas atualizadas
+        """
+
+        config = channel.get_api_config()
+        manager = InstagramManager(config.get('access_token'), config.get('page_id'), rate_limit_wait=SYNC_RATE_LIMIT_WAIT)
+        counts = {'inserted': 0, 'updated': 0, 'linked': 0, 'metrics_refreshed': 0}
+
+        try:
+            self._sync_new_media(channel, manager, counts)
+            counts['metrics_refreshed'] = self._refresh_metrics(channel, manager)
+            return dict(counts, success=True, channel_id=channel.id)
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao sincronizar Instagram do canal {channel.id}: {e}")
+            return dict(counts, success=False, channel_id=channel.id, error=str(e))
+
+    def _sync_new_media(self, channel: PublicationChannel, manager: InstagramManager, counts: Dict):
+        state = InstagramSyncState.query.filter_by(channel_id=channel.id).first()
+        if state is None:
+            state = InstagramSyncState(channel_id=channel.id)
+            db.session.add(state)
+
+        # Mídias mais novas primeiro: para na marca d'água (a do mesmo instante é regravada)
+        since = state.media_watermark
+        newest = since
+
+        page: List[Dict] = []
+        for media in manager.iter_media(since=since, page_size=self.page_size):
+            page.append(media)
+            if media.get('posted_at') and (newest is None or media['posted_at'] > newest):
+                newest = media['posted_at']
+            if len(page) >= self.page_size:
+                self._upsert(channel, page, counts)
+                page = []
+
+        if page:
+            self._upsert(channel, page, counts)
+
+        # Leitura completa: só agora a próxima execução pode parar nas mídias já vistas
+        state.media_watermark = newest
+        state.last_synced_at = datetime.utcnow()
+        db.session.commit()
+
+    def _upsert(self, channel: PublicationChannel, items: List[Dict], counts: Dict):
+        """Grava uma página de mídias (uma transação) e liga cada uma ao log da publicação"""
+
+        now = datetime.utcnow()
+        media_ids = [media['id'] for media in items]
+
+        existing = {
+            row.media_id: row
+            for row in InstagramMedia.query.filter(
+                InstagramMedia.channel_id == channel.id,
+                InstagramMedia.media_id.in_(media_ids)
+            )
+        }
+        log_ids = dict(
+            db.session.query(PublicationLog.post_id, PublicationLog.id).filter(
+                PublicationLog.channel_id == channel.id,
+                PublicationLog.post_id.in_(media_ids)
+            )
+        )
+
+        for media in items:
+            row = existing.get(media['id'])
+            if row is None:
+                row = InstagramMedia(channel_id=channel.id, media_id=media['id'])
+                db.session.add(row)
+                counts['inserted'] += 1
+            else:
+                counts['updated'] += 1
+
+            row.caption = media.get('caption')
+            row.media_type = media.get('media_type')
+            row.media_url = media.get('media_url')
+            row.permalink = media.get('permalink')
+            row.posted_at = media.get('posted_at')
+            row.like_count = media.get('like_count') or 0
+            row.comments_count = media.get('comments_count') or 0
+            row.metrics_updated_at = now
+            row.next_refresh_at = next_refresh_at(row.posted_at, now)
+
+            if not row.publication_log_id and media['id'] in log_ids:
+                row.publication_log_id = log_ids[media['id']]
+                counts['linked'] += 1
+
+        db.session.commit()
+
+    def _refresh_metrics(self, channel: PublicationChannel, manager: InstagramManager) -> int:
+        """Atualiza curtidas e comentários das mídias com atualização vencida"""
+
+        now = datetime.utcnow()
+        rows = InstagramMedia.query.filter(
+            InstagramMedia.channel_id == channel.id,
+            InstagramMedia.next_refresh_at <= now
+        ).order_by(InstagramMedia.next_refresh_at).limit(self.max_refresh).all()
+
+        if not rows:
+            return 0
+
+        metrics = manager.get_media_metrics([row.media_id for row in rows])
+
+        for row in rows:
+            media_metrics = metrics.get(row.media_id)
+            if media_metrics is None:
+                # Mídia removida da conta: mantém os últimos números e para de atualizar
+                row.next_refresh_at = None
+                continue
+            row.like_count = media_metrics.get('like_count') or 0
+            row.comments_count = media_metrics.get('comments_count') or 0
+            row.metrics_updated_at = now
+            row.next_refresh_at = next_refresh_at(row.posted_at, now)
+
+        db.session.commit()
+        return len(rows)
+
+def get_instagram_analytics(channel_id: Optional[int] = None, days: int = 30, top: int = 5) -> Dict:
+    """
+    Engajamento dos posts da janela a partir da tabela local
+
+    Args:
+        channel_id: Restringe a um canal (opcional)
+        days: Tamanho da janela em dias (pela data do post)
+        top: Quantidade de posts no ranking
+
+    Returns:
+        Dict com totais, médias, totais por tipo de mídia e os posts com mais engajamento
+    """
+
+    start = datetime.utcnow() - timedelta(days=days)
+    query = InstagramMedia.query.filter(InstagramMedia.posted_at >= start)
+    if channel_id:
+        query = query.filter(InstagramMedia.channel_id == channel_id)
+
+    posts, likes, comments = query.with_entities(
+        func.count(InstagramMedia.id),
+        func.coalesce(func.sum(InstagramMedia.like_count), 0),
+        func.coalesce(func.sum(InstagramMedia.comments_count), 0)
+    ).one()
+
+    by_media_type = {
+        media_type or 'unknown': {'posts': count, 'likes': int(type_likes or 0), 'comments': int(type_comments or 0)}
+        for media_type, count, type_likes, type_comments in query.with_entities(
+            InstagramMedia.media_type,
+            func.count(InstagramMedia.id),
+            func.sum(InstagramMedia.like_count),
+            func.sum(InstagramMedia.comments_count)
+        ).group_by(InstagramMedia.media_type)
+    }
+
+    engagement = InstagramMedia.like_count + InstagramMedia.comments_count
+    top_posts = query.order_by(engagement.desc()).limit(top).all()
+
+    return {
+        'period_days': days,
+        'posts': posts,
+        'likes': int(likes),
+        'comments': int(comments),
+        'avg_engagement': round((likes + comments) / posts, 2) if posts else 0,
+        'by_media_type': by_media_type,
+        'top_posts': [post.to_dict() for post in top_posts]
+    }
+
+instagram_sync = InstagramSync()
+
+if __name__ == '__main__':
+    import json
+    from src.main import app
+
+    with app.app_context():
+        print(json.dumps(instagram_sync.sync_all(), indent=2, default=str))
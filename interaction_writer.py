@@ -0,0 +1,169 @@
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import update
+from src.models.lead import db, Lead, LeadInteraction
+from src.services.outbox_manager import OutboxManager
+from src.services.message_store import externalize_messages
+
+class InteractionWriter:
+    """Acumula interações de campanha e grava em lotes transacionais"""
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 2.0):
+        """
+        Args:
+            batch_size: Quantidade de interações por transação
+            flush_interval: Tempo máximo (segundos) que uma interação fica em memória
+        """
+
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending: List[Dict] = []
+        self._last_flush = time.monotonic()
+        self.stats = {
+            'queued': 0,
+            'written': 0,
+            'transactions': 0,
+            'failed_transactions': 0,
+            'last_error': None
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Grava o que estiver pendente mesmo se a campanha falhou no meio
+        self.flush()
+        return False
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def add(self, lead_id: int, interaction_data: Dict, outbox: Optional[Dict] = None) -> Dict:
+        """
+        Enfileira uma interação para gravação em lote
+
+        Args:
+            lead_id: ID do lead
+            interaction_data: Mesmo formato aceito por LeadManager.record_interaction
+            outbox: Envio a gravar no outbox junto com a interação (opcional)
+
+        Returns:
+            Dict com resultado do enfileiramento
+        """
+
+        self._pending.append({
+            'lead_id': lead_id,
+            'data': interaction_data,
+            'outbox': outbox,
+            'sent_at': datetime.utcnow()
+        })
+        self.stats['queued'] += 1
+
+        if (len(self._pending) >= self.batch_size or
+                time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+        return {
+            'success': True,
+            'queued': True,
+            'message': 'Interação enfileirada para gravação'
+        }
+
+    def flush(self) -> Dict:
+        """
+        Grava as interações pendentes em transações de até batch_size itens
+
+        Cada lote é atômico: interações e atualizações dos leads são gravadas
+        juntas ou descartadas juntas. Lotes que falham permanecem pendentes
+        para a próxima tentativa.
+        """
+
+        self._last_flush = time.monotonic()
+        written = 0
+
+        while self._pending:
+            chunk = self._pending[:self.batch_size]
+
+            try:
+                self._write_chunk(chunk)
+            except Exception as e:
+                db.session.rollback()
+                self.stats['failed_transactions'] += 1
+                self.stats['last_error'] = str(e)
+                return {
+                    'success': False,
+                    'written': written,
+                    'pending': len(self._pending),
+                    'error': str(e)
+                }
+
+            del self._pending[:len(chunk)]
+            written += len(chunk)
+            self.stats['written'] += len(chunk)
+            self.stats['transactions'] += 1
+
+        return {'success': True, 'written': written, 'pending': 0}
+
+    def _write_chunk(self, chunk: List[Dict]):
+        """Grava um lote de interações e atualiza os leads em uma única transação"""
+
+        interactions = []
+        last_contact = {}
+
+        # Envio já enfileirado com a mesma chave (reentrada): não grava uma segunda interação 'queued'
+        queued_keys = OutboxManager.existing_dedupe_keys(
+            [entry['outbox'].get('dedupe_key') for entry in chunk if entry.get('outbox')]
+        )
+
+        # Corpos repetidos na campanha são gravados uma vez em message_bodies
+        chunk_data = [dict(entry['data']) for entry in chunk]
+        externalize_messages(chunk_data)
+
+        for entry, data in zip(chunk, chunk_data):
+            dedupe_key = (entry.get('outbox') or {}).get('dedupe_key')
+            if dedupe_key:
+                if dedupe_key in queued_keys:
+                    continue
+                queued_keys.add(dedupe_key)
+
+            interaction = LeadInteraction(
+                lead_id=entry['lead_id'],
+                interaction_type=data['interaction_type'],
+                channel=data.get('channel'),
+                subject=data.get('subject'),
+                message=data.get('message'),
+                status=data.get('status', 'sent'),
+                sent_at=entry['sent_at']
+            )
+
+            if 'metadata' in data:
+                interaction.set_metadata(data['metadata'])
+
+            interactions.append(interaction)
+
+            if entry.get('outbox'):
+                OutboxManager.enqueue(interaction=interaction, **entry['outbox'])
+
+            previous = last_contact.get(entry['lead_id'])
+            if previous is None or entry['sent_at'] > previous:
+                last_contact[entry['lead_id']] = entry['sent_at']
+
+        if not interactions:
+            return
+
+        db.session.add_all(interactions)
+
+        # Atualiza último contato dos leads (UPDATE em lote por chave primária)
+        db.session.execute(update(Lead), [
+            {'id': lead_id, 'last_contact_at': contact_at}
+            for lead_id, contact_at in last_contact.items()
+        ])
+
+        Lead.query.filter(
+            Lead.id.in_(list(last_contact.keys())),
+            Lead.status == 'new'
+        ).update({'status': 'contacted'}, synchronize_session=False)
+
+        db.session.commit()
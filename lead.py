@@ -1,8 +1,16 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from src.models.lead import db, Lead, LeadInteraction, LeadSource
+from src.models.campaign import CampaignRun
 from src.services.lead_manager import LeadManager
 from src.services.outreach_manager import OutreachManager
+from src.services.campaign_run_manager import CampaignRunManager
+from src.services.personalization_cache import personalization_cache
+from src.models.personalization_segment import PersonalizationSegment
+from src.models.suppression import SuppressionEntry
+from src.services.suppression_manager import suppression_list
+from src.services.reply_ingestor import ReplyIngestor, get_sync_states
+from src.models.mailbox_sync import InboundReply
 
 lead_bp = Blueprint('lead', __name__)
 
@@ -196,7 +204,7 @@ def send_initial_email(lead_id):
     data = request.get_json()
     template_type = data.get('template_type', 'email')
     
-    outreach = OutreachManager()
+    outreach = OutreachManager(deferred_delivery=data.get('deferred'))
     result = outreach.send_initial_email(lead_id, template_type)
     
     if result['success']:
@@ -211,7 +219,7 @@ def send_linkedin_message(lead_id):
     data = request.get_json()
     message_type = data.get('message_type', 'initial')
     
-    outreach = OutreachManager()
+    outreach = OutreachManager(deferred_delivery=data.get('deferred'))
     result = outreach.send_linkedin_message(lead_id, message_type)
     
     if result['success']:
@@ -226,7 +234,7 @@ def send_instagram_dm(lead_id):
     data = request.get_json()
     message_type = data.get('message_type', 'initial')
     
-    outreach = OutreachManager()
+    outreach = OutreachManager(deferred_delivery=data.get('deferred'))
     result = outreach.send_instagram_dm(lead_id, message_type)
     
     if result['success']:
@@ -240,7 +248,7 @@ def run_outreach_campaign():
     
     data = request.get_json()
     
-    outreach = OutreachManager()
+    outreach = OutreachManager(deferred_delivery=data.get('deferred'))
     result = outreach.run_outreach_campaign(data)
     
     if result['success']:
@@ -255,14 +263,219 @@ def run_follow_up_campaign():
     data = request.get_json()
     days_since_contact = data.get('days_since_contact', 7)
     
-    outreach = OutreachManager()
-    result = outreach.run_follow_up_campaign(days_since_contact)
+    outreach = OutreachManager(deferred_delivery=data.get('deferred'))
+    result = outreach.run_follow_up_campaign(days_since_contact, run_id=data.get('run_id'))
     
     if result['success']:
         return jsonify(result)
     else:
         return jsonify(result), 400
 
+@lead_bp.route('/outreach/runs', methods=['GET'])
+def get_campaign_runs():
+    """Retorna execuções de campanha recentes"""
+    
+    limit = request.args.get('limit', 20, type=int)
+    
+    manager = CampaignRunManager()
+    runs = manager.list_runs(limit)
+    
+    return jsonify({
+        'runs': runs,
+        'count': len(runs)
+    })
+
+@lead_bp.route('/outreach/runs/<int:run_id>', methods=['GET'])
+def get_campaign_run_progress(run_id):
+    """Retorna progresso de uma execução de campanha (enviados, falhas, restantes, vazão)"""
+    
+    manager = CampaignRunManager()
+    progress = manager.get_run_progress(run_id)
+    
+    if not progress:
+        return jsonify({'error': 'Execução de campanha não encontrada'}), 404
+    
+    return jsonify(progress)
+
+@lead_bp.route('/outreach/runs/<int:run_id>/resume', methods=['POST'])
+def resume_campaign_run(run_id):
+    """Retoma uma execução de campanha interrompida a partir do último checkpoint"""
+    
+    run = CampaignRun.query.get_or_404(run_id)
+    config = run.get_config()
+    
+    # Mesmo modo de entrega (imediato ou outbox) da execução original
+    outreach = OutreachManager(deferred_delivery=config.get('deferred'))
+    if run.campaign_type == 'follow_up':
+        result = outreach.run_follow_up_campaign(config.get('days_since_contact', 7), run_id=run_id)
+    else:
+        config['run_id'] = run_id
+        result = outreach.run_outreach_campaign(config)
+    
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 400
+
+@lead_bp.route('/outreach/personalization', methods=['GET'])
+def get_personalization_segments():
+    """Retorna segmentos de personalização gerados por LLM e estatísticas do cache"""
+    
+    segments = PersonalizationSegment.query.order_by(PersonalizationSegment.updated_at.desc()).limit(
+        request.args.get('limit', 100, type=int)
+    ).all()
+    
+    return jsonify({
+        'segments': [segment.to_dict() for segment in segments],
+        'stats': personalization_cache.get_stats()
+    })
+
+@lead_bp.route('/outreach/personalization/invalidate', methods=['POST'])
+def invalidate_personalization_segments():
+    """Marca segmentos para regeração (filtros opcionais: template_id, sector)"""
+    
+    data = request.get_json() or {}
+    count = personalization_cache.invalidate(data.get('template_id'), data.get('sector'))
+    
+    return jsonify({
+        'success': True,
+        'invalidated': count
+    })
+
+# Rotas para lista de supressão
+
+@lead_bp.route('/suppressions', methods=['GET'])
+def get_suppressions():
+    """Retorna entradas de supressão e métricas de envios suprimidos"""
+    
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    kind = request.args.get('kind')
+    
+    query = SuppressionEntry.query.filter_by(is_active=True)
+    if kind:
+        query = query.filter_by(kind=kind)
+    
+    entries = query.order_by(SuppressionEntry.updated_at.desc()).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    
+    return jsonify({
+        'entries': [entry.to_dict() for entry in entries.items],
+        'total': entries.total,
+        'pages': entries.pages,
+        'current_page': page,
+        'metrics': suppression_list.get_stats()
+    })
+
+@lead_bp.route('/suppressions', methods=['POST'])
+def add_suppression():
+    """Adiciona e-mail, domínio, CNPJ ou perfil à lista de supressão"""
+    
+    data = request.get_json()
+    
+    if not data or not data.get('kind') or not data.get('value'):
+        return jsonify({'error': 'kind e value são obrigatórios'}), 400
+    
+    result = suppression_list.add(
+        data['kind'], data['value'], data.get('reason', 'manual'), data.get('source'), data.get('lead_id'),
+        data.get('platform')
+    )
+    
+    if result['success']:
+        return jsonify(result), 201
+    else:
+        return jsonify(result), 400
+
+@lead_bp.route('/suppressions/import', methods=['POST'])
+def import_suppressions():
+    """
+    Importa lista de supressão em lote
+    
+    Aceita JSON com 'entries' ([{kind, value, platform}]) ou com 'kind' e 'values',
+    ou um arquivo CSV (campo 'file') com colunas kind,value e platform opcional.
+    Perfis sem URL ('fulano') precisam de platform ('linkedin' ou 'instagram').
+    """
+    
+    if 'file' in request.files:
+        import csv
+        import io
+        
+        upload = request.files['file']
+        reader = csv.DictReader(io.StringIO(upload.read().decode('utf-8-sig')))
+        entries = [
+            {'kind': row.get('kind', '').strip(), 'value': row.get('value'), 'platform': row.get('platform')}
+            for row in reader
+        ]
+        reason = request.form.get('reason', 'import')
+        source = request.form.get('source', upload.filename)
+    else:
+        data = request.get_json() or {}
+        entries = data.get('entries') or [
+            {'kind': data.get('kind'), 'value': value, 'platform': data.get('platform')}
+            for value in data.get('values', [])
+        ]
+        reason = data.get('reason', 'import')
+        source = data.get('source')
+    
+    if not entries:
+        return jsonify({'error': 'Nenhuma entrada para importar'}), 400
+    
+    result = suppression_list.bulk_import(entries, reason, source)
+    
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 400
+
+@lead_bp.route('/suppressions', methods=['DELETE'])
+def remove_suppression():
+    """Remove um valor da lista de supressão"""
+    
+    data = request.get_json() or {}
+    result = suppression_list.remove(data.get('kind'), data.get('value'), data.get('platform'))
+    
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 404
+
+# Rotas para respostas de e-mail
+
+@lead_bp.route('/replies', methods=['GET'])
+def get_inbound_replies():
+    """Retorna respostas recebidas e o estado de sincronização das caixas"""
+    
+    limit = request.args.get('limit', 50, type=int)
+    classification = request.args.get('classification')
+    
+    query = InboundReply.query
+    if classification:
+        query = query.filter_by(classification=classification)
+    
+    replies = query.order_by(InboundReply.received_at.desc()).limit(limit).all()
+    
+    return jsonify({
+        'replies': [reply.to_dict() for reply in replies],
+        'mailboxes': get_sync_states()
+    })
+
+@lead_bp.route('/replies/sync', methods=['POST'])
+def sync_inbound_replies():
+    """Sincroniza a caixa de respostas (IMAP_*) a partir do último UID processado"""
+    
+    ingestor = ReplyIngestor.from_env()
+    if not ingestor:
+        return jsonify({'error': 'Caixa de respostas não configurada (IMAP_HOST)'}), 400
+    
+    data = request.get_json() or {}
+    result = ingestor.sync(max_messages=data.get('max_messages'))
+    
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 500
+
 # Rotas para fontes de leads
 
 @lead_bp.route('/lead-sources', methods=['GET'])
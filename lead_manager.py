@@ -1,8 +1,10 @@
-import requests
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from src.models.lead import db, Lead, LeadInteraction, LeadSource
+from src.services.outbox_manager import OutboxManager
+from src.services.http_client import http_client
+from src.services.message_store import externalize_messages, serialize_interactions
 
 class LeadManager:
     """Gerencia leads e prospecção de PMEs"""
@@ -184,7 +186,7 @@ class LeadManager:
             # Consulta ReceitaWS (API gratuita)
             url = f"https://www.receitaws.com.br/v1/cnpj/{clean_cnpj}"
             
-            response = requests.get(url, timeout=10)
+            response = http_client.get(url, timeout=(5, 10))
             
             if response.status_code == 200:
                 data = response.json()
@@ -251,10 +253,32 @@ class LeadManager:
         else:
             return 'Outros'
     
-    def record_interaction(self, lead_id: int, interaction_data: Dict) -> Dict:
-        """Registra uma interação com o lead"""
+    def record_interaction(self, lead_id: int, interaction_data: Dict, outbox: Optional[Dict] = None) -> Dict:
+        """
+        Registra uma interação com o lead
+        
+        Args:
+            lead_id: ID do lead
+            interaction_data: Dados da interação
+            outbox: Envio (channel, payload, dedupe_key) gravado no outbox na mesma transação (opcional)
+        """
         
         try:
+            if outbox and outbox.get('dedupe_key'):
+                existing = OutboxManager.find(outbox['dedupe_key'])
+                if existing:
+                    # Envio já enfileirado: a interação original continua sendo a única
+                    return {
+                        'success': True,
+                        'duplicate': True,
+                        'interaction_id': existing.interaction_id,
+                        'message': 'Envio já enfileirado'
+                    }
+            
+            # Corpos longos vão para o message_store (deduplicados e comprimidos)
+            interaction_data = dict(interaction_data)
+            externalize_messages([interaction_data])
+            
             interaction = LeadInteraction(
                 lead_id=lead_id,
                 interaction_type=interaction_data['interaction_type'],
@@ -269,6 +293,9 @@ class LeadManager:
             
             db.session.add(interaction)
             
+            if outbox:
+                OutboxManager.enqueue(interaction=interaction, **outbox)
+            
             # Atualiza último contato do lead
             lead = Lead.query.get(lead_id)
             if lead:
@@ -295,7 +322,7 @@ class LeadManager:
             LeadInteraction.sent_at.desc()
         ).all()
         
-        return [interaction.to_dict() for interaction in interactions]
+        return serialize_interactions(interactions)
     
     def get_leads_for_follow_up(self, days_since_last_contact: int = 7) -> List[Dict]:
         """Retorna leads que precisam de follow-up"""
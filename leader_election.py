@@ -0,0 +1,280 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from sqlalchemy import case, or_
+from sqlalchemy.exc import IntegrityError
+from src.models.scheduler_lease import db, SchedulerLease
+
+class LeaderElector:
+    """
+    Eleição de um único processo líder via linha de lease no banco
+
+    Cada processo tenta, a cada heartbeat, um UPDATE condicional que só
+    funciona se ele já é o dono ou se o lease expirou. O líder renova o
+    lease; se o processo cair, outro assume quando o lease expirar. Se o
+    líder não conseguir renovar (banco indisponível ou chamada travada) ele
+    se rebaixa antes da expiração, para nunca haver dois líderes ativos: um
+    watchdog confere o tempo desde a última renovação sem depender da
+    thread do heartbeat. Com enabled=False na linha do lease nenhum
+    processo assume (parada do agendador no cluster inteiro).
+    """
+
+    def __init__(self, name: str = 'scheduler', lease_seconds: float = 30.0,
+                 heartbeat_interval: float = 10.0,
+                 on_elected: Optional[Callable[[], None]] = None,
+                 on_revoked: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            name: Nome do lease (um líder por nome)
+            lease_seconds: Validade do lease sem renovação
+            heartbeat_interval: Intervalo entre renovações/tentativas
+            on_elected: Chamado (na thread do eleitor, com app context) ao assumir a liderança
+            on_revoked: Chamado ao perder ou liberar a liderança
+        """
+
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.on_elected = on_elected
+        self.on_revoked = on_revoked
+        self.holder_id = self._new_holder_id()
+        self.is_leader = False
+        self.fencing_token: Optional[int] = None
+        self._last_renewal = 0.0
+        self._state_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._app = None
+        self.stats = {
+            'elections_won': 0,
+            'leadership_lost': 0,
+            'heartbeat_errors': 0,
+            'last_error': None
+        }
+
+    @staticmethod
+    def _new_holder_id() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        if self.running:
+            return
+
+        # Workers criados por fork herdam o objeto: cada processo precisa do próprio ID
+        if f":{os.getpid()}:" not in self.holder_id:
+            self.holder_id = self._new_holder_id()
+
+        self._app = app
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'leader-{self.name}', daemon=True)
+        self._thread.start()
+        self._watchdog = threading.Thread(target=self._watch, name=f'leader-{self.name}-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        """Para de concorrer e libera o lease (outro processo assume no próximo heartbeat)"""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.heartbeat_interval + 5)
+            self._thread = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=5)
+            self._watchdog = None
+
+    def set_enabled(self, enabled: bool) -> bool:
+        """
+        Habilita ou desabilita a liderança no cluster inteiro (coluna enabled do lease)
+
+        Desabilitado, o líder atual se rebaixa no próximo heartbeat e nenhum
+        outro processo assume até ser habilitado de novo.
+
+        Returns:
+            True se a linha do lease foi alterada
+        """
+
+        try:
+            self._ensure_row()
+            values = {'enabled': enabled}
+            if not enabled:
+                values['expires_at'] = datetime.utcnow()
+            updated = SchedulerLease.query.filter_by(name=self.name).update(values, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if not enabled:
+            self._step_down()
+        return bool(updated)
+
+    def _run(self):
+        with self._app.app_context():
+            while not self._stop.is_set():
+                self.heartbeat()
+                self._stop.wait(self.heartbeat_interval)
+
+            if self.is_leader:
+                self._release()
+                self._step_down()
+
+    def _watch(self):
+        """Rebaixa o líder se a renovação atrasou, mesmo com o heartbeat travado numa chamada ao banco"""
+
+        with self._app.app_context():
+            while not self._stop.wait(min(1.0, self.heartbeat_interval / 2)):
+                with self._state_lock:
+                    if self.is_leader and time.monotonic() - self._last_renewal >= self.lease_seconds * 0.8:
+                        print(f"Renovação do lease '{self.name}' atrasada; deixando a liderança")
+                        self._step_down()
+
+    def heartbeat(self) -> bool:
+        """Tenta adquirir ou renovar o lease; retorna se este processo é o líder"""
+
+        # O lease gravado vale a partir do início da chamada, não do retorno
+        started = time.monotonic()
+
+        try:
+            acquired = self._try_acquire()
+        except Exception as e:
+            db.session.rollback()
+            self.stats['heartbeat_errors'] += 1
+            self.stats['last_error'] = str(e)
+            print(f"Erro no heartbeat do lease '{self.name}': {e}")
+
+            # Sem renovar, o lease expira no banco: rebaixa se o próximo heartbeat já chegaria tarde demais
+            elapsed = time.monotonic() - self._last_renewal
+            if self.is_leader and elapsed + self.heartbeat_interval >= self.lease_seconds * 0.8:
+                self._step_down()
+            return self.is_leader
+
+        with self._state_lock:
+            if acquired and time.monotonic() - started < self.lease_seconds * 0.8:
+                self._last_renewal = started
+                if not self.is_leader:
+                    self.is_leader = True
+                    self.stats['elections_won'] += 1
+                    print(f"Processo {self.holder_id} assumiu a liderança de '{self.name}' (token {self.fencing_token})")
+                    self._callback(self.on_elected)
+            elif self.is_leader:
+                # Lease perdido, liderança desabilitada ou renovação que levou quase o lease inteiro
+                self._step_down()
+
+        return self.is_leader
+
+    def _try_acquire(self) -> bool:
+        now = datetime.utcnow()
+        self._ensure_row()
+
+        is_holder = SchedulerLease.holder == self.holder_id
+        updated = SchedulerLease.query.filter(
+            SchedulerLease.name == self.name,
+            SchedulerLease.enabled.isnot(False),
+            or_(is_holder, SchedulerLease.expires_at.is_(None), SchedulerLease.expires_at < now)
+        ).update({
+            # Renovação mantém o início da liderança e o token; troca de dono incrementa o token
+            'acquired_at': case((is_holder, SchedulerLease.acquired_at), else_=now),
+            'fencing_token': case((is_holder, SchedulerLease.fencing_token), else_=SchedulerLease.fencing_token + 1),
+            'holder': self.holder_id,
+            'renewed_at': now,
+            'expires_at': now + timedelta(seconds=self.lease_seconds)
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if updated:
+            self.fencing_token = db.session.query(SchedulerLease.fencing_token).filter_by(name=self.name).scalar()
+            db.session.commit()
+
+        return bool(updated)
+
+    def _ensure_row(self):
+        if db.session.query(SchedulerLease.id).filter_by(name=self.name).first():
+            return
+        try:
+            db.session.add(SchedulerLease(name=self.name, fencing_token=0))
+            db.session.commit()
+        except IntegrityError:
+            # Outro processo criou a linha ao mesmo tempo
+            db.session.rollback()
+
+    def _release(self):
+        try:
+            SchedulerLease.query.filter_by(name=self.name, holder=self.holder_id).update({
+                'expires_at': datetime.utcnow()
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao liberar o lease '{self.name}': {e}")
+
+    def _step_down(self):
+        # Chamado pelo heartbeat, pelo watchdog e por set_enabled: só um rebaixamento executa o callback
+        with self._state_lock:
+            if not self.is_leader:
+                return
+            self.is_leader = False
+            self.stats['leadership_lost'] += 1
+            print(f"Processo {self.holder_id} deixou a liderança de '{self.name}'")
+            self._callback(self.on_revoked)
+
+    @staticmethod
+    def _callback(callback: Optional[Callable[[], None]]):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception as e:
+            print(f"Erro no callback de liderança: {e}")
+
+    def get_status(self) -> Dict:
+        """Estado local do eleitor e a linha de lease atual"""
+
+        try:
+            lease = SchedulerLease.query.filter_by(name=self.name).first()
+            lease_info = lease.to_dict() if lease else None
+        except Exception as e:
+            lease_info = {'error': str(e)}
+
+        return dict(
+            self.stats,
+            name=self.name,
+            process=self.holder_id,
+            running=self.running,
+            is_leader=self.is_leader,
+            fencing_token=self.fencing_token,
+            lease=lease_info
+        )
+
+def start_scheduler_leadership(app) -> LeaderElector:
+    """Concorre à liderança do agendador; só o processo líder roda os agendadores"""
+
+    from src.services.scheduler import scheduler
+    from src.services.due_scheduler import due_scheduler
+
+    def elected():
+        scheduler.start()
+        due_scheduler.start(app)
+
+    def revoked():
+        scheduler.stop()
+        due_scheduler.stop()
+
+    scheduler_elector.on_elected = elected
+    scheduler_elector.on_revoked = revoked
+    scheduler_elector.start(app)
+    return scheduler_elector
+
+scheduler_elector = LeaderElector(
+    'scheduler',
+    lease_seconds=float(os.environ.get('SCHEDULER_LEASE_SECONDS', 30)),
+    heartbeat_interval=float(os.environ.get('SCHEDULER_HEARTBEAT_SECONDS', 10))
+)
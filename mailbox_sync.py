@@ -0,0 +1,62 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class MailboxSyncState(db.Model):
+    __tablename__ = 'mailbox_sync_states'
+
+    id = db.Column(db.Integer, primary_key=True)
+    mailbox = db.Column(db.String(255), unique=True, nullable=False)  # 'usuario@host/INBOX'
+    uidvalidity = db.Column(db.BigInteger)
+    last_uid = db.Column(db.BigInteger, default=0)  # maior UID já processado
+    messages_processed = db.Column(db.Integer, default=0)
+    last_synced_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'mailbox': self.mailbox,
+            'uidvalidity': self.uidvalidity,
+            'last_uid': self.last_uid,
+            'messages_processed': self.messages_processed,
+            'last_synced_at': self.last_synced_at.isoformat() if self.last_synced_at else None,
+            'last_error': self.last_error
+        }
+
+class InboundReply(db.Model):
+    __tablename__ = 'inbound_replies'
+
+    id = db.Column(db.Integer, primary_key=True)
+    message_id = db.Column(db.String(500), unique=True, nullable=False)
+    mailbox = db.Column(db.String(255))
+    uid = db.Column(db.BigInteger)
+    lead_id = db.Column(db.Integer, index=True)
+    from_email = db.Column(db.String(255))
+    subject = db.Column(db.String(500))
+    classification = db.Column(db.String(20))  # 'unsubscribe', 'bounce', 'interested', 'not_interested', 'auto_reply', 'reply'
+    matched_by = db.Column(db.String(20))  # 'message_id', 'sender', None
+    details = db.Column(db.Text)  # JSON string with extra parsing data
+    received_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def get_details(self):
+        return json.loads(self.details) if self.details else {}
+
+    def set_details(self, details_dict):
+        self.details = json.dumps(details_dict)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'message_id': self.message_id,
+            'lead_id': self.lead_id,
+            'from_email': self.from_email,
+            'subject': self.subject,
+            'classification': self.classification,
+            'matched_by': self.matched_by,
+            'details': self.get_details(),
+            'received_at': self.received_at.isoformat() if self.received_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -7,13 +7,26 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
 from src.models.content import ContentTemplate, GeneratedContent, ContentTopic
-from src.models.publication import PublicationChannel, ScheduledPublication, PublicationLog
+from src.models.publication import PublicationChannel, ScheduledPublication, PublicationLog, PublicationStatDaily
 from src.models.lead import Lead, LeadInteraction, LeadSource
+from src.models.campaign import CampaignRun, CampaignSend
+from src.models.outbox import OutboxMessage
+from src.models.personalization_segment import PersonalizationSegment
+from src.models.suppression import SuppressionEntry
+from src.models.mailbox_sync import MailboxSyncState, InboundReply
+from src.models.tracking_event import TrackingEvent, TrackedEmail
+from src.models.content_variant import ContentVariant
+from src.models.message_body import MessageBody
+from src.models.scheduled_job import ScheduledJob
+from src.models.scheduler_lease import SchedulerLease
+from src.models.wordpress_term import WordPressTerm
+from src.models.instagram_media import InstagramMedia
 from src.routes.user import user_bp
 from src.routes.content import content_bp
 from src.routes.publication import publication_bp
 from src.routes.scheduler import scheduler_bp
 from src.routes.lead import lead_bp
+from src.routes.tracking import tracking_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -26,6 +39,7 @@ app.register_blueprint(content_bp, url_prefix='/api/content')
 app.register_blueprint(publication_bp, url_prefix='/api/publication')
 app.register_blueprint(scheduler_bp, url_prefix='/api/scheduler')
 app.register_blueprint(lead_bp, url_prefix='/api/leads')
+app.register_blueprint(tracking_bp, url_prefix='/t')
 
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
@@ -34,6 +48,30 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+# Worker do outbox no próprio processo (em produção, prefira rodar src.services.outbox_worker separado)
+if os.environ.get('OUTBOX_WORKER_IN_PROCESS', 'false').lower() == 'true':
+    from src.services.outbox_worker import start_outbox_worker
+    start_outbox_worker(app)
+
+# Sincronização de respostas por IMAP no próprio processo (ou rode src.services.reply_ingestor separado)
+if os.environ.get('REPLY_INGESTOR_IN_PROCESS', 'false').lower() == 'true':
+    import threading
+    from src.services.reply_ingestor import ReplyIngestor
+
+    reply_ingestor = ReplyIngestor.from_env()
+    if reply_ingestor:
+        def run_reply_ingestor():
+            with app.app_context():
+                reply_ingestor.run(threading.Event(), float(os.environ.get('IMAP_POLL_INTERVAL', '60')))
+
+        threading.Thread(target=run_reply_ingestor, name='reply-ingestor', daemon=True).start()
+
+# Agendador no próprio processo (o mesmo de POST /api/scheduler/start); com vários workers
+# todos concorrem ao lease e só o líder executa
+if os.environ.get('DUE_SCHEDULER_IN_PROCESS', 'false').lower() == 'true':
+    from src.services.leader_election import start_scheduler_leadership
+    start_scheduler_leadership(app)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
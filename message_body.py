@@ -0,0 +1,11 @@
+from src.models.user import db
+from datetime import datetime
+
+class MessageBody(db.Model):
+    __tablename__ = 'message_bodies'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)  # sha256 do texto
+    body = db.deferred(db.Column(db.LargeBinary, nullable=False))  # texto comprimido com zlib
+    size = db.Column(db.Integer)  # tamanho original em caracteres
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
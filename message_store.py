@@ -0,0 +1,238 @@
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.exc import IntegrityError
+from src.models.message_body import db, MessageBody
+
+# Textos menores que isso ficam na própria linha (compressão e indireção não compensam)
+MIN_DEDUPE_CHARS = 256
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode('utf-8'), 6)
+
+def decompress_text(data: Optional[bytes]) -> Optional[str]:
+    return zlib.decompress(data).decode('utf-8') if data else None
+
+def body_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class MessageStore:
+    """
+    Corpos de mensagens deduplicados por hash
+
+    Cada texto distinto é gravado uma vez em message_bodies, comprimido; as
+    interações guardam só o hash (metadata['body_hash']). Leituras passam
+    por um LRU em memória, já que campanhas repetem os mesmos corpos.
+    """
+
+    def __init__(self, cache_size: int = 1000):
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, digest: str, text: str):
+        with self._lock:
+            self._cache[digest] = text
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def store_many(self, texts: Iterable[str]) -> Dict[str, str]:
+        """
+        Grava os textos ainda não armazenados (sem commit)
+
+        O INSERT ignora hashes já gravados (ON CONFLICT DO NOTHING): dois
+        gravadores com o mesmo corpo ao mesmo tempo não derrubam a transação.
+
+        Args:
+            texts: Corpos de mensagem
+
+        Returns:
+            Dict texto -> hash
+        """
+
+        by_hash = {}
+        for text in texts:
+            if text:
+                by_hash.setdefault(body_hash(text), text)
+
+        if not by_hash:
+            return {}
+
+        existing = {
+            digest for (digest,) in db.session.query(MessageBody.content_hash).filter(
+                MessageBody.content_hash.in_(list(by_hash))
+            )
+        }
+
+        new_rows = [
+            {'content_hash': digest, 'body': compress_text(text), 'size': len(text)}
+            for digest, text in by_hash.items() if digest not in existing
+        ]
+        if new_rows:
+            _insert_ignoring_duplicates(new_rows)
+
+        for digest, text in by_hash.items():
+            self._remember(digest, text)
+
+        return {text: digest for digest, text in by_hash.items()}
+
+    def get_many(self, digests: Iterable[str]) -> Dict[str, str]:
+        """Textos por hash (cache primeiro, depois uma consulta para os que faltam)"""
+
+        result = {}
+        missing = []
+
+        with self._lock:
+            for digest in set(digests):
+                if digest in self._cache:
+                    result[digest] = self._cache[digest]
+                else:
+                    missing.append(digest)
+
+        if missing:
+            for digest, data in db.session.query(MessageBody.content_hash, MessageBody.body).filter(
+                MessageBody.content_hash.in_(missing)
+            ):
+                text = decompress_text(data)
+                result[digest] = text
+                self._remember(digest, text)
+
+        return result
+
+    def get(self, digest: str) -> Optional[str]:
+        return self.get_many([digest]).get(digest)
+
+def _insert_ignoring_duplicates(rows: List[Dict]):
+    """INSERT de corpos que ignora content_hash já existente (upsert do dialeto)"""
+
+    table = MessageBody.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        db.session.execute(dialect_insert(table).values(rows).on_conflict_do_nothing(index_elements=['content_hash']))
+    elif dialect == 'mysql':
+        db.session.execute(table.insert().prefix_with('IGNORE').values(rows))
+    else:
+        # Sem upsert no dialeto: um savepoint por linha isola a duplicata
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert().values(**row))
+            except IntegrityError:
+                pass
+
+message_store = MessageStore()
+
+def externalize_messages(interactions_data: List[Dict]):
+    """
+    Move corpos longos de dados de interação para o message_store
+
+    Altera os dicts no lugar: 'message' vira None e o hash vai para
+    metadata['body_hash']. Usado antes de criar as LeadInteraction.
+    """
+
+    long_messages = [
+        data['message'] for data in interactions_data
+        if data.get('message') and len(data['message']) >= MIN_DEDUPE_CHARS
+    ]
+    if not long_messages:
+        return
+
+    hashes = message_store.store_many(long_messages)
+
+    for data in interactions_data:
+        digest = hashes.get(data.get('message'))
+        if digest:
+            data['metadata'] = dict(data.get('metadata') or {}, body_hash=digest)
+            data['message'] = None
+
+def serialize_interactions(interactions) -> List[Dict]:
+    """to_dict() das interações com 'message' preenchido a partir do message_store"""
+
+    items = [interaction.to_dict() for interaction in interactions]
+    digests = [interaction.get_metadata().get('body_hash') for interaction in interactions]
+
+    wanted = [digest for item, digest in zip(items, digests) if digest and not item.get('message')]
+    if wanted:
+        bodies = message_store.get_many(wanted)
+        for item, digest in zip(items, digests):
+            if digest in bodies and not item.get('message'):
+                item['message'] = bodies[digest]
+
+    return items
+
+def benchmark_storage(rows: int = 20000, distinct_bodies: int = 40, body_chars: int = 2400) -> Dict:
+    """
+    Mede tamanho do banco e tempo de varredura de lead_interactions em SQLite,
+    com o corpo inline (formato antigo) e deduplicado/comprimido em message_bodies
+
+    Usa só sqlite3 em arquivos temporários; a varredura lê as colunas de
+    listagem (sem o corpo), como get_lead_interactions filtrando por status.
+    """
+
+    import os
+    import sqlite3
+    import tempfile
+
+    paragraph = 'Identificamos oportunidades de recuperação de créditos de PIS/COFINS para {empresa}. '
+    bodies = [(paragraph.format(empresa=f'Empresa {i}') * (body_chars // len(paragraph) + 1))[:body_chars]
+              for i in range(distinct_bodies)]
+
+    def build(path: str, deduplicated: bool) -> float:
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE lead_interactions (id INTEGER PRIMARY KEY, lead_id INTEGER, status TEXT, '
+            'subject TEXT, message TEXT, interaction_metadata TEXT)'
+        )
+        connection.execute('CREATE TABLE message_bodies (id INTEGER PRIMARY KEY, content_hash TEXT UNIQUE, body BLOB, size INTEGER)')
+
+        hashes = [body_hash(body) for body in bodies]
+        if deduplicated:
+            connection.executemany(
+                'INSERT INTO message_bodies (content_hash, body, size) VALUES (?, ?, ?)',
+                [(digest, compress_text(body), len(body)) for digest, body in zip(hashes, bodies)]
+            )
+        connection.executemany(
+            'INSERT INTO lead_interactions (lead_id, status, subject, message, interaction_metadata) VALUES (?, ?, ?, ?, ?)',
+            [
+                (i, 'sent' if i % 3 else 'queued', f'Proposta {i}',
+                 None if deduplicated else bodies[i % distinct_bodies],
+                 f'{{"body_hash": "{hashes[i % distinct_bodies]}"}}' if deduplicated else '{}')
+                for i in range(rows)
+            ]
+        )
+        connection.commit()
+        connection.execute('VACUUM')
+
+        start = time.perf_counter()
+        for _ in range(5):
+            connection.execute("SELECT id, lead_id, subject FROM lead_interactions WHERE status = 'sent'").fetchall()
+        elapsed = (time.perf_counter() - start) / 5
+        connection.close()
+        return elapsed
+
+    with tempfile.TemporaryDirectory() as directory:
+        inline_path = os.path.join(directory, 'inline.db')
+        dedup_path = os.path.join(directory, 'dedup.db')
+        inline_scan = build(inline_path, deduplicated=False)
+        dedup_scan = build(dedup_path, deduplicated=True)
+
+        return {
+            'rows': rows,
+            'distinct_bodies': distinct_bodies,
+            'inline_db_bytes': os.path.getsize(inline_path),
+            'deduplicated_db_bytes': os.path.getsize(dedup_path),
+            'inline_scan_ms': round(inline_scan * 1000, 2),
+            'deduplicated_scan_ms': round(dedup_scan * 1000, 2)
+        }
+
+if __name__ == '__main__':
+    print(benchmark_storage())
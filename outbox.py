@@ -0,0 +1,50 @@
+from src.models.user import db
+from src.models.lead import LeadInteraction
+from src.models.publication import PublicationLog
+from datetime import datetime
+import json
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox_messages'
+    __table_args__ = (
+        db.Index('ix_outbox_messages_due', 'status', 'available_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # 'email', 'linkedin', 'instagram', 'publication'
+    dedupe_key = db.Column(db.String(120), unique=True, nullable=False)
+    payload = db.Column(db.Text)  # JSON string with delivery data
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'processing', 'sent', 'failed', 'unknown' (entrega não confirmada)
+    attempts = db.Column(db.Integer, default=0)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(80))
+    lease_expires_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    interaction_id = db.Column(db.Integer, db.ForeignKey(LeadInteraction.id))
+    publication_log_id = db.Column(db.Integer, db.ForeignKey('publication_logs.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    interaction = db.relationship(LeadInteraction)
+    publication_log = db.relationship(PublicationLog)
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def set_payload(self, payload_dict):
+        self.payload = json.dumps(payload_dict)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'channel': self.channel,
+            'dedupe_key': self.dedupe_key,
+            'status': self.status,
+            'attempts': self.attempts,
+            'available_at': self.available_at.isoformat() if self.available_at else None,
+            'last_error': self.last_error,
+            'interaction_id': self.interaction_id,
+            'publication_log_id': self.publication_log_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
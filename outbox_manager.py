@@ -0,0 +1,75 @@
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from src.models.outbox import db, OutboxMessage
+
+class OutboxManager:
+    """Grava intenções de envio na mesma transação do registro que as origina"""
+
+    @staticmethod
+    def new_dedupe_key(channel: str) -> str:
+        return f"{channel}:{uuid.uuid4().hex}"
+
+    @staticmethod
+    def find(dedupe_key: str) -> Optional[OutboxMessage]:
+        return OutboxMessage.query.filter_by(dedupe_key=dedupe_key).first()
+
+    @staticmethod
+    def existing_dedupe_keys(dedupe_keys: List[str]) -> Set[str]:
+        """Chaves que já têm mensagem no outbox (uma consulta para o lote)"""
+
+        dedupe_keys = [key for key in dedupe_keys if key]
+        if not dedupe_keys:
+            return set()
+        return {
+            key for (key,) in db.session.query(OutboxMessage.dedupe_key).filter(
+                OutboxMessage.dedupe_key.in_(dedupe_keys)
+            )
+        }
+
+    @staticmethod
+    def enqueue(channel: str, payload: Dict, dedupe_key: Optional[str] = None,
+                interaction=None, publication_log=None,
+                available_at: Optional[datetime] = None) -> OutboxMessage:
+        """
+        Adiciona uma mensagem ao outbox sem fazer commit
+
+        O chamador faz commit junto com a LeadInteraction/PublicationLog, de modo
+        que intenção e registro existem juntos ou não existem.
+
+        Args:
+            channel: Canal de entrega ('email', 'linkedin', 'instagram', 'publication')
+            payload: Dados de entrega do canal
+            dedupe_key: Chave de deduplicação (gerada se omitida)
+            interaction: LeadInteraction associada (opcional)
+            publication_log: PublicationLog associado (opcional)
+            available_at: Primeira tentativa de entrega (padrão: imediata)
+
+        Returns:
+            OutboxMessage existente com a mesma chave ou a nova mensagem
+        """
+
+        dedupe_key = dedupe_key or OutboxManager.new_dedupe_key(channel)
+
+        existing = OutboxManager.find(dedupe_key)
+        if existing:
+            return existing
+
+        message = OutboxMessage(
+            channel=channel,
+            dedupe_key=dedupe_key,
+            available_at=available_at or datetime.utcnow(),
+            interaction=interaction,
+            publication_log=publication_log
+        )
+        message.set_payload(payload)
+
+        db.session.add(message)
+        return message
+
+    @staticmethod
+    def get_stats() -> Dict:
+        """Contagem de mensagens por status"""
+
+        rows = db.session.query(OutboxMessage.status, db.func.count(OutboxMessage.id)).group_by(OutboxMessage.status).all()
+        return {status: count for status, count in rows}
@@ -0,0 +1,243 @@
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import and_, or_
+from src.models.outbox import db, OutboxMessage
+from src.services.channel_backends import get_channel_backend
+from src.services.publication_manager import PublicationManager
+from src.services.suppression_manager import suppression_list
+
+class OutboxWorker:
+    """Reivindica lotes do outbox, entrega pelos backends de canal e marca o resultado"""
+
+    def __init__(self, worker_id: Optional[str] = None, batch_size: int = 50,
+                 lease_seconds: int = 120, max_attempts: int = 5, base_backoff: float = 30):
+        """
+        Args:
+            worker_id: Identificador do worker (hostname:pid por padrão)
+            batch_size: Mensagens reivindicadas por vez
+            lease_seconds: Tempo até uma reivindicação expirar e ser retomada por outro worker
+            max_attempts: Tentativas antes de marcar a mensagem como 'failed'
+            base_backoff: Espera base (segundos) entre tentativas
+        """
+
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+
+    def _due_filter(self, now: datetime):
+        # Pendentes disponíveis ou reivindicações expiradas (worker caiu no meio do lote)
+        return or_(
+            and_(OutboxMessage.status == 'pending', OutboxMessage.available_at <= now),
+            and_(OutboxMessage.status == 'processing', OutboxMessage.lease_expires_at < now)
+        )
+
+    def claim_batch(self) -> List[OutboxMessage]:
+        """Reivindica atomicamente um lote de mensagens via UPDATE condicional"""
+
+        now = datetime.utcnow()
+        claim_token = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"
+
+        candidate_ids = [
+            message_id for (message_id,) in db.session.query(OutboxMessage.id).filter(
+                self._due_filter(now)
+            ).order_by(OutboxMessage.available_at).limit(self.batch_size)
+        ]
+
+        if not candidate_ids:
+            db.session.rollback()
+            return []
+
+        # A condição é reavaliada no UPDATE: linhas levadas por outro worker não são tocadas
+        OutboxMessage.query.filter(
+            OutboxMessage.id.in_(candidate_ids),
+            self._due_filter(now)
+        ).update({
+            'status': 'processing',
+            'claimed_by': claim_token,
+            'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+            'attempts': OutboxMessage.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+
+        return OutboxMessage.query.filter_by(claimed_by=claim_token, status='processing').all()
+
+    def drain_once(self) -> Dict:
+        """Entrega um lote; retorna contagem de enviados, reagendados, falhos e de desfecho desconhecido"""
+
+        messages = self.claim_batch()
+        summary = {'claimed': len(messages), 'sent': 0, 'retried': 0, 'failed': 0, 'unknown': 0, 'lost': 0}
+        if not messages:
+            return summary
+
+        claim_token = messages[0].claimed_by
+        pending = {message.id for message in messages}
+        renew_every = self.lease_seconds / 3
+        last_renewal = time.monotonic()
+
+        for message in messages:
+            pending.discard(message.id)
+
+            # Confirma a posse e estende o lease antes de entregar: se o lease venceu e
+            # outro worker retomou a mensagem, a entrega é dele
+            if not self._renew_leases([message.id], claim_token):
+                summary['lost'] += 1
+                continue
+
+            payload = message.get_payload()
+
+            # Descadastros podem chegar entre o enfileiramento e a entrega
+            matched = suppression_list.check_payload(message.channel, payload)
+            if matched:
+                result = {
+                    'success': False,
+                    'retryable': False,
+                    'error': f'Destinatário na lista de supressão ({matched})'
+                }
+            else:
+                try:
+                    result = get_channel_backend(message.channel).send(payload, message.dedupe_key)
+                except Exception as e:
+                    # O backend pode ter falhado depois de a mensagem sair (queda após o DATA,
+                    # timeout de leitura do POST): reenviar poderia entregar duas vezes
+                    result = {'success': False, 'error': str(e), 'retryable': False, 'unknown': True}
+
+            outcome = self._apply_result(message, claim_token, result)
+            summary[outcome] += 1
+            # Resultado gravado logo após cada entrega: uma queda no meio do lote
+            # não faz outro worker reenviar o que já saiu
+            db.session.commit()
+
+            if pending and time.monotonic() - last_renewal >= renew_every:
+                self._renew_leases(pending, claim_token)
+                last_renewal = time.monotonic()
+
+        return summary
+
+    def _renew_leases(self, message_ids, claim_token: str) -> int:
+        """Estende o lease das mensagens ainda reivindicadas pelo token; retorna quantas continuam dele"""
+
+        renewed = OutboxMessage.query.filter(
+            OutboxMessage.id.in_(list(message_ids)),
+            OutboxMessage.status == 'processing',
+            OutboxMessage.claimed_by == claim_token
+        ).update({
+            'lease_expires_at': datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        }, synchronize_session=False)
+        db.session.commit()
+        return renewed
+
+    def _apply_result(self, message: OutboxMessage, claim_token: str, result: Dict) -> str:
+        """Grava o resultado da entrega (só se a mensagem ainda é do token) e atualiza o registro de origem"""
+
+        now = datetime.utcnow()
+        values = {'claimed_by': None, 'lease_expires_at': None}
+
+        if result.get('success'):
+            values.update(status='sent', sent_at=now, last_error=None)
+            outcome = 'sent'
+        elif result.get('rate_limited'):
+            # Limite de envio não é falha da mensagem: reagenda sem consumir tentativa
+            values.update(
+                status='pending',
+                attempts=OutboxMessage.attempts - 1,
+                available_at=now + timedelta(seconds=result.get('retry_after') or self.base_backoff),
+                last_error=result.get('error')
+            )
+            outcome = 'retried'
+        elif result.get('unknown'):
+            # Desfecho não confirmado: não é repetido automaticamente
+            values.update(status='unknown', last_error=result.get('error'))
+            outcome = 'unknown'
+        else:
+            if message.publication_log_id:
+                retryable = PublicationManager.is_retryable(result)
+            else:
+                retryable = result.get('retryable', True)
+
+            if retryable and message.attempts < self.max_attempts:
+                backoff = self.base_backoff * (2 ** (message.attempts - 1))
+                values.update(
+                    status='pending',
+                    available_at=now + timedelta(seconds=random.uniform(backoff / 2, backoff)),
+                    last_error=result.get('error')
+                )
+                outcome = 'retried'
+            else:
+                values.update(status='failed', last_error=result.get('error'))
+                outcome = 'failed'
+
+        owned = OutboxMessage.query.filter(
+            OutboxMessage.id == message.id,
+            OutboxMessage.status == 'processing',
+            OutboxMessage.claimed_by == claim_token
+        ).update(values, synchronize_session=False)
+
+        if not owned:
+            # Lease perdido durante a entrega: o resultado não sobrescreve a reivindicação de outro worker
+            print(f"Lease da mensagem {message.id} do outbox expirou antes da gravação do resultado")
+            return 'lost'
+
+        if outcome == 'retried':
+            return outcome
+
+        if message.interaction is not None:
+            message.interaction.status = outcome if outcome in ('sent', 'unknown') else 'failed'
+
+        log = message.publication_log
+        if log is not None:
+            log.publication_status = {'sent': 'success', 'unknown': 'unknown'}.get(outcome, 'failed')
+            log.publication_url = result.get('url')
+            log.error_message = result.get('error')
+            log.published_at = now
+            if 'response_data' in result:
+                log.set_response_data(result['response_data'])
+            if outcome == 'sent':
+                log.content.status = 'published'
+                log.content.published_at = now
+
+        return outcome
+
+    def run(self, stop_event: threading.Event, idle_sleep: float = 1.0):
+        """Drena o outbox continuamente até stop_event ser sinalizado"""
+
+        while not stop_event.is_set():
+            try:
+                summary = self.drain_once()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Erro no worker do outbox: {e}")
+                summary = {'claimed': 0}
+
+            if not summary['claimed']:
+                stop_event.wait(idle_sleep)
+
+def start_outbox_worker(app, **worker_options) -> threading.Event:
+    """Inicia um worker em thread daemon; retorna o evento que o interrompe"""
+
+    stop_event = threading.Event()
+
+    def target():
+        with app.app_context():
+            OutboxWorker(**worker_options).run(stop_event)
+
+    threading.Thread(target=target, name='outbox-worker', daemon=True).start()
+    return stop_event
+
+if __name__ == '__main__':
+    from src.main import app
+
+    print("Worker do outbox iniciado. Ctrl+C para parar.")
+    stop = threading.Event()
+    try:
+        with app.app_context():
+            OutboxWorker().run(stop)
+    except KeyboardInterrupt:
+        stop.set()
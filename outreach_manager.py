@@ -1,24 +1,126 @@
-import requests
+import os
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from src.models.lead import db, Lead, LeadInteraction
 from src.models.content import ContentTemplate
+from src.models.campaign import CampaignRun
 from src.services.lead_manager import LeadManager
+from src.services.campaign_run_manager import CampaignRunManager
+from src.services.interaction_writer import InteractionWriter
+from src.services.template_renderer import template_cache
+from src.services.channel_backends import get_channel_backend
+from src.services.outbox_manager import OutboxManager
+from src.services.personalization_cache import personalization_cache
+from src.services.suppression_manager import suppression_list
+from src.services.tracking_manager import new_tracking_id, render_tracked_html
+
+# Variáveis fornecidas na personalização de e-mails
+PERSONALIZATION_VARIABLES = (
+    'nome_contato', 'nome_empresa', 'setor', 'assunto', 'introducao_personalizada',
+    'oportunidade_1', 'oportunidade_2', 'oportunidade_3', 'proposta_valor',
+    'call_to_action', 'nome_consultor', 'empresa', 'contato'
+)
 
 class OutreachManager:
     """Gerencia contato inicial e follow-up com leads"""
     
-    def __init__(self):
+    def __init__(self, deferred_delivery: Optional[bool] = None, language_variant: str = 'pt-BR'):
+        """
+        Args:
+            deferred_delivery: Grava envios no outbox em vez de entregar na hora
+                (padrão: variável de ambiente OUTBOX_ENABLED)
+            language_variant: Variante de idioma/tom dos textos gerados por LLM
+        """
         self.lead_manager = LeadManager()
+        self.run_manager = CampaignRunManager()
+        if deferred_delivery is None:
+            deferred_delivery = os.environ.get('OUTBOX_ENABLED', 'false').lower() == 'true'
+        self.deferred_delivery = deferred_delivery
+        self.language_variant = language_variant
+        # Durante campanhas as interações são gravadas em lote
+        self.interaction_writer: Optional[InteractionWriter] = None
+        # Caches válidos durante a vida do manager (uma campanha)
+        self._templates: Dict[str, Optional[ContentTemplate]] = {}
+        self._sector_personalization: Dict[tuple, Dict] = {}
+    
+    def _record_interaction(self, lead_id: int, interaction_data: Dict, outbox: Optional[Dict] = None) -> Dict:
+        """Registra interação diretamente ou via gravador em lote da campanha"""
+        
+        if self.interaction_writer:
+            return self.interaction_writer.add(lead_id, interaction_data, outbox=outbox)
+        
+        return self.lead_manager.record_interaction(lead_id, interaction_data, outbox=outbox)
+    
+    def _check_suppression(self, lead: Lead, channel: str) -> Optional[Dict]:
+        """Retorna erro se o lead (e-mail, domínio, CNPJ ou perfil) estiver na lista de supressão"""
+        
+        matched = suppression_list.check_lead(lead, channel)
+        if matched:
+            return {
+                'success': False,
+                'suppressed': True,
+                'error': f'Lead na lista de supressão ({matched})'
+            }
+        return None
+    
+    def _deliver(self, channel: str, lead_id: int, payload: Dict, interaction_data: Dict,
+                 dedupe_key: Optional[str] = None) -> Dict:
+        """
+        Entrega a mensagem pelo backend do canal e registra a interação
+        
+        Com entrega adiada, a interação ('queued') e a mensagem do outbox são
+        gravadas na mesma transação e um worker faz a entrega depois. Um envio
+        barrado pelo limite do canal também vai para o outbox, com a primeira
+        tentativa no retry_after informado pelo backend.
+        """
+        
+        if self.deferred_delivery:
+            return self._enqueue_delivery(channel, lead_id, payload, interaction_data, dedupe_key)
+        
+        result = get_channel_backend(channel).send(payload, dedupe_key)
+        
+        if result.get('rate_limited'):
+            # A chave de idempotência já foi reservada: o envio não pode virar falha definitiva
+            available_at = datetime.utcnow() + timedelta(seconds=result.get('retry_after') or 0)
+            return self._enqueue_delivery(channel, lead_id, payload, interaction_data, dedupe_key, available_at)
+        
+        if result['success']:
+            # Registra interação
+            self._record_interaction(lead_id, interaction_data)
+        
+        return result
     
-    def send_initial_email(self, lead_id: int, template_type: str = 'email') -> Dict:
+    def _enqueue_delivery(self, channel: str, lead_id: int, payload: Dict, interaction_data: Dict,
+                          dedupe_key: Optional[str] = None, available_at: Optional[datetime] = None) -> Dict:
+        """Grava a interação ('queued') e a mensagem do outbox para entrega pelo worker"""
+        
+        dedupe_key = dedupe_key or OutboxManager.new_dedupe_key(channel)
+        outbox = {'channel': channel, 'payload': payload, 'dedupe_key': dedupe_key}
+        if available_at:
+            outbox['available_at'] = available_at
+        
+        record = self._record_interaction(lead_id, dict(interaction_data, status='queued'), outbox=outbox)
+        
+        if not record['success']:
+            return record
+        
+        return {
+            'success': True,
+            'queued': True,
+            'message': 'Envio enfileirado para entrega',
+            'dedupe_key': dedupe_key,
+            'available_at': available_at.isoformat() if available_at else None
+        }
+    
+    def send_initial_email(self, lead_id: int, template_type: str = 'email', dedupe_key: Optional[str] = None) -> Dict:
         """
         Envia e-mail inicial para um lead
         
         Args:
             lead_id: ID do lead
             template_type: Tipo de template a usar
+            dedupe_key: Chave de deduplicação do envio (opcional)
         
         Returns:
             Dict com resultado do envio
@@ -29,28 +131,36 @@ class OutreachManager:
             if not lead:
                 return {'success': False, 'error': 'Lead não encontrado'}
             
+            suppressed = self._check_suppression(lead, 'email')
+            if suppressed:
+                return suppressed
+            
             if not lead.email:
                 return {'success': False, 'error': 'Lead não possui e-mail'}
             
             # Busca template de e-mail
-            template = ContentTemplate.query.filter_by(content_type=template_type).first()
+            template = self._get_template(template_type)
             if not template:
                 return {'success': False, 'error': 'Template não encontrado'}
             
             # Personaliza e-mail para o lead
             email_content = self._personalize_email_template(template, lead)
             
-            # Envia e-mail (simulado - integrar com serviço real)
-            result = self._send_email(
-                to_email=lead.email,
-                subject=email_content['subject'],
-                content=email_content['content'],
-                lead_id=lead_id
-            )
+            # Versão HTML com pixel de abertura e links rastreados (se TRACKING_BASE_URL configurado)
+            tracking_id = new_tracking_id()
+            html_content = render_tracked_html(email_content['content'], lead_id, tracking_id)
             
-            if result['success']:
-                # Registra interação
-                self.lead_manager.record_interaction(lead_id, {
+            return self._deliver(
+                'email',
+                lead_id,
+                {
+                    'to_email': lead.email,
+                    'subject': email_content['subject'],
+                    'content': email_content['content'],
+                    'html_content': html_content,
+                    'lead_id': lead_id
+                },
+                {
                     'interaction_type': 'email',
                     'channel': 'email_marketing',
                     'subject': email_content['subject'],
@@ -58,22 +168,24 @@ class OutreachManager:
                     'status': 'sent',
                     'metadata': {
                         'template_used': template.name,
-                        'personalization_data': email_content.get('personalization_data', {})
+                        'personalization_data': email_content.get('personalization_data', {}),
+                        'tracking_id': tracking_id if html_content else None
                     }
-                })
-            
-            return result
+                },
+                dedupe_key
+            )
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def send_linkedin_message(self, lead_id: int, message_type: str = 'initial') -> Dict:
+    def send_linkedin_message(self, lead_id: int, message_type: str = 'initial', dedupe_key: Optional[str] = None) -> Dict:
         """
         Envia mensagem inicial no LinkedIn
         
         Args:
             lead_id: ID do lead
             message_type: Tipo de mensagem (initial, follow_up)
+            dedupe_key: Chave de deduplicação do envio (opcional)
         
         Returns:
             Dict com resultado do envio
@@ -84,22 +196,25 @@ class OutreachManager:
             if not lead:
                 return {'success': False, 'error': 'Lead não encontrado'}
             
+            suppressed = self._check_suppression(lead, 'linkedin')
+            if suppressed:
+                return suppressed
+            
             if not lead.linkedin_profile:
                 return {'success': False, 'error': 'Lead não possui perfil LinkedIn'}
             
             # Gera mensagem personalizada
             message_content = self._generate_linkedin_message(lead, message_type)
             
-            # Envia mensagem (simulado - integrar com API do LinkedIn)
-            result = self._send_linkedin_message(
-                profile_url=lead.linkedin_profile,
-                message=message_content['message'],
-                lead_id=lead_id
-            )
-            
-            if result['success']:
-                # Registra interação
-                self.lead_manager.record_interaction(lead_id, {
+            return self._deliver(
+                'linkedin',
+                lead_id,
+                {
+                    'profile_url': lead.linkedin_profile,
+                    'message': message_content['message'],
+                    'lead_id': lead_id
+                },
+                {
                     'interaction_type': 'linkedin',
                     'channel': 'linkedin_dm',
                     'subject': f'Mensagem LinkedIn - {message_type}',
@@ -109,20 +224,21 @@ class OutreachManager:
                         'message_type': message_type,
                         'profile_url': lead.linkedin_profile
                     }
-                })
-            
-            return result
+                },
+                dedupe_key
+            )
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def send_instagram_dm(self, lead_id: int, message_type: str = 'initial') -> Dict:
+    def send_instagram_dm(self, lead_id: int, message_type: str = 'initial', dedupe_key: Optional[str] = None) -> Dict:
         """
         Envia mensagem direta no Instagram
         
         Args:
             lead_id: ID do lead
             message_type: Tipo de mensagem
+            dedupe_key: Chave de deduplicação do envio (opcional)
         
         Returns:
             Dict com resultado do envio
@@ -133,22 +249,25 @@ class OutreachManager:
             if not lead:
                 return {'success': False, 'error': 'Lead não encontrado'}
             
+            suppressed = self._check_suppression(lead, 'instagram')
+            if suppressed:
+                return suppressed
+            
             if not lead.instagram_profile:
                 return {'success': False, 'error': 'Lead não possui perfil Instagram'}
             
             # Gera mensagem personalizada para Instagram
             message_content = self._generate_instagram_message(lead, message_type)
             
-            # Envia DM (simulado - integrar com API do Instagram)
-            result = self._send_instagram_dm(
-                profile_url=lead.instagram_profile,
-                message=message_content['message'],
-                lead_id=lead_id
-            )
-            
-            if result['success']:
-                # Registra interação
-                self.lead_manager.record_interaction(lead_id, {
+            return self._deliver(
+                'instagram',
+                lead_id,
+                {
+                    'profile_url': lead.instagram_profile,
+                    'message': message_content['message'],
+                    'lead_id': lead_id
+                },
+                {
                     'interaction_type': 'instagram',
                     'channel': 'instagram_dm',
                     'subject': f'DM Instagram - {message_type}',
@@ -158,13 +277,21 @@ class OutreachManager:
                         'message_type': message_type,
                         'profile_url': lead.instagram_profile
                     }
-                })
-            
-            return result
+                },
+                dedupe_key
+            )
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def _get_template(self, template_type: str) -> Optional[ContentTemplate]:
+        """Busca template por tipo uma única vez por campanha"""
+        
+        if template_type not in self._templates:
+            self._templates[template_type] = ContentTemplate.query.filter_by(content_type=template_type).first()
+        
+        return self._templates[template_type]
+    
     def _personalize_email_template(self, template: ContentTemplate, lead: Lead) -> Dict:
         """Personaliza template de e-mail para o lead específico"""
         
@@ -174,21 +301,16 @@ class OutreachManager:
             'nome_empresa': lead.company_name,
             'setor': lead.sector or 'seu setor',
             'assunto': f'Oportunidade de Recuperação Tributária para {lead.company_name}',
-            'introducao_personalizada': self._generate_intro_for_sector(lead.sector, lead.company_size),
-            'oportunidade_1': self._get_opportunity_for_sector(lead.sector, 1),
-            'oportunidade_2': self._get_opportunity_for_sector(lead.sector, 2),
-            'oportunidade_3': self._get_opportunity_for_sector(lead.sector, 3),
-            'proposta_valor': self._generate_value_proposition(lead),
             'call_to_action': 'Que tal agendar uma conversa de 15 minutos para apresentar as oportunidades específicas para sua empresa?',
             'nome_consultor': 'Equipe JusFiscal',
             'empresa': 'JusFiscal',
             'contato': 'WhatsApp: (11) 99999-9999 | E-mail: contato@jusfiscal.com.br'
         }
+        personalization_data.update(self._get_sector_personalization(lead, template.id))
         
-        # Substitui variáveis no template
-        content = template.template_content
-        for key, value in personalization_data.items():
-            content = content.replace(f'{{{key}}}', str(value))
+        # Substitui variáveis no template (compilado uma vez, renderizado em uma passada)
+        compiled = template_cache.get(template, PERSONALIZATION_VARIABLES)
+        content = compiled.render(personalization_data)
         
         return {
             'subject': personalization_data['assunto'],
@@ -196,6 +318,61 @@ class OutreachManager:
             'personalization_data': personalization_data
         }
     
+    def _get_sector_personalization(self, lead: Lead, template_id: Optional[int] = None) -> Dict:
+        """Textos por segmento: gerados por LLM (cache) ou estáticos por setor e porte"""
+        
+        return personalization_cache.get(
+            self._segment_for(lead.sector, lead.company_size, lead.tax_regime, template_id),
+            self._get_static_personalization(lead.sector, lead.company_size)
+        )
+    
+    def _segment_for(self, sector: str, company_size: str, tax_regime: str, template_id: Optional[int]) -> Dict:
+        return {
+            'sector': sector,
+            'company_size': company_size,
+            'tax_regime': tax_regime,
+            'template_id': template_id,
+            'variant': self.language_variant
+        }
+    
+    def _get_static_personalization(self, sector: str, company_size: str) -> Dict:
+        """Textos estáticos que dependem apenas de setor e porte, calculados uma vez por segmento"""
+        
+        key = (sector, company_size)
+        
+        if key not in self._sector_personalization:
+            opportunities = self.SECTOR_OPPORTUNITIES.get(sector, self.DEFAULT_OPPORTUNITIES)
+            self._sector_personalization[key] = {
+                'introducao_personalizada': self._generate_intro_for_sector(sector, company_size),
+                'oportunidade_1': opportunities[0],
+                'oportunidade_2': opportunities[1],
+                'oportunidade_3': opportunities[2],
+                'proposta_valor': self._generate_value_proposition(company_size)
+            }
+        
+        return self._sector_personalization[key]
+    
+    def _prewarm_personalization(self, lead_ids: List[int], template_type: str = 'email') -> Dict:
+        """Gera a personalização dos segmentos distintos da campanha antes dos envios"""
+        
+        template = self._get_template(template_type)
+        if not template or not personalization_cache.enabled:
+            return {'segments': 0}
+        
+        segments = set()
+        for start in range(0, len(lead_ids), 500):
+            segments.update(
+                db.session.query(Lead.sector, Lead.company_size, Lead.tax_regime)
+                .filter(Lead.id.in_(lead_ids[start:start + 500]))
+                .distinct()
+            )
+        
+        return personalization_cache.prewarm([
+            (self._segment_for(sector, company_size, tax_regime, template.id),
+             self._get_static_personalization(sector, company_size))
+            for sector, company_size, tax_regime in segments
+        ])
+    
     def _generate_intro_for_sector(self, sector: str, company_size: str) -> str:
         """Gera introdução personalizada por setor"""
         
@@ -209,46 +386,39 @@ class OutreachManager:
         
         return intros.get(sector, 'Sua empresa pode ter oportunidades interessantes de recuperação de créditos tributários.')
     
-    def _get_opportunity_for_sector(self, sector: str, position: int) -> str:
-        """Retorna oportunidades específicas por setor"""
-        
-        opportunities = {
-            'Indústria': [
-                'Créditos de PIS/COFINS sobre insumos do processo produtivo',
-                'Recuperação de ICMS na base de cálculo do PIS/COFINS',
-                'Créditos de IPI sobre matérias-primas'
-            ],
-            'Comércio': [
-                'ICMS na base de cálculo do PIS/COFINS',
-                'Créditos de PIS/COFINS sobre mercadorias para revenda',
-                'INSS sobre verbas indenizatórias'
-            ],
-            'Serviços': [
-                'INSS sobre verbas indenizatórias (férias, 13º, aviso prévio)',
-                'PIS/COFINS sobre receitas não operacionais',
-                'Revisão de base de cálculo de tributos'
-            ]
-        }
-        
-        sector_opportunities = opportunities.get(sector, [
-            'Revisão de tributos dos últimos 5 anos',
-            'Análise de base de cálculo de impostos',
-            'Verificação de recolhimentos indevidos'
-        ])
-        
-        if position <= len(sector_opportunities):
-            return sector_opportunities[position - 1]
-        else:
-            return 'Outras oportunidades específicas para seu segmento'
+    # Oportunidades específicas por setor
+    SECTOR_OPPORTUNITIES = {
+        'Indústria': [
+            'Créditos de PIS/COFINS sobre insumos do processo produtivo',
+            'Recuperação de ICMS na base de cálculo do PIS/COFINS',
+            'Créditos de IPI sobre matérias-primas'
+        ],
+        'Comércio': [
+            'ICMS na base de cálculo do PIS/COFINS',
+            'Créditos de PIS/COFINS sobre mercadorias para revenda',
+            'INSS sobre verbas indenizatórias'
+        ],
+        'Serviços': [
+            'INSS sobre verbas indenizatórias (férias, 13º, aviso prévio)',
+            'PIS/COFINS sobre receitas não operacionais',
+            'Revisão de base de cálculo de tributos'
+        ]
+    }
+    
+    DEFAULT_OPPORTUNITIES = [
+        'Revisão de tributos dos últimos 5 anos',
+        'Análise de base de cálculo de impostos',
+        'Verificação de recolhimentos indevidos'
+    ]
     
-    def _generate_value_proposition(self, lead: Lead) -> str:
-        """Gera proposta de valor personalizada"""
+    def _generate_value_proposition(self, company_size: str) -> str:
+        """Gera proposta de valor personalizada por porte"""
         
-        if lead.company_size == 'Micro':
+        if company_size == 'Micro':
             return 'Mesmo micro empresas podem recuperar valores entre R$ 10.000 e R$ 100.000, que fazem toda diferença no fluxo de caixa.'
-        elif lead.company_size == 'Pequena':
+        elif company_size == 'Pequena':
             return 'Pequenas empresas como a sua frequentemente recuperam entre R$ 50.000 e R$ 300.000 em créditos tributários.'
-        elif lead.company_size == 'Média':
+        elif company_size == 'Média':
             return 'Médias empresas costumam ter potencial de recuperação entre R$ 200.000 e R$ 1.000.000 ou mais.'
         else:
             return 'PMEs do seu setor frequentemente recuperam valores significativos que impactam positivamente o fluxo de caixa.'
@@ -330,52 +500,12 @@ Qualquer dúvida, é só chamar!
         
         return {'message': message}
     
-    def _send_email(self, to_email: str, subject: str, content: str, lead_id: int) -> Dict:
-        """Envia e-mail (simulado - integrar com serviço real)"""
-        
-        # Aqui você integraria com serviços como SendGrid, Mailchimp, etc.
-        # Por enquanto, simula o envio
-        
-        print(f"📧 E-mail enviado para {to_email}")
-        print(f"Assunto: {subject}")
-        print(f"Lead ID: {lead_id}")
-        
-        return {
-            'success': True,
-            'message': 'E-mail enviado com sucesso (simulado)',
-            'email_id': f'email_{lead_id}_{datetime.now().timestamp()}'
-        }
-    
-    def _send_linkedin_message(self, profile_url: str, message: str, lead_id: int) -> Dict:
-        """Envia mensagem LinkedIn (simulado - integrar com API)"""
-        
-        print(f"💼 Mensagem LinkedIn enviada para {profile_url}")
-        print(f"Lead ID: {lead_id}")
-        
-        return {
-            'success': True,
-            'message': 'Mensagem LinkedIn enviada com sucesso (simulado)',
-            'message_id': f'linkedin_{lead_id}_{datetime.now().timestamp()}'
-        }
-    
-    def _send_instagram_dm(self, profile_url: str, message: str, lead_id: int) -> Dict:
-        """Envia DM Instagram (simulado - integrar com API)"""
-        
-        print(f"📱 DM Instagram enviado para {profile_url}")
-        print(f"Lead ID: {lead_id}")
-        
-        return {
-            'success': True,
-            'message': 'DM Instagram enviado com sucesso (simulado)',
-            'message_id': f'instagram_{lead_id}_{datetime.now().timestamp()}'
-        }
-    
     def run_outreach_campaign(self, campaign_config: Dict) -> Dict:
         """
         Executa campanha de contato inicial
         
         Args:
-            campaign_config: Configuração da campanha
+            campaign_config: Configuração da campanha (run_id opcional para retomar)
         
         Returns:
             Dict com resultado da campanha
@@ -387,49 +517,49 @@ Qualquer dúvida, é só chamar!
             max_leads = campaign_config.get('max_leads', 20)
             channels = campaign_config.get('channels', ['email'])
             
-            qualified_leads = self.lead_manager.get_qualified_leads(min_score, max_leads)
+            run = self.run_manager.start_or_resume(
+                'outreach',
+                # Modo de entrega gravado na execução: a retomada usa o mesmo
+                dict(campaign_config, deferred=self.deferred_delivery),
+                lambda: [lead['id'] for lead in self.lead_manager.get_qualified_leads(min_score, max_leads)],
+                run_id=campaign_config.get('run_id')
+            )
+            
+            def plan_sends(lead: Lead) -> List[tuple]:
+                lead_id = lead.id
+                sends = []
+                # Envia e-mail se configurado e disponível
+                if 'email' in channels and lead.email:
+                    sends.append(('email', 'initial', lambda key: self.send_initial_email(lead_id, dedupe_key=key)))
+                # Envia mensagem LinkedIn se configurado e disponível
+                if 'linkedin' in channels and lead.linkedin_profile:
+                    sends.append(('linkedin', 'initial', lambda key: self.send_linkedin_message(lead_id, dedupe_key=key)))
+                # Envia DM Instagram se configurado e disponível
+                if 'instagram' in channels and lead.instagram_profile:
+                    sends.append(('instagram', 'initial', lambda key: self.send_instagram_dm(lead_id, dedupe_key=key)))
+                return sends
+            
+            # Uma chamada ao LLM por segmento distinto, não por lead
+            personalization = self._prewarm_personalization(run.get_lead_ids()) if 'email' in channels else {'segments': 0}
+            
+            execution = self._execute_run(run, plan_sends, campaign_config.get('write_batch_size', 200))
             
             results = {
-                'total_leads': len(qualified_leads),
-                'email_sent': 0,
-                'linkedin_sent': 0,
-                'instagram_sent': 0,
-                'errors': []
+                'total_leads': run.total_leads,
+                'email_sent': execution['sent'].get('email', 0),
+                'linkedin_sent': execution['sent'].get('linkedin', 0),
+                'instagram_sent': execution['sent'].get('instagram', 0),
+                'skipped': execution['skipped'],
+                'suppressed': execution['suppressed'],
+                'errors': execution['errors'],
+                'interaction_writes': execution['interaction_writes'],
+                'personalization': personalization
             }
             
-            for lead_data in qualified_leads:
-                lead_id = lead_data['id']
-                
-                try:
-                    # Envia e-mail se configurado e disponível
-                    if 'email' in channels and lead_data.get('email'):
-                        email_result = self.send_initial_email(lead_id)
-                        if email_result['success']:
-                            results['email_sent'] += 1
-                        else:
-                            results['errors'].append(f"Lead {lead_id} - Email: {email_result['error']}")
-                    
-                    # Envia mensagem LinkedIn se configurado e disponível
-                    if 'linkedin' in channels and lead_data.get('linkedin_profile'):
-                        linkedin_result = self.send_linkedin_message(lead_id)
-                        if linkedin_result['success']:
-                            results['linkedin_sent'] += 1
-                        else:
-                            results['errors'].append(f"Lead {lead_id} - LinkedIn: {linkedin_result['error']}")
-                    
-                    # Envia DM Instagram se configurado e disponível
-                    if 'instagram' in channels and lead_data.get('instagram_profile'):
-                        instagram_result = self.send_instagram_dm(lead_id)
-                        if instagram_result['success']:
-                            results['instagram_sent'] += 1
-                        else:
-                            results['errors'].append(f"Lead {lead_id} - Instagram: {instagram_result['error']}")
-                
-                except Exception as e:
-                    results['errors'].append(f"Lead {lead_id}: {str(e)}")
-            
             return {
                 'success': True,
+                'run_id': run.id,
+                'run_status': run.status,
                 'campaign_results': results
             }
             
@@ -439,50 +569,53 @@ Qualquer dúvida, é só chamar!
                 'error': str(e)
             }
     
-    def run_follow_up_campaign(self, days_since_contact: int = 7) -> Dict:
-        """Executa campanha de follow-up"""
+    def run_follow_up_campaign(self, days_since_contact: int = 7, run_id: Optional[int] = None) -> Dict:
+        """Executa campanha de follow-up (run_id opcional para retomar)"""
         
         try:
             # Busca leads que precisam de follow-up
-            follow_up_leads = self.lead_manager.get_leads_for_follow_up(days_since_contact)
-            
-            results = {
-                'total_leads': len(follow_up_leads),
-                'follow_ups_sent': 0,
-                'errors': []
-            }
+            run = self.run_manager.start_or_resume(
+                'follow_up',
+                {'days_since_contact': days_since_contact, 'deferred': self.deferred_delivery},
+                lambda: [lead['id'] for lead in self.lead_manager.get_leads_for_follow_up(days_since_contact)],
+                run_id=run_id
+            )
             
-            for lead_data in follow_up_leads:
-                lead_id = lead_data['id']
+            def plan_sends(lead: Lead) -> List[tuple]:
+                lead_id = lead.id
                 
-                try:
-                    # Prioriza canal que teve melhor resposta anterior
-                    last_interactions = self.lead_manager.get_lead_interactions(lead_id)
-                    
-                    if last_interactions:
-                        # Usa o mesmo canal da última interação
-                        last_channel = last_interactions[0]['interaction_type']
-                        
-                        if last_channel == 'email' and lead_data.get('email'):
-                            result = self.send_initial_email(lead_id, 'email_follow_up')
-                        elif last_channel == 'linkedin' and lead_data.get('linkedin_profile'):
-                            result = self.send_linkedin_message(lead_id, 'follow_up')
-                        elif last_channel == 'instagram' and lead_data.get('instagram_profile'):
-                            result = self.send_instagram_dm(lead_id, 'follow_up')
-                        else:
-                            # Fallback para e-mail
-                            result = self.send_initial_email(lead_id, 'email_follow_up')
-                        
-                        if result['success']:
-                            results['follow_ups_sent'] += 1
-                        else:
-                            results['errors'].append(f"Lead {lead_id}: {result['error']}")
+                # Prioriza canal que teve melhor resposta anterior
+                last_interactions = self.lead_manager.get_lead_interactions(lead_id)
                 
-                except Exception as e:
-                    results['errors'].append(f"Lead {lead_id}: {str(e)}")
+                if not last_interactions:
+                    return []
+                
+                # Usa o mesmo canal da última interação
+                last_channel = last_interactions[0]['interaction_type']
+                
+                if last_channel == 'linkedin' and lead.linkedin_profile:
+                    return [('linkedin', 'follow_up', lambda key: self.send_linkedin_message(lead_id, 'follow_up', dedupe_key=key))]
+                elif last_channel == 'instagram' and lead.instagram_profile:
+                    return [('instagram', 'follow_up', lambda key: self.send_instagram_dm(lead_id, 'follow_up', dedupe_key=key))]
+                
+                # E-mail (canal da última interação ou fallback)
+                return [('email', 'follow_up', lambda key: self.send_initial_email(lead_id, 'email_follow_up', dedupe_key=key))]
+            
+            execution = self._execute_run(run, plan_sends)
+            
+            results = {
+                'total_leads': run.total_leads,
+                'follow_ups_sent': sum(execution['sent'].values()),
+                'skipped': execution['skipped'],
+                'suppressed': execution['suppressed'],
+                'errors': execution['errors'],
+                'interaction_writes': execution['interaction_writes']
+            }
             
             return {
                 'success': True,
+                'run_id': run.id,
+                'run_status': run.status,
                 'follow_up_results': results
             }
             
@@ -491,4 +624,99 @@ Qualquer dúvida, é só chamar!
                 'success': False,
                 'error': str(e)
             }
-
+    
+    def _execute_run(self, run: CampaignRun, plan_sends: Callable[[Lead], List[tuple]],
+                     batch_size: int = 200) -> Dict:
+        """
+        Processa os leads pendentes de uma execução em blocos com checkpoint
+        
+        Cada bloco reivindica seus envios (chave lead/canal/etapa) antes de enviar
+        e grava resultados, interações e checkpoint juntos ao final. Uma execução
+        interrompida continua do último checkpoint sem recontatar leads.
+        """
+        
+        lead_ids = run.get_lead_ids()
+        sent = {}
+        errors = []
+        skipped = 0
+        suppressed = 0
+        
+        writer = InteractionWriter(batch_size=batch_size)
+        self.interaction_writer = writer
+        
+        try:
+            while run.processed_leads < len(lead_ids):
+                start = run.processed_leads
+                chunk_ids = lead_ids[start:start + batch_size]
+                
+                leads = Lead.query.filter(Lead.id.in_(chunk_ids)).all()
+                leads_by_id = {lead.id: lead for lead in leads}
+                
+                planned = []
+                for lead_id in chunk_ids:
+                    lead = leads_by_id.get(lead_id)
+                    if not lead:
+                        continue
+                    # Antes de planejar os envios: vale para todos os canais (sem métrica por canal)
+                    if suppression_list.check_lead(lead):
+                        # Descadastrados não geram envios nem registros de falha
+                        suppressed += 1
+                        continue
+                    try:
+                        for channel, step, send in plan_sends(lead):
+                            planned.append((lead_id, channel, step, send))
+                    except Exception as e:
+                        errors.append(f"Lead {lead_id}: {str(e)}")
+                
+                claimed = self.run_manager.claim_sends(
+                    run, [(lead_id, channel, step) for lead_id, channel, step, _ in planned]
+                )
+                chunk_skipped = 0
+                
+                for lead_id, channel, step, send in planned:
+                    key = self.run_manager.idempotency_key(run, lead_id, channel, step)
+                    campaign_send = claimed.get(key)
+                    if campaign_send is None:
+                        # Já enviado (ou em dúvida) em uma tentativa anterior desta execução
+                        chunk_skipped += 1
+                        continue
+                    
+                    try:
+                        result = send(key)
+                    except Exception as e:
+                        result = {'success': False, 'error': str(e)}
+                    
+                    self.run_manager.complete_send(run, campaign_send, result)
+                    
+                    if result['success']:
+                        sent[channel] = sent.get(channel, 0) + 1
+                    else:
+                        errors.append(f"Lead {lead_id} - {channel}: {result.get('error')}")
+                
+                skipped += chunk_skipped
+                self.run_manager.record_skipped(run, chunk_skipped)
+                
+                flush_result = writer.flush()
+                if not flush_result['success']:
+                    raise Exception(f"Gravação de interações: {flush_result['error']}")
+                
+                self.run_manager.checkpoint(run, start + len(chunk_ids))
+            
+            self.run_manager.finish(run)
+        
+        except Exception as e:
+            db.session.rollback()
+            errors.append(str(e))
+            self.run_manager.finish(run, error=str(e))
+        
+        finally:
+            self.interaction_writer = None
+            writer.flush()
+        
+        return {
+            'sent': sent,
+            'skipped': skipped,
+            'suppressed': suppressed,
+            'errors': errors,
+            'interaction_writes': writer.stats
+        }
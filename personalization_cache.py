@@ -0,0 +1,346 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from src.models.personalization_segment import db, PersonalizationSegment
+
+# Incrementar ao mudar o prompt: segmentos de versões anteriores passam a ser regerados
+PROMPT_VERSION = 1
+
+PERSONALIZATION_FIELDS = (
+    'introducao_personalizada', 'oportunidade_1', 'oportunidade_2', 'oportunidade_3', 'proposta_valor'
+)
+
+class PersonalizationCache:
+    """
+    Textos de personalização gerados por LLM uma vez por segmento
+
+    Segmento = (setor, porte, regime tributário, template, variante). Leads leem
+    do cache em memória; segmentos ausentes, expirados ou de versão antiga de
+    prompt recebem o texto estático e são regerados em segundo plano.
+
+    A cada revalidate_seconds, uma consulta por updated_at descarta da memória
+    os segmentos alterados no banco (invalidate ou regeração em outro processo);
+    a próxima leitura os carrega de novo.
+    """
+
+    # Volta na janela de updated_at: commits atrasados e relógios desalinhados entre servidores
+    REVALIDATE_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self, enabled: Optional[bool] = None, ttl_days: int = 30, max_workers: int = 4,
+                 revalidate_seconds: float = 30.0):
+        """
+        Args:
+            enabled: Usa o LLM (padrão: variável PERSONALIZATION_LLM_ENABLED)
+            ttl_days: Validade do texto gerado
+            max_workers: Chamadas simultâneas ao LLM
+            revalidate_seconds: Intervalo entre conferências de segmentos alterados no banco
+        """
+
+        if enabled is None:
+            enabled = os.environ.get('PERSONALIZATION_LLM_ENABLED', 'false').lower() == 'true'
+        self.enabled = enabled
+        self.ttl = timedelta(days=ttl_days)
+        self.max_workers = max_workers
+        self.model = os.environ.get('PERSONALIZATION_MODEL', 'gpt-4')
+
+        self.revalidate_seconds = revalidate_seconds
+
+        self._entries: Dict[str, Dict] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._last_validation = time.monotonic()
+        self._validated_at = datetime.utcnow()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._client = None
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'llm_calls': 0, 'llm_errors': 0, 'revalidations': 0}
+
+    @staticmethod
+    def segment_key(segment: Dict) -> str:
+        return '|'.join(str(segment.get(field) or '') for field in
+                        ('sector', 'company_size', 'tax_regime', 'template_id', 'variant'))
+
+    def _is_stale(self, entry: Dict) -> bool:
+        return entry['version'] < PROMPT_VERSION or entry['expires_at'] <= datetime.utcnow()
+
+    def _needs_refresh(self, entry: Dict) -> bool:
+        # Após uma falha do LLM, espera retry_at antes de tentar o segmento de novo
+        return self._is_stale(entry) and (entry['retry_at'] is None or entry['retry_at'] <= datetime.utcnow())
+
+    def _remember(self, key: str, content: Dict, version: int, expires_at: datetime,
+                  retry_at: Optional[datetime] = None):
+        with self._lock:
+            self._entries[key] = {'content': content, 'version': version, 'expires_at': expires_at,
+                                  'retry_at': retry_at}
+
+    def _revalidate_if_due(self):
+        """Descarta da memória os segmentos alterados no banco desde a última conferência"""
+
+        with self._lock:
+            if time.monotonic() - self._last_validation < self.revalidate_seconds or not self._entries:
+                return
+            # Só uma thread confere; as demais seguem com o cache atual
+            self._last_validation = time.monotonic()
+            since = self._validated_at - self.REVALIDATE_OVERLAP
+
+        checked_at = datetime.utcnow()
+        try:
+            changed = [
+                key for (key,) in db.session.query(PersonalizationSegment.segment_key).filter(
+                    PersonalizationSegment.updated_at >= since
+                )
+            ]
+        except Exception as e:
+            print(f"Erro ao revalidar o cache de personalização: {e}")
+            return
+
+        with self._lock:
+            for key in changed:
+                self._entries.pop(key, None)
+            self._validated_at = checked_at
+            self.stats['revalidations'] += 1
+
+    def _load(self, key: str) -> Dict:
+        """Carrega o segmento do banco; ausência fica registrada para não consultar de novo"""
+
+        row = PersonalizationSegment.query.filter_by(segment_key=key).first()
+        if row and row.content:
+            self._remember(key, row.get_content(), row.version or 0, row.expires_at or datetime.min)
+        else:
+            self._remember(key, {}, 0, datetime.min)
+        return self._entries[key]
+
+    def get(self, segment: Dict, fallback: Dict) -> Dict:
+        """
+        Retorna a personalização do segmento
+
+        Args:
+            segment: Dict com sector, company_size, tax_regime, template_id e variant
+            fallback: Textos estáticos usados enquanto o segmento não tem texto gerado
+
+        Returns:
+            Dict com os campos de PERSONALIZATION_FIELDS
+        """
+
+        if not self.enabled:
+            return fallback
+
+        self._revalidate_if_due()
+
+        key = self.segment_key(segment)
+        entry = self._entries.get(key) or self._load(key)
+
+        if self._needs_refresh(entry):
+            self._schedule_refresh(segment, fallback)
+
+        if not entry['content']:
+            self.stats['misses'] += 1
+            return fallback
+
+        self.stats['stale' if self._is_stale(entry) else 'hits'] += 1
+        return dict(fallback, **entry['content'])
+
+    def prewarm(self, items: List[Tuple[Dict, Dict]]) -> Dict:
+        """
+        Gera antes da campanha os segmentos ausentes ou desatualizados
+
+        As chamadas ao LLM rodam em paralelo; as gravações ficam na thread chamadora.
+        O número de chamadas é limitado ao número de segmentos distintos.
+
+        Args:
+            items: Pares (segmento, textos estáticos)
+
+        Returns:
+            Dict com contagem de segmentos, gerados, em cache e falhos
+        """
+
+        summary = {'segments': 0, 'generated': 0, 'cached': 0, 'failed': 0}
+        if not self.enabled:
+            return summary
+
+        self._revalidate_if_due()
+
+        unique = {self.segment_key(segment): (segment, fallback) for segment, fallback in items}
+        summary['segments'] = len(unique)
+
+        missing_keys = [key for key in unique if key not in self._entries]
+        for start in range(0, len(missing_keys), 500):
+            chunk = missing_keys[start:start + 500]
+            rows = PersonalizationSegment.query.filter(PersonalizationSegment.segment_key.in_(chunk)).all()
+            for row in rows:
+                self._remember(row.segment_key, row.get_content(), row.version or 0, row.expires_at or datetime.min)
+
+        to_generate = [
+            (key, segment, fallback) for key, (segment, fallback) in unique.items()
+            if key not in self._entries or self._needs_refresh(self._entries[key])
+        ]
+        summary['cached'] = len(unique) - len(to_generate)
+
+        if not to_generate:
+            return summary
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(key, segment, executor.submit(self._generate, segment, fallback))
+                       for key, segment, fallback in to_generate]
+
+            for key, segment, future in futures:
+                content, error = future.result()
+                self._store(segment, content, error)
+                summary['generated' if content else 'failed'] += 1
+
+        return summary
+
+    def _schedule_refresh(self, segment: Dict, fallback: Dict):
+        """Regera o segmento em segundo plano, uma vez por processo"""
+
+        key = self.segment_key(segment)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='personalization')
+
+        try:
+            from flask import current_app
+            app = current_app._get_current_object()
+        except RuntimeError:
+            # Fora de um app context não há como gravar; tenta de novo na próxima leitura
+            self._refreshing.discard(key)
+            return
+
+        def refresh():
+            try:
+                with app.app_context():
+                    content, error = self._generate(segment, fallback)
+                    self._store(segment, content, error)
+            except Exception as e:
+                print(f"Erro ao atualizar personalização do segmento {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+    def _get_client(self):
+        if self._client is None:
+            import openai
+            self._client = openai.OpenAI()
+        return self._client
+
+    def _generate(self, segment: Dict, fallback: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+        """Chama o LLM para um segmento; retorna (conteúdo, erro)"""
+
+        prompt = f"""
+        Escreva textos de prospecção para uma empresa brasileira de recuperação de créditos tributários.
+
+        Segmento do lead:
+        - Setor: {segment.get('sector') or 'não informado'}
+        - Porte: {segment.get('company_size') or 'não informado'}
+        - Regime tributário: {segment.get('tax_regime') or 'não informado'}
+        - Variante de idioma: {segment.get('variant') or 'pt-BR'}
+
+        Use como referência (mesmo tom e tamanho):
+        {json.dumps(fallback, ensure_ascii=False, indent=2)}
+
+        Não cite nomes de pessoas ou empresas. Responda apenas com um objeto JSON com as chaves:
+        {', '.join(PERSONALIZATION_FIELDS)}
+        """
+
+        self.stats['llm_calls'] += 1
+        try:
+            response = self._get_client().chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "Você é um especialista em recuperação de créditos tributários e prospecção B2B para PMEs brasileiras."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=600
+            )
+
+            text = response.choices[0].message.content
+            data = json.loads(text[text.index('{'):text.rindex('}') + 1])
+
+            content = {field: str(data[field]).strip() for field in PERSONALIZATION_FIELDS}
+            if not all(content.values()):
+                raise ValueError('Resposta com campos vazios')
+
+            return content, None
+
+        except Exception as e:
+            self.stats['llm_errors'] += 1
+            return None, str(e)
+
+    def _store(self, segment: Dict, content: Optional[Dict], error: Optional[str] = None):
+        """Grava o texto gerado (ou o erro) no banco e no cache em memória"""
+
+        key = self.segment_key(segment)
+        row = PersonalizationSegment.query.filter_by(segment_key=key).first()
+
+        if row is None:
+            row = PersonalizationSegment(
+                segment_key=key,
+                sector=segment.get('sector'),
+                company_size=segment.get('company_size'),
+                tax_regime=segment.get('tax_regime'),
+                template_id=segment.get('template_id'),
+                variant=segment.get('variant')
+            )
+            try:
+                # Outro processo pode gravar o mesmo segmento entre a leitura e o INSERT:
+                # o savepoint isola a duplicata e a linha dele é atualizada
+                with db.session.begin_nested():
+                    db.session.add(row)
+            except IntegrityError:
+                row = PersonalizationSegment.query.filter_by(segment_key=key).one()
+
+        if content:
+            row.set_content(content)
+            row.version = PROMPT_VERSION
+            row.source = 'llm'
+            row.generated_at = datetime.utcnow()
+            row.expires_at = row.generated_at + self.ttl
+            row.last_error = None
+        else:
+            row.last_error = error
+
+        db.session.commit()
+
+        # Evita chamar o LLM a cada lead enquanto o erro persiste
+        retry_at = None if content else datetime.utcnow() + timedelta(minutes=30)
+        self._remember(key, row.get_content(), row.version or 0, row.expires_at or datetime.min, retry_at)
+
+    def invalidate(self, template_id: Optional[int] = None, sector: Optional[str] = None) -> int:
+        """
+        Marca segmentos como expirados para serem regerados; retorna quantos
+
+        Este processo limpa a memória na hora; os demais descartam os segmentos
+        alterados na próxima revalidação (até revalidate_seconds).
+        """
+
+        query = PersonalizationSegment.query
+        if template_id is not None:
+            query = query.filter(PersonalizationSegment.template_id == template_id)
+        if sector is not None:
+            query = query.filter(PersonalizationSegment.sector == sector)
+
+        now = datetime.utcnow()
+        count = query.update({'expires_at': now, 'updated_at': now}, synchronize_session=False)
+        db.session.commit()
+
+        with self._lock:
+            self._entries.clear()
+
+        return count
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, enabled=self.enabled, segments_in_memory=len(self._entries),
+                    prompt_version=PROMPT_VERSION, revalidate_seconds=self.revalidate_seconds)
+
+personalization_cache = PersonalizationCache(
+    revalidate_seconds=float(os.environ.get('PERSONALIZATION_REVALIDATE_SECONDS', 30))
+)
@@ -0,0 +1,45 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class PersonalizationSegment(db.Model):
+    __tablename__ = 'personalization_segments'
+
+    id = db.Column(db.Integer, primary_key=True)
+    segment_key = db.Column(db.String(300), unique=True, nullable=False)
+    sector = db.Column(db.String(100))
+    company_size = db.Column(db.String(50))
+    tax_regime = db.Column(db.String(50))
+    template_id = db.Column(db.Integer)
+    variant = db.Column(db.String(20), default='pt-BR')  # variante de idioma/tom
+    version = db.Column(db.Integer, default=1)  # versão do prompt que gerou o texto
+    content = db.Column(db.Text)  # JSON string with personalization fields
+    source = db.Column(db.String(20), default='llm')  # 'llm', 'static'
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_content(self):
+        return json.loads(self.content) if self.content else {}
+
+    def set_content(self, content_dict):
+        self.content = json.dumps(content_dict, ensure_ascii=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'segment_key': self.segment_key,
+            'sector': self.sector,
+            'company_size': self.company_size,
+            'tax_regime': self.tax_regime,
+            'template_id': self.template_id,
+            'variant': self.variant,
+            'version': self.version,
+            'content': self.get_content(),
+            'source': self.source,
+            'generated_at': self.generated_at.isoformat() if self.generated_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'last_error': self.last_error
+        }
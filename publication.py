@@ -1,6 +1,8 @@
 from src.models.user import db
 from datetime import datetime
+from sqlalchemy import and_, event, inspect, select
 import json
+import zlib
 
 class PublicationChannel(db.Model):
     __tablename__ = 'publication_channels'
@@ -10,6 +12,7 @@ class PublicationChannel(db.Model):
     channel_type = db.Column(db.String(50), nullable=False)  # 'linkedin', 'wordpress', 'email'
     api_config = db.Column(db.Text)  # JSON string with API configuration
     is_active = db.Column(db.Boolean, default=True)
+    config_version = db.Column(db.Integer, nullable=False, default=1)  # incrementado quando nome/tipo/config/status mudam
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -19,17 +22,38 @@ class PublicationChannel(db.Model):
     def set_api_config(self, config_dict):
         self.api_config = json.dumps(config_dict)
 
+# Campos guardados pelo cache de canais (channel_registry): mudar qualquer um invalida a entrada
+CHANNEL_CACHED_FIELDS = ('name', 'channel_type', 'api_config', 'is_active')
+
+@event.listens_for(PublicationChannel, 'before_update')
+def _publication_channel_updating(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in CHANNEL_CACHED_FIELDS):
+        # Incremento no próprio UPDATE: seguro com vários processos alterando o canal
+        target.config_version = PublicationChannel.config_version + 1
+
+def _initial_attempt_time(context):
+    # A primeira tentativa é no horário agendado; novas tentativas movem next_attempt_at
+    return context.get_current_parameters().get('scheduled_time')
+
 class ScheduledPublication(db.Model):
     __tablename__ = 'scheduled_publications'
+    __table_args__ = (
+        db.Index('ix_scheduled_publications_due', 'status', 'next_attempt_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     content_id = db.Column(db.Integer, db.ForeignKey('generated_content.id'), nullable=False)
     channel_id = db.Column(db.Integer, db.ForeignKey('publication_channels.id'), nullable=False)
     scheduled_time = db.Column(db.DateTime, nullable=False)
-    status = db.Column(db.String(20), default='scheduled')  # 'scheduled', 'published', 'failed', 'cancelled'
+    status = db.Column(db.String(20), default='scheduled')  # 'scheduled', 'processing', 'published', 'failed', 'dead', 'cancelled'
     published_at = db.Column(db.DateTime)
     publication_url = db.Column(db.String(500))
     error_message = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=_initial_attempt_time)
+    claimed_by = db.Column(db.String(80))
+    lease_expires_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     content = db.relationship('GeneratedContent', backref='scheduled_publications')
@@ -41,9 +65,11 @@ class PublicationLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content_id = db.Column(db.Integer, db.ForeignKey('generated_content.id'), nullable=False)
     channel_id = db.Column(db.Integer, db.ForeignKey('publication_channels.id'), nullable=False)
-    publication_status = db.Column(db.String(20), nullable=False)  # 'success', 'failed'
+    publication_status = db.Column(db.String(20), nullable=False)  # 'success', 'failed', 'unknown' (desfecho não confirmado pelo site)
     publication_url = db.Column(db.String(500))
-    response_data = db.Column(db.Text)  # JSON string with API response
+    post_id = db.Column(db.String(100), index=True)  # ID do post na plataforma (liga métricas sincronizadas ao log)
+    response_data = db.deferred(db.Column(db.Text))  # JSON string with API response (registros antigos)
+    response_data_compressed = db.deferred(db.Column(db.LargeBinary))  # JSON comprimido com zlib
     error_message = db.Column(db.Text)
     published_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -51,8 +77,97 @@ class PublicationLog(db.Model):
     channel = db.relationship('PublicationChannel', backref='publication_logs')
     
     def get_response_data(self):
+        if self.response_data_compressed:
+            return json.loads(zlib.decompress(self.response_data_compressed).decode('utf-8'))
         return json.loads(self.response_data) if self.response_data else {}
     
     def set_response_data(self, data_dict):
-        self.response_data = json.dumps(data_dict)
+        self.response_data_compressed = zlib.compress(json.dumps(data_dict, separators=(',', ':')).encode('utf-8'), 6)
+        self.response_data = None
+
+
+class PublicationStatDaily(db.Model):
+    __tablename__ = 'publication_stats_daily'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'channel_id', 'status', 'content_type', name='uq_publication_stats_daily_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    channel_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # publication_status do log
+    content_type = db.Column(db.String(50), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'channel_id': self.channel_id,
+            'status': self.status,
+            'content_type': self.content_type,
+            'count': self.count
+        }
+
+def _log_content_type(connection, log):
+    content = log.__dict__.get('content')
+    if content is not None:
+        return content.content_type or ''
+    table = db.metadata.tables['generated_content']
+    return connection.execute(
+        select(table.c.content_type).where(table.c.id == log.content_id)
+    ).scalar() or ''
+
+def _bump_daily_stat(connection, day, channel_id, status, content_type, delta):
+    """Soma delta ao balde (dia, canal, status, tipo) com um upsert"""
+    
+    table = PublicationStatDaily.__table__
+    values = {'day': day, 'channel_id': channel_id, 'status': status, 'content_type': content_type}
+    
+    if connection.dialect.name in ('sqlite', 'postgresql'):
+        if connection.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        connection.execute(
+            dialect_insert(table).values(count=delta, **values).on_conflict_do_update(
+                index_elements=list(values), set_={'count': table.c.count + delta}
+            )
+        )
+        return
+    
+    bucket = and_(*[table.c[column] == value for column, value in values.items()])
+    if not connection.execute(table.update().where(bucket).values(count=table.c.count + delta)).rowcount:
+        connection.execute(table.insert().values(count=delta, **values))
+
+def _log_day(published_at):
+    return (published_at or datetime.utcnow()).date()
+
+@event.listens_for(PublicationLog, 'after_insert')
+def _publication_log_inserted(mapper, connection, target):
+    _bump_daily_stat(connection, _log_day(target.published_at), target.channel_id,
+                     target.publication_status, _log_content_type(connection, target), 1)
+
+@event.listens_for(PublicationLog, 'after_update')
+def _publication_log_updated(mapper, connection, target):
+    # Log pendente do outbox que virou 'success'/'failed': move a contagem de balde
+    state = inspect(target)
+    status_history = state.attrs.publication_status.history
+    date_history = state.attrs.published_at.history
+    if not status_history.has_changes() and not date_history.has_changes():
+        return
+    
+    old_status = status_history.deleted[0] if status_history.deleted else target.publication_status
+    old_published_at = date_history.deleted[0] if date_history.deleted else target.published_at
+    old_day, new_day = _log_day(old_published_at), _log_day(target.published_at)
+    
+    if old_status == target.publication_status and old_day == new_day:
+        return
+    
+    content_type = _log_content_type(connection, target)
+    _bump_daily_stat(connection, old_day, target.channel_id, old_status, content_type, -1)
+    _bump_daily_stat(connection, new_day, target.channel_id, target.publication_status, content_type, 1)
 
+@event.listens_for(PublicationLog, 'after_delete')
+def _publication_log_deleted(mapper, connection, target):
+    _bump_daily_stat(connection, _log_day(target.published_at), target.channel_id,
+                     target.publication_status, _log_content_type(connection, target), -1)
@@ -1,10 +1,33 @@
-import requests
 import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Empty, Queue
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+from sqlalchemy import and_, case, func, or_
 from src.models.publication import db, PublicationChannel, ScheduledPublication, PublicationLog
 from src.models.content import GeneratedContent
 from src.services.instagram_manager import InstagramManager
+from src.services.smtp_backend import SMTPConnectionPool, build_message
+from src.services.outbox_manager import OutboxManager
+from src.services.rate_limiter import channel_keys, get_rate_limiter, reserve_send
+from src.services.http_client import http_client
+from src.services.circuit_breaker import publication_breaker
+from src.services.wordpress_taxonomy import wordpress_taxonomy
+from src.services.wordpress_batch import WordPressBatchClient
+from src.services.channel_registry import ChannelEntry, channel_registry
+from src.services import publication_stats, variant_renderer
+from src.services.due_scheduler import PUBLICATION, due_scheduler
+
+# Pools SMTP por canal de e-mail, reaproveitados entre publicações
+_smtp_pools: Dict[int, tuple] = {}
+_smtp_pools_lock = threading.Lock()
 
 class PublicationManager:
     """Gerencia publicações em diferentes canais"""
@@ -12,20 +35,23 @@ class PublicationManager:
     def __init__(self):
         pass
     
-    def publish_content(self, content_id: int, channel_id: int) -> Dict:
+    def publish_content(self, content_id: int, channel_id: int, deferred: bool = False,
+                        dedupe_key: Optional[str] = None) -> Dict:
         """
         Publica conteúdo em um canal específico
         
         Args:
             content_id: ID do conteúdo a ser publicado
             channel_id: ID do canal de publicação
+            deferred: Grava a intenção no outbox e deixa a entrega para o worker
+            dedupe_key: Chave de deduplicação da publicação adiada (opcional)
         
         Returns:
             Dict com resultado da publicação
         """
         
         content = GeneratedContent.query.get(content_id)
-        channel = PublicationChannel.query.get(channel_id)
+        channel = channel_registry.get(channel_id)
         
         if not content or not channel:
             return {'success': False, 'error': 'Conteúdo ou canal não encontrado'}
@@ -33,36 +59,17 @@ class PublicationManager:
         if not channel.is_active:
             return {'success': False, 'error': 'Canal inativo'}
         
+        if channel.channel_type not in self.SUPPORTED_CHANNEL_TYPES:
+            return {'success': False, 'error': 'Tipo de canal não suportado'}
+        
+        if deferred:
+            return self._enqueue_publication(content, channel, dedupe_key)
+        
         try:
-            if channel.channel_type == 'linkedin':
-                result = self._publish_to_linkedin(content, channel)
-            elif channel.channel_type == 'instagram':
-                result = self._publish_to_instagram(content, channel)
-            elif channel.channel_type == 'wordpress':
-                result = self._publish_to_wordpress(content, channel)
-            elif channel.channel_type == 'email':
-                result = self._send_email(content, channel)
-            else:
-                return {'success': False, 'error': 'Tipo de canal não suportado'}
+            result = self._dispatch(content, channel)
             
             # Log da publicação
-            log = PublicationLog(
-                content_id=content_id,
-                channel_id=channel_id,
-                publication_status='success' if result['success'] else 'failed',
-                publication_url=result.get('url'),
-                error_message=result.get('error')
-            )
-            
-            if 'response_data' in result:
-                log.set_response_data(result['response_data'])
-            
-            db.session.add(log)
-            
-            # Atualiza status do conteúdo se publicado com sucesso
-            if result['success']:
-                content.status = 'published'
-                content.published_at = datetime.utcnow()
+            self._record_publication(content, channel, result)
             
             db.session.commit()
             
@@ -81,7 +88,180 @@ class PublicationManager:
             
             return {'success': False, 'error': str(e)}
     
-    def _publish_to_linkedin(self, content: GeneratedContent, channel: PublicationChannel) -> Dict:
+    SUPPORTED_CHANNEL_TYPES = ('linkedin', 'instagram', 'wordpress', 'email')
+    
+    def publish_to_channels(self, content_id: int, channel_ids: List[int], max_workers: int = 8) -> Dict:
+        """
+        Publica um conteúdo em vários canais ao mesmo tempo
+        
+        Conteúdo, canais e variantes pré-renderizadas são carregados uma vez;
+        as chamadas às APIs rodam em paralelo e todos os logs são gravados em
+        uma única transação. A latência total fica próxima à do canal mais lento.
+        
+        Args:
+            content_id: ID do conteúdo
+            channel_ids: IDs dos canais de publicação
+            max_workers: Chamadas simultâneas
+        
+        Returns:
+            Dict com o resultado por canal
+        """
+        
+        content = GeneratedContent.query.get(content_id)
+        if not content:
+            return {'success': False, 'error': 'Conteúdo não encontrado'}
+        
+        channel_ids = list(dict.fromkeys(channel_ids))
+        channels = channel_registry.get_many(channel_ids)
+        
+        started = time.monotonic()
+        results: Dict[int, Dict] = {}
+        jobs = []
+        variants = variant_renderer.get_variants(content)
+        
+        for channel_id in channel_ids:
+            channel = channels.get(channel_id)
+            if not channel:
+                results[channel_id] = {'success': False, 'error': 'Canal não encontrado'}
+            elif not channel.is_active:
+                results[channel_id] = {'success': False, 'error': 'Canal inativo'}
+            elif channel.channel_type not in self.SUPPORTED_CHANNEL_TYPES:
+                results[channel_id] = {'success': False, 'error': 'Tipo de canal não suportado'}
+            else:
+                # Variantes lidas na thread chamadora: as threads só fazem I/O
+                variant = variants[channel.channel_type]
+                if channel.channel_type == 'wordpress':
+                    variant = dict(variant, terms=self._wordpress_terms(channel.get_api_config(), variant))
+                jobs.append((channel, variant))
+        
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)), thread_name_prefix='fan-out') as executor:
+                futures = {
+                    executor.submit(self._dispatch_with_breaker, content, channel, variant): channel
+                    for channel, variant in jobs
+                }
+                for future in as_completed(futures):
+                    channel = futures[future]
+                    try:
+                        results[channel.id] = future.result()
+                    except Exception as e:
+                        results[channel.id] = {'success': False, 'error': str(e)}
+        
+        try:
+            for channel, _ in jobs:
+                self._record_publication(content, channel, results[channel.id])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao gravar logs da publicação do conteúdo {content_id}: {e}")
+        
+        channel_results = [
+            {
+                'channel_id': channel_id,
+                'channel_type': channels[channel_id].channel_type if channel_id in channels else None,
+                'success': results[channel_id]['success'],
+                'url': results[channel_id].get('url'),
+                'error': results[channel_id].get('error'),
+                'duration_ms': results[channel_id].get('duration_ms')
+            }
+            for channel_id in channel_ids
+        ]
+        published = sum(1 for result in channel_results if result['success'])
+        
+        return {
+            'success': published > 0,
+            'content_id': content_id,
+            'published': published,
+            'failed': len(channel_results) - published,
+            'results': channel_results,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1)
+        }
+    
+    def _dispatch(self, content: GeneratedContent, channel: PublicationChannel,
+                  variant: Optional[Dict] = None) -> Dict:
+        """Executa a chamada ao canal (apenas I/O, sem gravar no banco)"""
+        
+        if channel.channel_type == 'linkedin':
+            return self._publish_to_linkedin(content, channel, variant)
+        elif channel.channel_type == 'instagram':
+            return self._publish_to_instagram(content, channel, variant)
+        elif channel.channel_type == 'wordpress':
+            return self._publish_to_wordpress(content, channel, variant)
+        elif channel.channel_type == 'email':
+            return self._send_email(content, channel, variant)
+        else:
+            return {'success': False, 'error': 'Tipo de canal não suportado', 'retryable': False}
+    
+    def _render_variant(self, content: GeneratedContent, channel_type: str) -> Dict:
+        """Texto do conteúdo no formato do canal (pré-renderizado ao salvar o conteúdo)"""
+        
+        return variant_renderer.get_variant(content, channel_type)
+    
+    def _record_publication(self, content: GeneratedContent, channel: PublicationChannel, result: Dict) -> PublicationLog:
+        """Adiciona o log da publicação à sessão e atualiza o conteúdo (sem commit)"""
+        
+        log = PublicationLog(
+            content_id=content.id,
+            channel_id=channel.id,
+            publication_status='success' if result['success'] else ('unknown' if result.get('unknown') else 'failed'),
+            publication_url=result.get('url'),
+            post_id=result.get('post_id'),
+            error_message=result.get('error')
+        )
+        
+        if 'response_data' in result:
+            log.set_response_data(result['response_data'])
+        
+        db.session.add(log)
+        
+        # Atualiza status do conteúdo se publicado com sucesso
+        if result['success']:
+            content.status = 'published'
+            content.published_at = datetime.utcnow()
+        
+        return log
+    
+    def _enqueue_publication(self, content: GeneratedContent, channel: PublicationChannel,
+                             dedupe_key: Optional[str] = None) -> Dict:
+        """Grava o log pendente e a mensagem do outbox na mesma transação"""
+        
+        existing = OutboxManager.find(dedupe_key) if dedupe_key else None
+        if existing:
+            return {
+                'success': True,
+                'queued': True,
+                'duplicate': True,
+                'publication_log_id': existing.publication_log_id,
+                'outbox_id': existing.id,
+                'message': 'Publicação já enfileirada'
+            }
+        
+        log = PublicationLog(
+            content_id=content.id,
+            channel_id=channel.id,
+            publication_status='pending'
+        )
+        db.session.add(log)
+        
+        message = OutboxManager.enqueue(
+            'publication',
+            {'content_id': content.id, 'channel_id': channel.id},
+            dedupe_key=dedupe_key,
+            publication_log=log
+        )
+        
+        db.session.commit()
+        
+        return {
+            'success': True,
+            'queued': True,
+            'publication_log_id': message.publication_log_id,
+            'outbox_id': message.id,
+            'message': 'Publicação enfileirada para entrega'
+        }
+    
+    def _publish_to_linkedin(self, content: GeneratedContent, channel: PublicationChannel,
+                             variant: Optional[Dict] = None) -> Dict:
         """Publica conteúdo no LinkedIn"""
         
         config = channel.get_api_config()
@@ -92,17 +272,7 @@ class PublicationManager:
             return {'success': False, 'error': 'Configuração do LinkedIn incompleta'}
         
         # Prepara o conteúdo para LinkedIn
-        post_text = f"{content.title}\n\n{content.content}"
-        
-        # Limita o tamanho do post (LinkedIn tem limite de caracteres)
-        if len(post_text) > 1300:
-            post_text = post_text[:1297] + "..."
-        
-        # Adiciona hashtags se disponível
-        keywords = content.get_keywords()
-        if keywords:
-            hashtags = " ".join([f"#{keyword.replace(' ', '')}" for keyword in keywords[:5]])
-            post_text += f"\n\n{hashtags}"
+        post_text = (variant or self._render_variant(content, 'linkedin'))['text']
         
         # Dados para a API do LinkedIn
         post_data = {
@@ -127,13 +297,20 @@ class PublicationManager:
             'X-Restli-Protocol-Version': '2.0.0'
         }
         
+        limited = reserve_send('linkedin', person_id)
+        if limited:
+            return limited
+        
         try:
-            response = requests.post(
+            response = http_client.post(
                 'https://api.linkedin.com/v2/ugcPosts',
                 headers=headers,
                 json=post_data
             )
             
+            # Ajusta o ritmo da conta conforme 429/cabeçalhos de limite
+            get_rate_limiter().record_response(channel_keys('linkedin', person_id), response.status_code, response.headers)
+            
             if response.status_code == 201:
                 response_data = response.json()
                 post_id = response_data.get('id')
@@ -142,18 +319,21 @@ class PublicationManager:
                 return {
                     'success': True,
                     'url': post_url,
+                    'post_id': post_id,
                     'response_data': response_data
                 }
             else:
                 return {
                     'success': False,
-                    'error': f'Erro na API do LinkedIn: {response.status_code} - {response.text}'
+                    'error': f'Erro na API do LinkedIn: {response.status_code} - {response.text}',
+                    'status_code': response.status_code
                 }
                 
         except Exception as e:
-            return {'success': False, 'error': f'Erro ao conectar com LinkedIn: {str(e)}'}
+            return {'success': False, 'error': f'Erro ao conectar com LinkedIn: {str(e)}', 'retryable': True}
     
-    def _publish_to_instagram(self, content: GeneratedContent, channel: PublicationChannel) -> Dict:
+    def _publish_to_instagram(self, content: GeneratedContent, channel: PublicationChannel,
+                              variant: Optional[Dict] = None) -> Dict:
         """Publica conteúdo no Instagram"""
         
         config = channel.get_api_config()
@@ -163,25 +343,13 @@ class PublicationManager:
         if not access_token or not page_id:
             return {'success': False, 'error': 'Configuração do Instagram incompleta'}
         
-        instagram_manager = InstagramManager(access_token, page_id)
+        # Cliente reaproveitado entre publicações quando o canal vem do cache
+        instagram_manager = channel.client() if isinstance(channel, ChannelEntry) else InstagramManager(access_token, page_id)
         
         # Prepara o conteúdo para Instagram
-        post_text = f"{content.title}\n\n{content.content}"
-        
-        # Limita o tamanho do post (Instagram tem limite de caracteres)
-        if len(post_text) > 2200:
-            post_text = post_text[:2197] + "..."
-        
-        # Gera hashtags específicas para conteúdo tributário
-        hashtags = InstagramManager.generate_hashtags_for_tax_content()
-        
-        # Adiciona hashtags das keywords do conteúdo
-        keywords = content.get_keywords()
-        if keywords:
-            for keyword in keywords[:5]:
-                clean_keyword = keyword.replace(' ', '').lower()
-                if clean_keyword not in hashtags:
-                    hashtags.append(clean_keyword)
+        variant = variant or self._render_variant(content, 'instagram')
+        post_text = variant['caption']
+        hashtags = variant['hashtags']
         
         # Verifica se há imagem configurada no canal
         image_url = config.get('default_image_url')
@@ -191,21 +359,22 @@ class PublicationManager:
                 result = instagram_manager.publish_post(
                     content=post_text,
                     image_url=image_url,
-                    hashtags=hashtags[:30]  # Instagram permite até 30 hashtags
+                    hashtags=hashtags
                 )
             else:
                 # Publica como story se não há imagem
                 result = instagram_manager.publish_post(
                     content=post_text,
-                    hashtags=hashtags[:30]
+                    hashtags=hashtags
                 )
             
             return result
             
         except Exception as e:
-            return {'success': False, 'error': f'Erro ao publicar no Instagram: {str(e)}'}
+            return {'success': False, 'error': f'Erro ao publicar no Instagram: {str(e)}', 'retryable': True}
     
-    def _publish_to_wordpress(self, content: GeneratedContent, channel: PublicationChannel) -> Dict:
+    def _publish_to_wordpress(self, content: GeneratedContent, channel: PublicationChannel,
+                              variant: Optional[Dict] = None) -> Dict:
         """Publica conteúdo no WordPress"""
         
         config = channel.get_api_config()
@@ -216,17 +385,11 @@ class PublicationManager:
         if not all([site_url, username, password]):
             return {'success': False, 'error': 'Configuração do WordPress incompleta'}
         
-        # Dados para a API do WordPress
-        post_data = {
-            'title': content.title,
-            'content': content.content,
-            'status': 'publish',
-            'categories': [1],  # Categoria padrão
-            'tags': content.get_keywords()
-        }
+        variant = variant or self._render_variant(content, 'wordpress')
+        post_data = self._wordpress_post_data(config, variant)
         
         try:
-            response = requests.post(
+            response = http_client.post(
                 f'{site_url}/wp-json/wp/v2/posts',
                 auth=(username, password),
                 json=post_data
@@ -239,110 +402,625 @@ class PublicationManager:
                 return {
                     'success': True,
                     'url': post_url,
+                    'post_id': str(response_data.get('id')),
                     'response_data': response_data
                 }
             else:
                 return {
                     'success': False,
-                    'error': f'Erro na API do WordPress: {response.status_code} - {response.text}'
+                    'error': f'Erro na API do WordPress: {response.status_code} - {response.text}',
+                    'status_code': response.status_code
                 }
                 
         except Exception as e:
-            return {'success': False, 'error': f'Erro ao conectar com WordPress: {str(e)}'}
+            return {'success': False, 'error': f'Erro ao conectar com WordPress: {str(e)}', 'retryable': True}
+    
+    def _wordpress_post_data(self, config: Dict, variant: Dict) -> Dict:
+        """Dados para a API do WordPress (tags e categorias por ID)"""
+        
+        terms = variant.get('terms') or self._wordpress_terms(config, variant)
+        
+        return {
+            'title': variant['title'],
+            'content': variant['content'],
+            'status': 'publish',
+            **terms
+        }
+    
+    def publish_wordpress_batch(self, content_ids: List[int], channel_id: int) -> Dict:
+        """
+        Publica vários conteúdos em um site WordPress com a API de lote
+        
+        Os posts vão em lotes de /wp-json/batch/v1 (tamanho limitado pelo
+        servidor); sites sem a API recebem requisições avulsas em paralelo.
+        Cada resposta do lote vira o PublicationLog do seu conteúdo, e todos
+        os logs são gravados em uma única transação.
+        
+        Args:
+            content_ids: IDs dos conteúdos (na ordem de publicação)
+            channel_id: ID do canal WordPress
+        
+        Returns:
+            Dict com o modo usado ('batch' ou 'single') e o resultado por conteúdo
+        """
+        
+        channel = channel_registry.get(channel_id)
+        
+        if not channel or channel.channel_type != 'wordpress':
+            return {'success': False, 'error': 'Canal WordPress não encontrado'}
+        
+        if not channel.is_active:
+            return {'success': False, 'error': 'Canal inativo'}
+        
+        config = channel.get_api_config()
+        if not all([config.get('site_url'), config.get('username'), config.get('password')]):
+            return {'success': False, 'error': 'Configuração do WordPress incompleta'}
+        
+        content_ids = list(dict.fromkeys(content_ids))
+        contents = {
+            content.id: content
+            for content in GeneratedContent.query.filter(GeneratedContent.id.in_(content_ids))
+        }
+        
+        started = time.monotonic()
+        results: Dict[int, Dict] = {}
+        found = [contents[content_id] for content_id in content_ids if content_id in contents]
+        variants = {content.id: self._render_variant(content, 'wordpress') for content in found}
+        
+        # Tags de todos os posts resolvidas juntas: termos novos são criados uma vez para o lote
+        wordpress_taxonomy.resolve(config, 'tags', [tag for variant in variants.values() for tag in variant.get('tags') or []])
+        posts = [self._wordpress_post_data(config, variants[content.id]) for content in found]
+        
+        client = WordPressBatchClient(config, max_workers=self._channel_concurrency(channel))
+        wait = publication_breaker.allow(channel.id)
+        
+        if wait is not None:
+            post_results = [
+                {'success': False, 'error': f'Circuito do canal {channel.name} aberto', 'retryable': True, 'circuit_open': True}
+                for _ in found
+            ]
+        else:
+            post_results = client.create_posts(posts)
+            
+            if any(result['success'] for result in post_results):
+                publication_breaker.record_success(channel.id)
+            elif any(self.is_retryable(result) or result.get('unknown') for result in post_results):
+                publication_breaker.record_failure(channel.id, post_results[0].get('error'))
+            else:
+                publication_breaker.release(channel.id)
+        
+        logs = {}
+        try:
+            for content, result in zip(found, post_results):
+                results[content.id] = result
+                logs[content.id] = self._record_publication(content, channel, result)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logs = {}
+            print(f"Erro ao gravar logs do lote WordPress do canal {channel_id}: {e}")
+        
+        content_results = []
+        for content_id in content_ids:
+            result = results.get(content_id) or {'success': False, 'error': 'Conteúdo não encontrado'}
+            log = logs.get(content_id)
+            content_results.append({
+                'content_id': content_id,
+                'success': result['success'],
+                'url': result.get('url'),
+                'error': result.get('error'),
+                'unknown': bool(result.get('unknown')),
+                'publication_log_id': log.id if log else None
+            })
+        published = sum(1 for result in content_results if result['success'])
+        
+        return {
+            'success': published > 0,
+            'channel_id': channel_id,
+            'mode': client.mode,
+            'published': published,
+            'failed': len(content_results) - published,
+            'results': content_results,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1)
+        }
+    
+    def _wordpress_terms(self, config: Dict, variant: Dict) -> Dict:
+        """
+        IDs de tags e categorias do post (cache local; o site só é chamado para termos novos)
+        
+        Args:
+            config: api_config do canal (categories: nomes ou IDs; sem ela vale a categoria padrão do site)
+            variant: Variante 'wordpress' do conteúdo
+        
+        Returns:
+            Dict com 'tags' e, se configuradas, 'categories'
+        """
+        
+        terms = {}
+        
+        tags = wordpress_taxonomy.resolve(config, 'tags', variant.get('tags') or [])
+        if not tags['success']:
+            # Sem as tags o post ainda é publicado
+            print(f"Tags não resolvidas em {config.get('site_url')}: {tags.get('error')}")
+        terms['tags'] = tags['ids']
+        
+        category_names = config.get('categories') or []
+        if category_names:
+            categories = wordpress_taxonomy.resolve(config, 'categories', category_names)
+            if categories['ids']:
+                terms['categories'] = categories['ids']
+        
+        return terms
     
-    def _send_email(self, content: GeneratedContent, channel: PublicationChannel) -> Dict:
+    def _send_email(self, content: GeneratedContent, channel: PublicationChannel,
+                    variant: Optional[Dict] = None) -> Dict:
         """Envia conteúdo por e-mail"""
         
         config = channel.get_api_config()
+        pool = self._get_smtp_pool(channel.id, config)
+        
+        if not pool:
+            # Sem SMTP configurado no canal, retorna sucesso simulado
+            return {
+                'success': True,
+                'message': 'E-mail enviado com sucesso (simulado)'
+            }
+        
+        from_email = config.get('from_email')
+        recipients = config.get('recipients', [])
         
-        # Aqui você pode integrar com serviços como SendGrid, Mailchimp, etc.
-        # Por enquanto, retorna sucesso simulado
+        if not from_email or not recipients:
+            return {'success': False, 'error': 'Configuração de e-mail incompleta'}
+        
+        # Mesma mensagem para todos: vários RCPT por sessão, destinatários só no envelope
+        variant = variant or self._render_variant(content, 'email')
+        message = build_message(from_email, from_email, variant['subject'], variant['body'])
+        result = pool.send_bulk(message, from_email, recipients)
+        
+        if result['success']:
+            return {
+                'success': True,
+                'message': f"E-mail enviado para {result['delivered']} destinatários",
+                'response_data': result
+            }
+        
+        if any(status.get('unknown') for status in result['recipients'].values()):
+            # Conexão caiu depois do MAIL FROM: parte dos destinatários pode ter recebido
+            return {
+                'success': False,
+                'error': 'Conexão SMTP perdida durante o envio; entrega não confirmada',
+                'response_data': result,
+                'retryable': False,
+                'unknown': True
+            }
         
         return {
-            'success': True,
-            'message': 'E-mail enviado com sucesso (simulado)'
+            'success': False,
+            'error': 'Falha ao enviar e-mail para todos os destinatários',
+            'response_data': result,
+            'retryable': True
         }
     
+    def _get_smtp_pool(self, channel_id: int, config: Dict) -> Optional[SMTPConnectionPool]:
+        """Retorna o pool SMTP do canal, recriado se a configuração mudar"""
+        
+        signature = json.dumps({k: v for k, v in config.items() if k.startswith('smtp_')}, sort_keys=True)
+        
+        # Publicações agendadas rodam em threads: um único pool por canal
+        with _smtp_pools_lock:
+            cached = _smtp_pools.get(channel_id)
+            
+            if cached and cached[0] == signature:
+                return cached[1]
+            
+            if cached:
+                cached[1].close()
+            
+            pool = SMTPConnectionPool.from_config(config)
+            _smtp_pools[channel_id] = (signature, pool) if pool else None
+            return pool
+    
     def schedule_publication(self, content_id: int, channel_id: int, scheduled_time: datetime) -> Dict:
         """Agenda uma publicação"""
         
         scheduled_pub = ScheduledPublication(
             content_id=content_id,
             channel_id=channel_id,
-            scheduled_time=scheduled_time
+            scheduled_time=scheduled_time,
+            next_attempt_at=scheduled_time
         )
         
         db.session.add(scheduled_pub)
         db.session.commit()
         
+        # Acorda o agendador se esta publicação vence antes do próximo item
+        due_scheduler.notify(PUBLICATION, scheduled_pub.id, scheduled_pub.next_attempt_at)
+        
         return {
             'success': True,
             'scheduled_id': scheduled_pub.id,
             'message': 'Publicação agendada com sucesso'
         }
     
-    def process_scheduled_publications(self):
-        """Processa publicações agendadas que estão prontas"""
+    # Publicações simultâneas por canal (sobrescreva com 'max_concurrency' na configuração do canal)
+    DEFAULT_CHANNEL_CONCURRENCY = {'linkedin': 2, 'instagram': 2, 'wordpress': 4, 'email': 4}
+    
+    # Tentativas antes do dead-letter e backoff entre elas (segundos, com jitter)
+    MAX_PUBLICATION_ATTEMPTS = 5
+    RETRY_BASE_BACKOFF = 60
+    RETRY_MAX_BACKOFF = 3600
+    
+    @staticmethod
+    def _due_publications_filter(now: datetime):
+        # Agendadas/reagendadas vencidas ou reivindicações expiradas (processo caiu no meio do lote)
+        return or_(
+            and_(ScheduledPublication.status == 'scheduled', ScheduledPublication.next_attempt_at <= now),
+            and_(ScheduledPublication.status == 'processing', ScheduledPublication.lease_expires_at < now)
+        )
+    
+    def claim_scheduled_publications(self, worker_id: str, batch_size: int = 100,
+                                     lease_seconds: int = 300) -> List[ScheduledPublication]:
+        """
+        Reivindica atomicamente um lote de publicações vencidas
+        
+        O UPDATE condicional reavalia o filtro, então dois processos nunca
+        reivindicam a mesma linha.
+        
+        Args:
+            worker_id: Identificador do processo que reivindica
+            batch_size: Máximo de publicações no lote
+            lease_seconds: Tempo até a reivindicação expirar e a linha voltar a ficar disponível
+        
+        Returns:
+            Publicações reivindicadas ('processing')
+        """
         
         now = datetime.utcnow()
+        claim_token = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+        
+        candidate_ids = [
+            pub_id for (pub_id,) in db.session.query(ScheduledPublication.id).filter(
+                self._due_publications_filter(now)
+            ).order_by(ScheduledPublication.next_attempt_at).limit(batch_size)
+        ]
+        
+        if not candidate_ids:
+            db.session.rollback()
+            return []
+        
+        # Reivindicação expirada conta como tentativa (o processo pode ter publicado antes de cair);
+        # as que já esgotaram as tentativas vão para o dead-letter em vez de publicar de novo
+        expired = and_(ScheduledPublication.status == 'processing', ScheduledPublication.lease_expires_at < now)
+        reclaimed_attempts = func.coalesce(ScheduledPublication.attempts, 0) + 1
+        
+        ScheduledPublication.query.filter(
+            ScheduledPublication.id.in_(candidate_ids),
+            expired,
+            reclaimed_attempts >= self.MAX_PUBLICATION_ATTEMPTS
+        ).update({
+            'status': 'dead',
+            'attempts': reclaimed_attempts,
+            'error_message': 'Reivindicação expirada sem resultado gravado',
+            'claimed_by': None,
+            'lease_expires_at': None
+        }, synchronize_session=False)
+        
+        ScheduledPublication.query.filter(
+            ScheduledPublication.id.in_(candidate_ids),
+            self._due_publications_filter(now)
+        ).update({
+            'status': 'processing',
+            'attempts': case((expired, reclaimed_attempts), else_=ScheduledPublication.attempts),
+            'claimed_by': claim_token,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds)
+        }, synchronize_session=False)
+        db.session.commit()
+        
+        return ScheduledPublication.query.filter_by(claimed_by=claim_token, status='processing').all()
+    
+    def process_scheduled_publications(self, batch_size: int = 100, max_workers: int = 16,
+                                       lease_seconds: int = 300) -> List[Dict]:
+        """
+        Processa publicações agendadas que estão prontas
+        
+        Reivindica lotes até não haver publicações vencidas. As chamadas aos
+        canais rodam em paralelo (com limite por canal); as gravações no banco
+        ficam na thread chamadora.
+        
+        Args:
+            batch_size: Publicações reivindicadas por lote
+            max_workers: Threads de publicação
+            lease_seconds: Validade da reivindicação
+        
+        Returns:
+            Lista com o resultado de cada publicação
+        """
         
-        scheduled_pubs = ScheduledPublication.query.filter(
-            ScheduledPublication.scheduled_time <= now,
-            ScheduledPublication.status == 'scheduled'
-        ).all()
+        from flask import current_app
         
+        app = current_app._get_current_object()
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
         results = []
         
-        for pub in scheduled_pubs:
-            try:
-                result = self.publish_content(pub.content_id, pub.channel_id)
+        renew_every = lease_seconds / 3
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='publisher') as executor:
+            while True:
+                claimed = self.claim_scheduled_publications(worker_id, batch_size, lease_seconds)
+                if not claimed:
+                    break
                 
-                if result['success']:
-                    pub.status = 'published'
-                    pub.published_at = datetime.utcnow()
-                    pub.publication_url = result.get('url')
-                else:
-                    pub.status = 'failed'
-                    pub.error_message = result.get('error')
+                claim_token = claimed[0].claimed_by
+                pubs = {pub.id: pub for pub in claimed}
                 
-                db.session.commit()
-                results.append({
-                    'scheduled_id': pub.id,
-                    'success': result['success'],
-                    'error': result.get('error')
-                })
+                # Uma fila por canal, drenada por até N "faixas" em paralelo
+                channel_queues: Dict[int, deque] = {}
+                for pub in claimed:
+                    channel_queues.setdefault(pub.channel_id, deque()).append((pub.id, pub.content_id, pub.channel_id))
                 
-            except Exception as e:
-                pub.status = 'failed'
-                pub.error_message = str(e)
-                db.session.commit()
+                outcomes = Queue()
+                futures = []
+                for channel_id, channel_queue in channel_queues.items():
+                    channel = channel_registry.get(channel_id)
+                    for _ in range(min(self._channel_concurrency(channel), len(channel_queue))):
+                        futures.append(executor.submit(self._drain_channel_queue, app, channel_queue, outcomes))
                 
-                results.append({
-                    'scheduled_id': pub.id,
-                    'success': False,
-                    'error': str(e)
-                })
+                # Grava cada resultado assim que chega e renova a reivindicação dos pendentes
+                pending = set(pubs)
+                last_renewal = time.monotonic()
+                
+                while pending:
+                    try:
+                        pub_id, result = outcomes.get(timeout=renew_every)
+                        pending.discard(pub_id)
+                        results.append(self._finish_scheduled_publication(pubs[pub_id], claim_token, result))
+                    except Empty:
+                        if all(future.done() for future in futures) and outcomes.empty():
+                            break
+                    
+                    if pending and time.monotonic() - last_renewal >= renew_every:
+                        self._renew_leases(pending, claim_token, lease_seconds)
+                        last_renewal = time.monotonic()
+                
+                if pending:
+                    # Faixa interrompida: devolve os itens para a próxima execução
+                    self._release_claims(pending, claim_token)
         
         return results
     
-    def get_publication_stats(self, days: int = 30) -> Dict:
-        """Retorna estatísticas de publicação"""
+    def _renew_leases(self, pub_ids, claim_token: str, lease_seconds: int):
+        ScheduledPublication.query.filter(
+            ScheduledPublication.id.in_(list(pub_ids)),
+            ScheduledPublication.claimed_by == claim_token
+        ).update({
+            'lease_expires_at': datetime.utcnow() + timedelta(seconds=lease_seconds)
+        }, synchronize_session=False)
+        db.session.commit()
+    
+    def _release_claims(self, pub_ids, claim_token: str):
+        ScheduledPublication.query.filter(
+            ScheduledPublication.id.in_(list(pub_ids)),
+            ScheduledPublication.claimed_by == claim_token
+        ).update({
+            'status': 'scheduled',
+            'claimed_by': None,
+            'lease_expires_at': None
+        }, synchronize_session=False)
+        db.session.commit()
+    
+    def _channel_concurrency(self, channel: Optional[PublicationChannel]) -> int:
+        if channel is None:
+            return 1
+        configured = channel.get_api_config().get('max_concurrency')
+        return max(1, int(configured or self.DEFAULT_CHANNEL_CONCURRENCY.get(channel.channel_type, 2)))
+    
+    def _drain_channel_queue(self, app, channel_queue: deque, outcomes: Queue):
+        """Publica itens da fila de um canal (executa em thread; só leitura no banco)"""
+        
+        with app.app_context():
+            while True:
+                try:
+                    pub_id, content_id, channel_id = channel_queue.popleft()
+                except IndexError:
+                    break
+                
+                try:
+                    content = GeneratedContent.query.get(content_id)
+                    channel = channel_registry.get(channel_id)
+                    
+                    if not content or not channel:
+                        result = {'success': False, 'error': 'Conteúdo ou canal não encontrado'}
+                    elif not channel.is_active:
+                        result = {'success': False, 'error': 'Canal inativo'}
+                    else:
+                        result = self._dispatch_with_breaker(content, channel)
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+                
+                outcomes.put((pub_id, result))
+    
+    def _dispatch_with_breaker(self, content: GeneratedContent, channel: PublicationChannel,
+                               variant: Optional[Dict] = None) -> Dict:
+        """Publica respeitando o circuit breaker do canal"""
+        
+        wait = publication_breaker.allow(channel.id)
+        if wait is not None:
+            # Canal fora do ar: não chama a API e reagenda sem consumir tentativa
+            return {
+                'success': False,
+                'error': f'Circuito do canal {channel.name} aberto',
+                'retryable': True,
+                'circuit_open': True,
+                'retry_after': wait
+            }
+        
+        started = time.monotonic()
+        try:
+            result = self._dispatch(content, channel, variant)
+        except Exception as e:
+            result = {'success': False, 'error': str(e), 'retryable': True}
+        result['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+        
+        if result['success']:
+            publication_breaker.record_success(channel.id)
+        elif self.is_retryable(result) and not result.get('rate_limited'):
+            publication_breaker.record_failure(channel.id, result.get('error'))
+        else:
+            publication_breaker.release(channel.id)
+        
+        return result
+    
+    # Status HTTP que indicam falha transitória do canal
+    RETRYABLE_STATUS_CODES = (408, 425, 429, 500, 502, 503, 504)
+    TRANSIENT_ERROR_MARKERS = ('timeout', 'timed out', 'temporarily', 'connection', '"is_transient":true', '"is_transient": true')
+    
+    @classmethod
+    def is_retryable(cls, result: Dict) -> bool:
+        """Classifica a falha como transitória (nova tentativa) ou permanente"""
+        
+        if 'retryable' in result:
+            return bool(result['retryable'])
+        
+        if result.get('status_code'):
+            return result['status_code'] in cls.RETRYABLE_STATUS_CODES
+        
+        error = (result.get('error') or '').lower()
+        return any(marker in error for marker in cls.TRANSIENT_ERROR_MARKERS)
+    
+    def _retry_delay(self, attempts: int) -> float:
+        backoff = min(self.RETRY_MAX_BACKOFF, self.RETRY_BASE_BACKOFF * (2 ** (attempts - 1)))
+        return random.uniform(backoff / 2, backoff)
+    
+    def _finish_scheduled_publication(self, pub: ScheduledPublication, claim_token: str, result: Dict) -> Dict:
+        """Grava log e status de uma publicação reivindicada"""
+        
+        attempts = pub.attempts or 0
+        next_attempt_at = None
+        values = None
+        
+        try:
+            now = datetime.utcnow()
+            # Limite de envio e circuito aberto não chegaram ao canal: não contam como tentativa
+            deferred = not result['success'] and (result.get('rate_limited') or result.get('circuit_open'))
+            
+            if result['success']:
+                status = 'published'
+                attempts += 1
+            elif deferred:
+                status = 'scheduled'
+                next_attempt_at = now + timedelta(seconds=result.get('retry_after') or self.RETRY_BASE_BACKOFF)
+            else:
+                attempts += 1
+                if not self.is_retryable(result):
+                    status = 'failed'
+                elif attempts < self.MAX_PUBLICATION_ATTEMPTS:
+                    status = 'scheduled'
+                    next_attempt_at = now + timedelta(seconds=self._retry_delay(attempts))
+                else:
+                    # Dead-letter: esgotou as tentativas, fica para análise/reenvio manual
+                    status = 'dead'
+            
+            values = {
+                'status': status,
+                'attempts': attempts,
+                'published_at': now if result['success'] else None,
+                'publication_url': result.get('url'),
+                'error_message': result.get('error'),
+                'claimed_by': None,
+                'lease_expires_at': None
+            }
+            if next_attempt_at:
+                values['next_attempt_at'] = next_attempt_at
+            
+            if pub.content and pub.channel and not deferred:
+                self._record_publication(pub.content, pub.channel, result)
+            
+            # Só atualiza se a reivindicação ainda é deste processo (lease não expirou)
+            owned = ScheduledPublication.query.filter_by(id=pub.id, claimed_by=claim_token).update(
+                values, synchronize_session=False)
+            
+            db.session.commit()
+            
+            if not owned:
+                print(f"Reivindicação da publicação agendada {pub.id} expirou antes da gravação do resultado")
+            elif next_attempt_at:
+                due_scheduler.notify(PUBLICATION, pub.id, next_attempt_at)
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao gravar o resultado da publicação agendada {pub.id}: {e}")
+            # Sem isso a linha fica 'processing' e é publicada de novo quando o lease expirar
+            status = self._release_with_outcome(pub, claim_token, result, values, attempts, e)
+            result = dict(result, error=result.get('error') or f'Erro ao gravar o resultado: {e}')
+        
+        lag = (datetime.utcnow() - pub.scheduled_time).total_seconds() if pub.scheduled_time else None
+        
+        return {
+            'scheduled_id': pub.id,
+            'success': result['success'],
+            'status': status,
+            'attempts': attempts,
+            'next_attempt_at': next_attempt_at.isoformat() if next_attempt_at else None,
+            'error': result.get('error'),
+            'lag_seconds': round(lag, 1) if lag is not None else None
+        }
+    
+    def _release_with_outcome(self, pub: ScheduledPublication, claim_token: str, result: Dict,
+                              values: Optional[Dict], attempts: int, error: Exception) -> Optional[str]:
+        """Grava só o status da publicação (sem log) quando a gravação completa falhou"""
+        
+        if values is None:
+            # Falha antes de calcular o resultado: sucesso fica publicado, falha volta para a fila
+            values = {
+                'status': 'published' if result['success'] else 'scheduled',
+                'attempts': attempts + 1,
+                'published_at': datetime.utcnow() if result['success'] else None,
+                'publication_url': result.get('url'),
+                'claimed_by': None,
+                'lease_expires_at': None
+            }
+            if not result['success']:
+                values['next_attempt_at'] = datetime.utcnow() + timedelta(seconds=self._retry_delay(attempts + 1))
+        
+        values = dict(values, error_message=f"{result.get('error') or ''} (log não gravado: {error})".strip())
+        
+        try:
+            ScheduledPublication.query.filter_by(id=pub.id, claimed_by=claim_token).update(
+                values, synchronize_session=False)
+            db.session.commit()
+            return values['status']
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao liberar a publicação agendada {pub.id}: {e}")
+            return None
+    
+    def requeue_dead_publications(self, scheduled_ids: Optional[List[int]] = None) -> Dict:
+        """Devolve publicações do dead-letter para a fila, com tentativas zeradas"""
         
-        start_date = datetime.utcnow() - timedelta(days=days)
+        query = ScheduledPublication.query.filter(ScheduledPublication.status == 'dead')
+        if scheduled_ids:
+            query = query.filter(ScheduledPublication.id.in_(scheduled_ids))
         
-        total_publications = PublicationLog.query.filter(
-            PublicationLog.published_at >= start_date
-        ).count()
+        requeued = query.update({
+            'status': 'scheduled',
+            'attempts': 0,
+            'next_attempt_at': datetime.utcnow(),
+            'error_message': None
+        }, synchronize_session=False)
+        db.session.commit()
+        
+        return {'success': True, 'requeued': requeued}
+    
+    def get_publication_stats(self, days: int = 30) -> Dict:
+        """Retorna estatísticas de publicação (somadas da tabela de rollup diário)"""
         
-        successful_publications = PublicationLog.query.filter(
-            PublicationLog.published_at >= start_date,
-            PublicationLog.publication_status == 'success'
-        ).count()
+        stats = publication_stats.get_window_stats(days)
+        by_status = stats['by_status']
         
-        failed_publications = PublicationLog.query.filter(
-            PublicationLog.published_at >= start_date,
-            PublicationLog.publication_status == 'failed'
-        ).count()
+        successful_publications = by_status.get('success', 0)
+        failed_publications = by_status.get('failed', 0)
+        unknown_publications = by_status.get('unknown', 0)
+        total_publications = sum(by_status.values())
         
         success_rate = (successful_publications / total_publications * 100) if total_publications > 0 else 0
         
@@ -350,7 +1028,10 @@ class PublicationManager:
             'total_publications': total_publications,
             'successful_publications': successful_publications,
             'failed_publications': failed_publications,
+            'unknown_publications': unknown_publications,
             'success_rate': round(success_rate, 2),
+            'by_channel': stats['by_channel'],
+            'by_content_type': stats['by_content_type'],
             'period_days': days
         }
 
@@ -0,0 +1,156 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from src.models.publication import db, PublicationLog, PublicationStatDaily
+from src.models.content import GeneratedContent
+
+def _window_query(days: int, channel_id: Optional[int] = None):
+    # Janela em dias completos: hoje conta como o dia 1
+    start_day = datetime.utcnow().date() - timedelta(days=days - 1)
+    query = PublicationStatDaily.query.filter(PublicationStatDaily.day >= start_day)
+    if channel_id:
+        query = query.filter(PublicationStatDaily.channel_id == channel_id)
+    return query
+
+def get_window_stats(days: int = 30, channel_id: Optional[int] = None) -> Dict:
+    """
+    Totais da janela somando os baldes diários (não varre publication_logs)
+
+    Args:
+        days: Tamanho da janela em dias
+        channel_id: Restringe a um canal (opcional)
+
+    Returns:
+        Dict com totais por status, por canal e por tipo de conteúdo
+    """
+
+    by_status: Dict[str, int] = {}
+    by_channel: Dict[int, Dict[str, int]] = {}
+    by_content_type: Dict[str, Dict[str, int]] = {}
+
+    rows = _window_query(days, channel_id).with_entities(
+        PublicationStatDaily.channel_id,
+        PublicationStatDaily.status,
+        PublicationStatDaily.content_type,
+        func.sum(PublicationStatDaily.count)
+    ).group_by(
+        PublicationStatDaily.channel_id, PublicationStatDaily.status, PublicationStatDaily.content_type
+    )
+
+    for row_channel_id, status, content_type, count in rows:
+        count = int(count or 0)
+        by_status[status] = by_status.get(status, 0) + count
+        channel_counts = by_channel.setdefault(row_channel_id, {})
+        channel_counts[status] = channel_counts.get(status, 0) + count
+        type_counts = by_content_type.setdefault(content_type or 'unknown', {})
+        type_counts[status] = type_counts.get(status, 0) + count
+
+    return {
+        'by_status': by_status,
+        'by_channel': by_channel,
+        'by_content_type': by_content_type
+    }
+
+def get_daily_series(days: int = 30, channel_id: Optional[int] = None) -> List[Dict]:
+    """Série diária (inclusive dias sem publicação) com contagem por status"""
+
+    counts: Dict[date, Dict[str, int]] = {}
+
+    rows = _window_query(days, channel_id).with_entities(
+        PublicationStatDaily.day,
+        PublicationStatDaily.status,
+        func.sum(PublicationStatDaily.count)
+    ).group_by(PublicationStatDaily.day, PublicationStatDaily.status)
+
+    for day, status, count in rows:
+        counts.setdefault(day, {})[status] = int(count or 0)
+
+    today = datetime.utcnow().date()
+    series = []
+    for offset in range(days - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        day_counts = counts.get(day, {})
+        series.append({
+            'day': day.isoformat(),
+            'total': sum(day_counts.values()),
+            'success': day_counts.get('success', 0),
+            'failed': day_counts.get('failed', 0),
+            'pending': day_counts.get('pending', 0),
+            'unknown': day_counts.get('unknown', 0)
+        })
+
+    return series
+
+def backfill_publication_stats(since: Optional[date] = None) -> Dict:
+    """
+    Recalcula os baldes a partir de publication_logs (uma agregação, uma transação)
+
+    Só os dias a partir de since são apagados e refeitos. Sem since, vale o dia
+    do log concluído mais antigo: os dias anteriores foram arquivados pelo
+    RetentionManager e só existem nos baldes.
+
+    Args:
+        since: Primeiro dia recalculado (opcional)
+    """
+
+    try:
+        if since is None:
+            oldest = db.session.query(func.min(PublicationLog.published_at)).filter(
+                PublicationLog.publication_status != 'pending'
+            ).scalar()
+            if oldest is None:
+                return {'success': True, 'since': None, 'buckets': 0, 'logs': 0}
+            since = oldest.date()
+
+        day_column = func.date(PublicationLog.published_at)
+        rows = db.session.query(
+            day_column,
+            PublicationLog.channel_id,
+            PublicationLog.publication_status,
+            func.coalesce(GeneratedContent.content_type, ''),
+            func.count(PublicationLog.id)
+        ).outerjoin(
+            GeneratedContent, GeneratedContent.id == PublicationLog.content_id
+        ).filter(
+            PublicationLog.published_at >= datetime.combine(since, datetime.min.time())
+        ).group_by(
+            day_column, PublicationLog.channel_id, PublicationLog.publication_status,
+            func.coalesce(GeneratedContent.content_type, '')
+        ).all()
+
+        buckets = [
+            {
+                # SQLite devolve date() como texto
+                'day': date.fromisoformat(day) if isinstance(day, str) else day,
+                'channel_id': channel_id,
+                'status': status,
+                'content_type': content_type,
+                'count': count
+            }
+            for day, channel_id, status, content_type, count in rows
+        ]
+
+        PublicationStatDaily.query.filter(PublicationStatDaily.day >= since).delete(synchronize_session=False)
+        if buckets:
+            db.session.bulk_insert_mappings(PublicationStatDaily, buckets)
+        db.session.commit()
+
+        return {
+            'success': True,
+            'since': since.isoformat(),
+            'buckets': len(buckets),
+            'logs': sum(bucket['count'] for bucket in buckets)
+        }
+
+    except Exception as e:
+        db.session.rollback()
+        return {'success': False, 'error': str(e)}
+
+if __name__ == '__main__':
+    import sys
+    from src.main import app
+
+    since = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    with app.app_context():
+        print(backfill_publication_stats(since))
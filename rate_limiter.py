@@ -0,0 +1,319 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'rate_limits.db')
+
+# Limites padrão (envios por segundo, capacidade do balde). Por conta: LinkedIn ~100 mensagens/dia,
+# Instagram ~200 chamadas/hora. Sobrescreva com a variável RATE_LIMITS (mesmo formato, em JSON).
+DEFAULT_LIMITS = {
+    'channel:linkedin': {'rate': 2.0, 'capacity': 5},
+    'channel:instagram': {'rate': 2.0, 'capacity': 5},
+    'account:linkedin': {'rate': 100 / 86400, 'capacity': 10},
+    'account:instagram': {'rate': 200 / 3600, 'capacity': 10}
+}
+
+MIN_RATE_FACTOR = 0.05  # a adaptação nunca reduz o ritmo abaixo de 5% do configurado
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket compartilhado entre processos (gunicorn workers) via SQLite
+
+    Cada chave ('channel:linkedin', 'account:linkedin:123') tem um balde com
+    ritmo e capacidade. As operações rodam em transações BEGIN IMMEDIATE, então
+    processos diferentes nunca consomem a mesma ficha.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, limits: Optional[Dict] = None):
+        self.db_path = db_path or os.environ.get('RATE_LIMIT_DB_PATH', DEFAULT_DB_PATH)
+        self.limits = dict(DEFAULT_LIMITS)
+        if os.environ.get('RATE_LIMITS'):
+            self.limits.update(json.loads(os.environ['RATE_LIMITS']))
+        if limits:
+            self.limits.update(limits)
+
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                capacity REAL NOT NULL,
+                rate REAL NOT NULL,
+                base_rate REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0
+            )
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def _limit_for(self, key: str) -> Dict:
+        # 'account:linkedin:123' usa o limite de 'account:linkedin' se não houver um específico
+        while key:
+            if key in self.limits:
+                return self.limits[key]
+            key = key.rpartition(':')[0]
+        return {'rate': 1.0, 'capacity': 1}
+
+    def _load(self, connection: sqlite3.Connection, key: str, now: float) -> Dict:
+        row = connection.execute(
+            'SELECT tokens, capacity, rate, base_rate, updated_at, blocked_until FROM rate_limit_buckets WHERE key = ?',
+            (key,)
+        ).fetchone()
+
+        if row is None:
+            limit = self._limit_for(key)
+            return {'key': key, 'tokens': float(limit['capacity']), 'capacity': float(limit['capacity']),
+                    'rate': float(limit['rate']), 'base_rate': float(limit['rate']), 'updated_at': now, 'blocked_until': 0.0}
+
+        tokens, capacity, rate, base_rate, updated_at, blocked_until = row
+        tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+        return {'key': key, 'tokens': tokens, 'capacity': capacity, 'rate': rate,
+                'base_rate': base_rate, 'updated_at': now, 'blocked_until': blocked_until}
+
+    def _save(self, connection: sqlite3.Connection, bucket: Dict):
+        connection.execute(
+            'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, capacity, rate, base_rate, updated_at, blocked_until) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (bucket['key'], bucket['tokens'], bucket['capacity'], bucket['rate'],
+             bucket['base_rate'], bucket['updated_at'], bucket['blocked_until'])
+        )
+
+    def try_acquire(self, keys: Iterable[str], tokens: float = 1) -> Tuple[bool, float]:
+        """
+        Consome fichas de todos os baldes, ou de nenhum
+
+        Args:
+            keys: Baldes envolvidos (ex.: canal e conta)
+            tokens: Fichas a consumir
+
+        Returns:
+            (permitido, segundos até haver fichas suficientes)
+        """
+
+        keys = list(keys)
+        connection = self._connection()
+        now = time.time()
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            buckets = [self._load(connection, key, now) for key in keys]
+            wait = self._wait_for(buckets, tokens, now)
+
+            if wait == 0.0:
+                for bucket in buckets:
+                    bucket['tokens'] -= tokens
+
+            for bucket in buckets:
+                self._save(connection, bucket)
+
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        return wait == 0.0, wait
+
+    @staticmethod
+    def _wait_for(buckets: List[Dict], tokens: float, now: float) -> float:
+        wait = 0.0
+        for bucket in buckets:
+            if bucket['blocked_until'] > now:
+                wait = max(wait, bucket['blocked_until'] - now)
+            elif bucket['tokens'] < tokens:
+                wait = max(wait, (tokens - bucket['tokens']) / bucket['rate'])
+        return wait
+
+    def wait_time(self, keys: Iterable[str], tokens: float = 1) -> float:
+        """Segundos até as fichas estarem disponíveis, sem consumir"""
+
+        now = time.time()
+        connection = self._connection()
+        return self._wait_for([self._load(connection, key, now) for key in keys], tokens, now)
+
+    def acquire(self, keys: Iterable[str], tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """Bloqueia até obter as fichas; retorna False se o timeout expirar antes"""
+
+        keys = list(keys)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            allowed, wait = self.try_acquire(keys, tokens)
+            if allowed:
+                return True
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or wait > remaining:
+                    return False
+
+            time.sleep(wait)
+
+    def record_response(self, keys: Iterable[str], status_code: int, headers: Optional[Dict] = None):
+        """
+        Ajusta o ritmo conforme a resposta da plataforma
+
+        429/503 bloqueiam os baldes até Retry-After e reduzem o ritmo pela metade.
+        Cabeçalhos X-RateLimit-Remaining/Reset e X-App-Usage (Graph API) ajustam o
+        ritmo ao orçamento informado. Respostas de sucesso recuperam o ritmo aos
+        poucos até o valor configurado.
+        """
+
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        connection = self._connection()
+        now = time.time()
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for key in keys:
+                bucket = self._load(connection, key, now)
+                minimum = bucket['base_rate'] * MIN_RATE_FACTOR
+
+                if status_code in (429, 503):
+                    retry_after = self._parse_retry_after(headers.get('retry-after'), now)
+                    bucket['blocked_until'] = now + (retry_after if retry_after is not None else 60)
+                    bucket['rate'] = max(minimum, bucket['rate'] / 2)
+                    bucket['tokens'] = 0.0
+                else:
+                    budget_rate = self._rate_from_headers(headers, now)
+                    usage = self._graph_api_usage(headers)
+
+                    if budget_rate is not None:
+                        bucket['rate'] = max(minimum, min(bucket['base_rate'], budget_rate))
+                    elif usage is not None and usage >= 95:
+                        bucket['blocked_until'] = now + 60
+                        bucket['rate'] = max(minimum, bucket['rate'] / 2)
+                    elif usage is not None and usage >= 80:
+                        bucket['rate'] = max(minimum, bucket['rate'] * 0.75)
+                    elif status_code < 400:
+                        # Aumento aditivo (AIMD) de volta ao ritmo configurado
+                        bucket['rate'] = min(bucket['base_rate'], bucket['rate'] + bucket['base_rate'] * 0.05)
+
+                self._save(connection, bucket)
+
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str], now: float) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+            except (TypeError, ValueError):
+                return None
+
+    @staticmethod
+    def _rate_from_headers(headers: Dict, now: float) -> Optional[float]:
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        if remaining is None or reset is None:
+            return None
+        try:
+            remaining = float(remaining)
+            reset = float(reset)
+        except ValueError:
+            return None
+        # Reset pode vir como epoch ou como segundos restantes
+        seconds = reset - now if reset > now else reset
+        return remaining / max(seconds, 1.0)
+
+    @staticmethod
+    def _graph_api_usage(headers: Dict) -> Optional[float]:
+        raw = headers.get('x-app-usage') or headers.get('x-business-use-case-usage')
+        if not raw:
+            return None
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return None
+
+        entries: List[Dict] = []
+        if isinstance(data, dict) and 'call_count' in data:
+            entries = [data]
+        elif isinstance(data, dict):
+            for value in data.values():
+                entries.extend(value if isinstance(value, list) else [value])
+
+        percentages = [
+            float(entry.get(field, 0))
+            for entry in entries if isinstance(entry, dict)
+            for field in ('call_count', 'total_time', 'total_cputime')
+        ]
+        return max(percentages) if percentages else None
+
+    def get_status(self, key: str) -> Dict:
+        """Estado atual de um balde (fichas, ritmo, bloqueio)"""
+
+        now = time.time()
+        bucket = self._load(self._connection(), key, now)
+        return {
+            'key': key,
+            'tokens': round(bucket['tokens'], 3),
+            'capacity': bucket['capacity'],
+            'rate_per_second': bucket['rate'],
+            'configured_rate_per_second': bucket['base_rate'],
+            'blocked_for_seconds': round(max(0.0, bucket['blocked_until'] - now), 3)
+        }
+
+def channel_keys(channel: str, account: Optional[str] = None) -> List[str]:
+    """Chaves dos baldes de canal e de conta"""
+    return [f'channel:{channel}', f'account:{channel}:{account or "default"}']
+
+_limiter: Optional[TokenBucketRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> TokenBucketRateLimiter:
+    """Limitador compartilhado do processo"""
+
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = TokenBucketRateLimiter()
+    return _limiter
+
+def reserve_send(channel: str, account: Optional[str] = None, max_wait: Optional[float] = None) -> Optional[Dict]:
+    """
+    Reserva uma ficha para um envio no canal/conta
+
+    Espera até max_wait segundos (RATE_LIMIT_MAX_WAIT, padrão 5). Se o limite não
+    liberar a tempo, retorna um resultado de falha reagendável com 'retry_after'.
+
+    Returns:
+        None se o envio pode prosseguir, ou Dict de erro
+    """
+
+    if max_wait is None:
+        max_wait = float(os.environ.get('RATE_LIMIT_MAX_WAIT', '5'))
+
+    limiter = get_rate_limiter()
+    keys = channel_keys(channel, account)
+
+    if limiter.acquire(keys, timeout=max_wait):
+        return None
+
+    wait = limiter.wait_time(keys)
+    return {
+        'success': False,
+        'error': f'Limite de envio do {channel} atingido; nova tentativa em {wait:.0f}s',
+        'retryable': True,
+        'rate_limited': True,
+        'retry_after': wait
+    }
@@ -0,0 +1,553 @@
+import email
+import imaplib
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from email.header import decode_header, make_header
+from email.utils import getaddresses, parseaddr, parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func, update
+from src.models.lead import db, Lead, LeadInteraction
+from src.models.mailbox_sync import MailboxSyncState, InboundReply
+from src.services.suppression_manager import suppression_list
+
+# Message-ID gerado por smtp_backend.build_message: <...lead-<id>@dominio>
+LEAD_MESSAGE_ID = re.compile(r'\.lead-(\d+)@')
+FINAL_RECIPIENT = re.compile(r'(?:final|original)-recipient:\s*rfc822;\s*<?([^\s>]+@[^\s>]+)', re.IGNORECASE)
+
+# Cabeçalhos completos e só o início do corpo: suficiente para classificar, barato em backlogs grandes
+FETCH_ITEMS = '(UID RFC822.HEADER BODY.PEEK[TEXT]<0.8192>)'
+
+UNSUBSCRIBE_TERMS = (
+    'descadastrar', 'descadastre', 'descadastro', 'remover meu', 'remova meu', 'remova-me', 'me remova',
+    'não quero receber', 'nao quero receber', 'parar de receber', 'sair da lista', 'unsubscribe'
+)
+NOT_INTERESTED_TERMS = (
+    'não tenho interesse', 'nao tenho interesse', 'não temos interesse', 'nao temos interesse',
+    'sem interesse', 'não é o momento', 'nao e o momento', 'not interested'
+)
+INTERESTED_TERMS = (
+    'tenho interesse', 'temos interesse', 'interessado', 'interessada', 'vamos conversar', 'podemos conversar',
+    'pode ligar', 'me liga', 'agendar', 'gostaria de saber mais', 'quero saber mais', 'interested'
+)
+# Negação logo antes de uma menção a interesse: 'não estou interessado', 'não tenho mais interesse'
+INTEREST_MENTION = re.compile(r'interess\w*|interest\w*')
+NEGATION_BEFORE = re.compile(r"\b(?:não|nao|nem|sem|not|never|nunca|jamais)\b(?:\s+[^\s.,;:!?]+){0,3}\s+$")
+AUTO_REPLY_SUBJECTS = ('resposta automática', 'resposta automatica', 'ausente', 'out of office', 'automatic reply', 'férias')
+BOUNCE_SENDERS = ('mailer-daemon', 'postmaster')
+
+# Status do lead por classificação; None mantém o status atual
+STATUS_BY_CLASSIFICATION = {
+    'unsubscribe': 'unsubscribed',
+    'bounce': 'bounced',
+    'interested': 'qualified',
+    'not_interested': 'lost',
+    'reply': 'replied',
+    'auto_reply': None
+}
+# Respostas comuns só avançam leads ainda em prospecção
+OPEN_STATUSES = ('new', 'contacted', 'replied')
+
+QUOTE_START = re.compile(
+    r'^\s*(em .+ escreveu:|on .+ wrote:|-+\s*(mensagem original|original message)\s*-+|de:\s|from:\s)',
+    re.IGNORECASE
+)
+
+def strip_quoted_text(text: str) -> str:
+    """Remove o texto citado da mensagem original (inclui o rodapé com 'DESCADASTRAR' do nosso template)"""
+
+    lines = []
+    for line in text.splitlines():
+        if QUOTE_START.match(line):
+            break
+        if not line.lstrip().startswith('>'):
+            lines.append(line)
+    return '\n'.join(lines).strip()
+
+def negates_interest(text: str) -> bool:
+    """True se alguma menção a interesse no texto vem negada (até três palavras antes, na mesma frase)"""
+
+    for match in INTEREST_MENTION.finditer(text):
+        if NEGATION_BEFORE.search(text[max(0, match.start() - 60):match.start()]):
+            return True
+    return False
+
+def classify_reply(from_email: str, subject: str, body: str, headers) -> str:
+    """Classifica a resposta: 'bounce', 'auto_reply', 'unsubscribe', 'not_interested', 'interested' ou 'reply'"""
+
+    subject_lower = (subject or '').lower()
+    content_type = (headers.get('Content-Type') or '').lower()
+
+    if from_email.split('@')[0] in BOUNCE_SENDERS or 'report-type=delivery-status' in content_type:
+        return 'bounce'
+
+    auto_submitted = (headers.get('Auto-Submitted') or 'no').lower()
+    if auto_submitted != 'no' or headers.get('X-Autoreply') or any(term in subject_lower for term in AUTO_REPLY_SUBJECTS):
+        return 'auto_reply'
+
+    text = f"{subject_lower}\n{strip_quoted_text(body).lower()}"
+
+    if any(term in text for term in UNSUBSCRIBE_TERMS):
+        return 'unsubscribe'
+    # Antes de INTERESTED_TERMS: 'não tenho interesse' contém 'tenho interesse' e
+    # 'não estou interessado' contém 'interessado'
+    if any(term in text for term in NOT_INTERESTED_TERMS) or negates_interest(text):
+        return 'not_interested'
+    if any(term in text for term in INTERESTED_TERMS):
+        return 'interested'
+    return 'reply'
+
+class ReplyIngestor:
+    """
+    Sincroniza a caixa de respostas por UID e aplica os resultados aos leads
+
+    O progresso (UIDVALIDITY e último UID) é gravado na mesma transação de cada
+    lote, então uma execução interrompida continua do último lote sem reprocessar
+    a caixa inteira. Se o UIDVALIDITY mudar, a caixa é relida e as respostas já
+    registradas são ignoradas pelo Message-ID.
+    """
+
+    def __init__(self, host: str, username: str, password: str, port: Optional[int] = None,
+                 mailbox: str = 'INBOX', use_ssl: bool = True, batch_size: int = 200,
+                 imap_factory: Optional[Callable] = None):
+        """
+        Args:
+            host: Servidor IMAP
+            username: Usuário da caixa de respostas
+            password: Senha
+            port: Porta (padrão 993 com SSL, 143 sem)
+            mailbox: Pasta a sincronizar
+            use_ssl: Usa IMAP4_SSL
+            batch_size: Mensagens buscadas e gravadas por lote
+            imap_factory: Cria a conexão IMAP (permite usar um servidor local/falso em testes)
+        """
+
+        self.host = host
+        self.port = port or (993 if use_ssl else 143)
+        self.username = username
+        self.password = password
+        self.mailbox = mailbox
+        self.use_ssl = use_ssl
+        self.batch_size = batch_size
+        self.imap_factory = imap_factory
+        self.state_key = f"{username}@{host}/{mailbox}"
+
+    @classmethod
+    def from_env(cls) -> Optional['ReplyIngestor']:
+        """Cria o ingestor a partir de IMAP_HOST, IMAP_USERNAME, IMAP_PASSWORD etc.; None se não configurado"""
+
+        host = os.environ.get('IMAP_HOST')
+        if not host:
+            return None
+
+        return cls(
+            host=host,
+            username=os.environ.get('IMAP_USERNAME', ''),
+            password=os.environ.get('IMAP_PASSWORD', ''),
+            port=int(os.environ['IMAP_PORT']) if os.environ.get('IMAP_PORT') else None,
+            mailbox=os.environ.get('IMAP_MAILBOX', 'INBOX'),
+            use_ssl=os.environ.get('IMAP_USE_SSL', 'true').lower() == 'true'
+        )
+
+    def _connect(self):
+        if self.imap_factory:
+            imap = self.imap_factory()
+        elif self.use_ssl:
+            imap = imaplib.IMAP4_SSL(self.host, self.port)
+        else:
+            imap = imaplib.IMAP4(self.host, self.port)
+
+        imap.login(self.username, self.password)
+        return imap
+
+    def _get_state(self) -> MailboxSyncState:
+        state = MailboxSyncState.query.filter_by(mailbox=self.state_key).first()
+        if state is None:
+            state = MailboxSyncState(mailbox=self.state_key, last_uid=0, messages_processed=0)
+            db.session.add(state)
+        return state
+
+    def sync(self, max_messages: Optional[int] = None) -> Dict:
+        """
+        Processa as mensagens novas desde o último UID sincronizado
+
+        Args:
+            max_messages: Limite de mensagens nesta execução (o restante fica para a próxima)
+
+        Returns:
+            Dict com contagens por classificação e leads atualizados
+        """
+
+        summary = {'fetched': 0, 'matched': 0, 'duplicates': 0, 'leads_updated': 0, 'classifications': {}}
+        imap = None
+
+        try:
+            imap = self._connect()
+
+            typ, _ = imap.select(self.mailbox, readonly=True)
+            if typ != 'OK':
+                raise Exception(f'Não foi possível abrir a pasta {self.mailbox}')
+            uidvalidity = int(imap.response('UIDVALIDITY')[1][0])
+
+            state = self._get_state()
+            if state.uidvalidity != uidvalidity:
+                if state.uidvalidity is not None:
+                    print(f"UIDVALIDITY de {self.state_key} mudou; relendo a caixa")
+                state.uidvalidity = uidvalidity
+                state.last_uid = 0
+            db.session.commit()
+
+            # 'N:*' sempre retorna a última mensagem, mesmo com UID menor que N
+            typ, data = imap.uid('SEARCH', None, f'UID {state.last_uid + 1}:*')
+            uids = sorted(int(uid) for uid in (data[0] or b'').split() if int(uid) > state.last_uid)
+            if max_messages:
+                uids = uids[:max_messages]
+
+            for start in range(0, len(uids), self.batch_size):
+                chunk = uids[start:start + self.batch_size]
+                typ, data = imap.uid('FETCH', ','.join(str(uid) for uid in chunk), FETCH_ITEMS)
+                if typ != 'OK':
+                    raise Exception(f'Falha ao buscar mensagens: {data}')
+
+                fetched = self._parse_fetch_response(data)
+                replies = [self._parse_message(uid, header, body) for uid, (header, body) in sorted(fetched.items())]
+
+                batch = self._apply_batch(state, replies, chunk[-1])
+
+                summary['fetched'] += len(replies)
+                summary['matched'] += batch['matched']
+                summary['duplicates'] += batch['duplicates']
+                summary['leads_updated'] += batch['leads_updated']
+                for classification, count in batch['classifications'].items():
+                    summary['classifications'][classification] = summary['classifications'].get(classification, 0) + count
+
+            state.last_synced_at = datetime.utcnow()
+            state.last_error = None
+            db.session.commit()
+
+            return dict(summary, success=True, last_uid=state.last_uid, remaining=max(0, len(uids) - summary['fetched']))
+
+        except Exception as e:
+            db.session.rollback()
+            state = MailboxSyncState.query.filter_by(mailbox=self.state_key).first()
+            if state:
+                state.last_error = str(e)
+                db.session.commit()
+            return dict(summary, success=False, error=str(e))
+
+        finally:
+            if imap is not None:
+                try:
+                    imap.logout()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _parse_fetch_response(data: List) -> Dict[int, Tuple[bytes, bytes]]:
+        """
+        Agrupa a resposta de UID FETCH por mensagem
+
+        imaplib devolve tuplas (descritor, literal) e bytes de fechamento; o UID
+        pode vir antes ou depois dos literais, conforme o servidor.
+        """
+
+        messages = {}
+        current = None
+
+        def finish(item):
+            if item and item['uid'] is not None:
+                messages[item['uid']] = (item['header'], item['body'])
+
+        for part in data:
+            descriptor = part[0] if isinstance(part, tuple) else part
+            if not isinstance(descriptor, bytes):
+                continue
+
+            if re.match(rb'^\d+ \(', descriptor):
+                finish(current)
+                current = {'uid': None, 'header': b'', 'body': b''}
+            if current is None:
+                continue
+
+            uid_match = re.search(rb'UID (\d+)', descriptor)
+            if uid_match:
+                current['uid'] = int(uid_match.group(1))
+
+            if isinstance(part, tuple):
+                if b'HEADER' in descriptor:
+                    current['header'] = part[1]
+                elif b'BODY[TEXT]' in descriptor:
+                    current['body'] = part[1]
+
+        finish(current)
+        return messages
+
+    def _parse_message(self, uid: int, header: bytes, body: bytes) -> Dict:
+        """Extrai remetente, referências ao lead, texto e classificação de uma mensagem"""
+
+        message = email.message_from_bytes(header.rstrip(b'\r\n') + b'\r\n\r\n' + body)
+        from_email = parseaddr(message.get('From', ''))[1].lower()
+        subject = str(make_header(decode_header(message.get('Subject', ''))))
+
+        text = self._extract_text(message, body)
+        classification = classify_reply(from_email, subject, text, message)
+
+        # Referências a mensagens nossas (In-Reply-To/References e, em bounces, o corpo)
+        references = ' '.join(filter(None, [message.get('In-Reply-To'), message.get('References')]))
+        lead_match = LEAD_MESSAGE_ID.search(references)
+        if not lead_match and classification == 'bounce':
+            lead_match = LEAD_MESSAGE_ID.search(text)
+        lead_id = int(lead_match.group(1)) if lead_match else None
+
+        # Endereço a casar com Lead.email: o destinatário original em bounces, o remetente nas demais
+        lead_email = from_email
+        if classification == 'bounce':
+            failed = getaddresses([message.get('X-Failed-Recipients', '')])
+            recipient = FINAL_RECIPIENT.search(text)
+            lead_email = (failed[0][1] if failed and failed[0][1] else
+                          recipient.group(1) if recipient else None)
+            lead_email = lead_email.lower() if lead_email else None
+
+        try:
+            received_at = parsedate_to_datetime(message.get('Date'))
+            if received_at.tzinfo is not None:
+                # Gravado como UTC sem fuso, como os demais horários do banco
+                received_at = received_at.astimezone(timezone.utc).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            received_at = datetime.utcnow()
+
+        return {
+            'uid': uid,
+            'message_id': (message.get('Message-ID') or f'<uid-{uid}@{self.state_key}>').strip(),
+            'from_email': from_email,
+            'subject': subject[:500],
+            'text': strip_quoted_text(text)[:2000] if classification != 'bounce' else text[:2000],
+            'classification': classification,
+            'lead_id': lead_id,
+            'lead_email': lead_email,
+            'received_at': received_at
+        }
+
+    @staticmethod
+    def _extract_text(message, raw_body: bytes) -> str:
+        """Texto legível da mensagem; o corpo pode estar truncado pelo FETCH parcial"""
+
+        parts = []
+        for part in message.walk():
+            if part.get_content_maintype() == 'multipart':
+                continue
+            content_type = part.get_content_type()
+            if content_type == 'message/delivery-status':
+                # Cada bloco do relatório (Final-Recipient, Action...) é parseado como um conjunto de cabeçalhos
+                parts.append('\n'.join(str(block) for block in part.get_payload()))
+            elif content_type in ('text/plain', 'text/rfc822-headers'):
+                payload = part.get_payload(decode=True)
+                if payload is None:
+                    payload = str(part.get_payload()).encode()
+                parts.append(payload.decode(part.get_content_charset() or 'utf-8', errors='replace'))
+            elif content_type == 'text/html' and not parts:
+                payload = part.get_payload(decode=True) or b''
+                html = payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+                parts.append(re.sub(r'<[^>]+>', ' ', html))
+
+        return '\n'.join(parts) if parts else raw_body.decode('utf-8', errors='replace')
+
+    def _apply_batch(self, state: MailboxSyncState, replies: List[Dict], last_uid: int) -> Dict:
+        """Grava respostas, interações, status dos leads e o progresso da caixa em uma transação"""
+
+        result = {'matched': 0, 'duplicates': 0, 'leads_updated': 0, 'classifications': {}}
+
+        # Ignora mensagens já registradas (releitura após mudança de UIDVALIDITY)
+        unique = {reply['message_id']: reply for reply in replies}
+        existing = {
+            message_id for (message_id,) in db.session.query(InboundReply.message_id).filter(
+                InboundReply.message_id.in_(list(unique.keys()))
+            )
+        }
+        result['duplicates'] = len(replies) - len(unique) + len(existing)
+        replies = [reply for message_id, reply in unique.items() if message_id not in existing]
+
+        # Casa leads pelo Message-ID de origem ou pelo endereço, em consultas únicas por lote
+        emails = {reply['lead_email'] for reply in replies if not reply['lead_id'] and reply['lead_email']}
+        lead_ids_by_email = {}
+        if emails:
+            lead_ids_by_email = {
+                lead_email: lead_id for lead_id, lead_email in db.session.query(Lead.id, func.lower(Lead.email)).filter(
+                    func.lower(Lead.email).in_(list(emails))
+                )
+            }
+
+        for reply in replies:
+            if reply['lead_id']:
+                reply['matched_by'] = 'message_id'
+            elif reply['lead_email'] in lead_ids_by_email:
+                reply['lead_id'] = lead_ids_by_email[reply['lead_email']]
+                reply['matched_by'] = 'sender'
+            else:
+                reply['matched_by'] = None
+
+        candidate_ids = {reply['lead_id'] for reply in replies if reply['lead_id']}
+        leads = {}
+        if candidate_ids:
+            leads = {
+                lead_id: {'status': status, 'email': lead_email}
+                for lead_id, status, lead_email in db.session.query(Lead.id, Lead.status, Lead.email).filter(
+                    Lead.id.in_(list(candidate_ids))
+                )
+            }
+
+        # Descadastros e bounces entram na lista de supressão na mesma transação do lote
+        staged = []
+        for reason in ('unsubscribe', 'bounce'):
+            # Endereço que respondeu/falhou e o e-mail cadastrado do lead, se diferentes
+            entries = [
+                {'kind': 'email', 'value': value, 'lead_id': reply['lead_id']}
+                for reply in replies if reply['classification'] == reason
+                for value in {reply['lead_email'], leads.get(reply['lead_id'], {}).get('email')}
+            ]
+            entries = [entry for entry in entries if entry['value']]
+            if entries:
+                staged.extend(suppression_list.stage(entries, reason=reason, source=self.state_key)['staged'])
+
+        new_status = {}
+        interactions = []
+
+        for reply in replies:
+            classification = reply['classification']
+            result['classifications'][classification] = result['classifications'].get(classification, 0) + 1
+
+            inbound = InboundReply(
+                message_id=reply['message_id'][:500],
+                mailbox=self.state_key,
+                uid=reply['uid'],
+                lead_id=reply['lead_id'] if reply['lead_id'] in leads else None,
+                from_email=reply['from_email'],
+                subject=reply['subject'],
+                classification=classification,
+                matched_by=reply['matched_by'] if reply['lead_id'] in leads else None,
+                received_at=reply['received_at']
+            )
+            inbound.set_details({'lead_email': reply['lead_email']})
+            db.session.add(inbound)
+
+            lead = leads.get(reply['lead_id'])
+            if lead is None:
+                continue
+            result['matched'] += 1
+
+            interaction = LeadInteraction(
+                lead_id=reply['lead_id'],
+                interaction_type='email_bounce' if classification == 'bounce' else 'email_reply',
+                channel='email_marketing',
+                subject=reply['subject'],
+                message=reply['text'],
+                status=classification,
+                sent_at=reply['received_at']
+            )
+            interaction.set_metadata({'message_id': reply['message_id'], 'matched_by': reply['matched_by']})
+            interactions.append(interaction)
+
+            current = new_status.get(reply['lead_id'], lead['status'])
+            target = STATUS_BY_CLASSIFICATION[classification]
+            if target and (classification in ('unsubscribe', 'bounce', 'interested') or current in OPEN_STATUSES):
+                if current not in ('unsubscribed', 'bounced'):
+                    new_status[reply['lead_id']] = target
+
+        db.session.add_all(interactions)
+
+        changed = [
+            {'id': lead_id, 'status': status}
+            for lead_id, status in new_status.items() if status != leads[lead_id]['status']
+        ]
+        if changed:
+            db.session.execute(update(Lead), changed)
+        result['leads_updated'] = len(changed)
+
+        state.last_uid = last_uid
+        state.messages_processed = (state.messages_processed or 0) + len(replies)
+        db.session.commit()
+
+        suppression_list.apply_staged(staged)
+
+        return result
+
+    def run(self, stop_event: threading.Event, interval: float = 60.0):
+        """Sincroniza periodicamente até stop_event ser sinalizado"""
+
+        while not stop_event.is_set():
+            summary = self.sync()
+            if not summary['success']:
+                print(f"Erro ao sincronizar respostas: {summary['error']}")
+            stop_event.wait(interval)
+
+class LocalMailbox:
+    """
+    Caixa IMAP em memória com a mesma interface usada de imaplib
+
+    Para testes e desenvolvimento: ReplyIngestor(..., imap_factory=lambda: mailbox).
+    """
+
+    def __init__(self, uidvalidity: int = 1):
+        self.uidvalidity = uidvalidity
+        self.messages: Dict[int, bytes] = {}
+        self._next_uid = 1
+
+    def append(self, raw_message: bytes) -> int:
+        uid = self._next_uid
+        self.messages[uid] = raw_message
+        self._next_uid += 1
+        return uid
+
+    def login(self, username, password):
+        return 'OK', [b'Logged in']
+
+    def select(self, mailbox='INBOX', readonly=False):
+        return 'OK', [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        return code, [str(self.uidvalidity).encode()]
+
+    def uid(self, command, *args):
+        command = command.upper()
+        if command == 'SEARCH':
+            start = int(args[-1].split()[-1].split(':')[0])
+            uids = [uid for uid in sorted(self.messages) if uid >= start] or sorted(self.messages)[-1:]
+            return 'OK', [' '.join(str(uid) for uid in uids).encode()]
+
+        if command == 'FETCH':
+            data = []
+            for position, uid in enumerate(int(uid) for uid in args[0].split(',')):
+                if uid not in self.messages:
+                    continue
+                header, _, body = self.messages[uid].partition(b'\r\n\r\n')
+                header += b'\r\n\r\n'
+                body = body[:8192]
+                data.append((f'{position + 1} (UID {uid} RFC822.HEADER {{{len(header)}}}'.encode(), header))
+                data.append((f' BODY[TEXT]<0> {{{len(body)}}}'.encode(), body))
+                data.append(b')')
+            return 'OK', data
+
+        return 'NO', [f'Comando não suportado: {command}'.encode()]
+
+    def logout(self):
+        return 'BYE', [b'Logging out']
+
+def get_sync_states() -> List[Dict]:
+    """Estado de sincronização das caixas de resposta"""
+    return [state.to_dict() for state in MailboxSyncState.query.all()]
+
+if __name__ == '__main__':
+    from src.main import app
+
+    ingestor = ReplyIngestor.from_env()
+    if not ingestor:
+        raise SystemExit('Configure IMAP_HOST, IMAP_USERNAME e IMAP_PASSWORD')
+
+    print("Sincronizando respostas. Ctrl+C para parar.")
+    stop = threading.Event()
+    try:
+        with app.app_context():
+            ingestor.run(stop, float(os.environ.get('IMAP_POLL_INTERVAL', '60')))
+    except KeyboardInterrupt:
+        stop.set()
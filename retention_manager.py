@@ -0,0 +1,242 @@
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.orm import undefer
+from src.models.publication import db, PublicationLog
+from src.models.lead import LeadInteraction
+from src.models.message_body import MessageBody
+from src.models.outbox import OutboxMessage
+from src.services.message_store import message_store
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'archive')
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return None
+    return value
+
+class RetentionManager:
+    """
+    Arquiva e remove registros antigos de publication_logs, lead_interactions
+    e outbox_messages
+
+    Linhas mais antigas que N meses (mensagens do outbox já entregues ou
+    falhas: N dias) são gravadas em arquivos NDJSON comprimidos (gzip), um
+    por tabela e execução, e apagadas em lotes. Corpos de message_bodies que
+    só as interações arquivadas usavam são removidos em seguida. As
+    estatísticas diárias (publication_stats_daily) não são afetadas.
+    """
+
+    def __init__(self, archive_dir: Optional[str] = None, months: Optional[int] = None, batch_size: int = 1000,
+                 outbox_days: Optional[int] = None):
+        """
+        Args:
+            archive_dir: Diretório dos arquivos (padrão: RETENTION_ARCHIVE_DIR)
+            months: Meses mantidos no banco (padrão: RETENTION_MONTHS ou 12)
+            batch_size: Linhas por lote de leitura/remoção
+            outbox_days: Dias mantidos de mensagens concluídas do outbox (padrão: RETENTION_OUTBOX_DAYS ou 30)
+        """
+
+        self.archive_dir = archive_dir or os.environ.get('RETENTION_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR)
+        self.months = months or int(os.environ.get('RETENTION_MONTHS', 12))
+        self.outbox_days = outbox_days or int(os.environ.get('RETENTION_OUTBOX_DAYS', 30))
+        self.batch_size = batch_size
+
+    def cutoff(self) -> datetime:
+        # Meia-noite: só dias inteiros saem do banco, e o backfill das estatísticas
+        # pode refazer a partir do log mais antigo sem perder parte de um dia
+        return datetime.combine((datetime.utcnow() - timedelta(days=30 * self.months)).date(), datetime.min.time())
+
+    def outbox_cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(days=self.outbox_days)
+
+    def run(self, vacuum: bool = True) -> Dict:
+        """Arquiva as duas tabelas e compacta o banco; retorna contagens e tamanho antes/depois"""
+
+        cutoff = self.cutoff()
+        size_before = self.database_size()
+
+        body_hashes: Set[str] = set()
+        result = {
+            'cutoff': cutoff.isoformat(),
+            # Antes dos logs e interações: as mensagens apontam para eles
+            'outbox_messages': self.archive_outbox_messages(self.outbox_cutoff()),
+            'publication_logs': self.archive_publication_logs(cutoff),
+            'lead_interactions': self.archive_lead_interactions(cutoff, body_hashes),
+            'size_before': size_before
+        }
+        result['message_bodies'] = self.purge_message_bodies(body_hashes)
+
+        if vacuum:
+            # Encerra a transação de leitura da sessão: VACUUM precisa de acesso exclusivo
+            db.session.commit()
+            self.vacuum()
+        result['size_after'] = self.database_size()
+
+        return result
+
+    def archive_publication_logs(self, cutoff: datetime) -> Dict:
+        # Logs pendentes ainda são atualizados pelo outbox: ficam no banco
+        query = PublicationLog.query.options(
+            undefer(PublicationLog.response_data), undefer(PublicationLog.response_data_compressed)
+        ).filter(
+            PublicationLog.published_at < cutoff,
+            PublicationLog.publication_status != 'pending'
+        )
+
+        def serialize(log):
+            row = self._row_to_dict(log)
+            row['response_data'] = log.get_response_data()
+            return row
+
+        return self._archive(PublicationLog, query, serialize)
+
+    def archive_lead_interactions(self, cutoff: datetime, body_hashes: Optional[Set[str]] = None) -> Dict:
+        """Arquiva interações antigas; os hashes de corpo que elas usavam vão para body_hashes"""
+
+        query = LeadInteraction.query.filter(LeadInteraction.sent_at < cutoff)
+
+        def serialize(interaction):
+            row = self._row_to_dict(interaction)
+            digest = interaction.get_metadata().get('body_hash')
+            if digest and not row.get('message'):
+                # O arquivo fica completo mesmo sem a tabela message_bodies
+                row['message'] = message_store.get(digest)
+            if digest and body_hashes is not None:
+                body_hashes.add(digest)
+            return row
+
+        return self._archive(LeadInteraction, query, serialize)
+
+    def archive_outbox_messages(self, cutoff: datetime) -> Dict:
+        # Pendentes e em entrega ficam; nas demais o resultado já está na interação ou no log
+        query = OutboxMessage.query.filter(
+            OutboxMessage.created_at < cutoff,
+            OutboxMessage.status.in_(('sent', 'failed', 'unknown'))
+        )
+        return self._archive(OutboxMessage, query, self._row_to_dict)
+
+    def purge_message_bodies(self, candidates: Set[str]) -> Dict:
+        """
+        Remove corpos de message_bodies que nenhuma interação restante referencia
+
+        Só os hashes das interações arquivadas são candidatos; as restantes são
+        lidas em lotes (o hash fica nos metadados, sem coluna indexada).
+        """
+
+        if not candidates:
+            return {'purged': 0}
+
+        live = set()
+        last_id = 0
+        try:
+            while True:
+                batch = LeadInteraction.query.filter(LeadInteraction.id > last_id).order_by(LeadInteraction.id).limit(self.batch_size).all()
+                if not batch:
+                    break
+                for interaction in batch:
+                    digest = interaction.get_metadata().get('body_hash')
+                    if digest in candidates:
+                        live.add(digest)
+                last_id = batch[-1].id
+                db.session.expunge_all()
+
+            unused = sorted(candidates - live)
+            purged = 0
+            for start in range(0, len(unused), self.batch_size):
+                chunk = unused[start:start + self.batch_size]
+                purged += MessageBody.query.filter(MessageBody.content_hash.in_(chunk)).delete(synchronize_session=False)
+                db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao remover corpos de message_bodies: {e}")
+            return {'purged': 0, 'error': str(e)}
+
+        return {'purged': purged}
+
+    def _archive(self, model, query, serialize) -> Dict:
+        """Grava lotes no arquivo e apaga as linhas gravadas; cada lote é uma transação"""
+
+        table_name = model.__tablename__
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{table_name}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.ndjson.gz")
+
+        archived = 0
+        last_id = 0
+
+        try:
+            with gzip.open(path, 'wt', encoding='utf-8') as archive:
+                while True:
+                    batch = query.filter(model.id > last_id).order_by(model.id).limit(self.batch_size).all()
+                    if not batch:
+                        break
+
+                    for row in batch:
+                        archive.write(json.dumps(serialize(row), ensure_ascii=False, default=str) + '\n')
+                    # Garante o lote em disco antes de apagar do banco
+                    archive.flush()
+
+                    ids = [row.id for row in batch]
+                    last_id = ids[-1]
+                    # DELETE em lote (sem eventos de mapper: os rollups diários são preservados)
+                    model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+                    db.session.commit()
+                    db.session.expunge_all()
+                    archived += len(ids)
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao arquivar {table_name}: {e}")
+            return {'archived': archived, 'file': path, 'error': str(e)}
+
+        if not archived:
+            os.remove(path)
+            path = None
+
+        return {'archived': archived, 'file': path}
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict:
+        return {column.name: _json_value(getattr(row, column.key, None)) for column in row.__table__.columns}
+
+    def vacuum(self):
+        """Devolve ao sistema o espaço das linhas apagadas"""
+
+        dialect = db.engine.dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            return
+
+        # VACUUM não roda dentro de transação
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text('VACUUM' if dialect == 'sqlite' else 'VACUUM ANALYZE'))
+
+    @staticmethod
+    def database_size() -> Optional[int]:
+        """Tamanho do banco em bytes (SQLite e PostgreSQL)"""
+
+        try:
+            dialect = db.engine.dialect.name
+            if dialect == 'sqlite':
+                page_count = db.session.execute(text('PRAGMA page_count')).scalar()
+                page_size = db.session.execute(text('PRAGMA page_size')).scalar()
+                return page_count * page_size
+            if dialect == 'postgresql':
+                return db.session.execute(text('SELECT pg_database_size(current_database())')).scalar()
+        except Exception as e:
+            print(f"Erro ao medir o banco: {e}")
+        return None
+
+if __name__ == '__main__':
+    import sys
+    from src.main import app
+
+    months = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    with app.app_context():
+        print(json.dumps(RetentionManager(months=months).run(), indent=2))
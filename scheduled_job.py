@@ -0,0 +1,51 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class ScheduledJob(db.Model):
+    __tablename__ = 'scheduled_jobs'
+    __table_args__ = (
+        db.Index('ix_scheduled_jobs_due', 'status', 'due_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)  # 'content_generation'
+    payload = db.Column(db.Text)  # JSON string with job arguments
+    due_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, default=0)
+    result = db.Column(db.Text)  # JSON string with handler result
+    last_error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime)
+    claimed_by = db.Column(db.String(120))  # token da execução que detém o lease
+    lease_expires_at = db.Column(db.DateTime)  # 'running' com lease vencido: processo caiu, job volta a ser reivindicável
+    finished_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def set_payload(self, payload_dict):
+        self.payload = json.dumps(payload_dict)
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else {}
+
+    def set_result(self, result_dict):
+        self.result = json.dumps(result_dict, default=str)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'payload': self.get_payload(),
+            'due_at': self.due_at.isoformat() if self.due_at else None,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result': self.get_result(),
+            'last_error': self.last_error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
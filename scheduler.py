@@ -1,23 +1,39 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 from src.services.scheduler import scheduler
+from src.services.outbox_manager import OutboxManager
+from src.services.http_client import http_client
+from src.services.circuit_breaker import publication_breaker
+from src.services.channel_registry import channel_registry
+from src.services.publication_manager import PublicationManager
+from src.services.due_scheduler import due_scheduler
+from src.services.leader_election import scheduler_elector, start_scheduler_leadership
 
 scheduler_bp = Blueprint('scheduler', __name__)
 
 @scheduler_bp.route('/start', methods=['POST'])
 def start_scheduler():
-    """Inicia o agendador de tarefas"""
+    """Inicia o agendador de tarefas (só roda no processo que detém a liderança)"""
     try:
-        scheduler.start()
-        return jsonify({'message': 'Agendador iniciado com sucesso'})
+        # Reabilita a liderança no cluster (desabilitada por /stop)
+        scheduler_elector.set_enabled(True)
+        elector = start_scheduler_leadership(current_app._get_current_object())
+        return jsonify({
+            'message': 'Agendador iniciado com sucesso',
+            'process': elector.holder_id,
+            'is_leader': elector.is_leader
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @scheduler_bp.route('/stop', methods=['POST'])
 def stop_scheduler():
-    """Para o agendador de tarefas"""
+    """Para o agendador de tarefas em todos os processos"""
     try:
-        scheduler.stop()
+        # Desabilita a liderança no lease: o líder (em qualquer processo) se rebaixa no
+        # próximo heartbeat e ninguém assume até um novo /start
+        scheduler_elector.set_enabled(False)
+        scheduler_elector.stop()
         return jsonify({'message': 'Agendador parado com sucesso'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -26,8 +42,41 @@ def stop_scheduler():
 def get_scheduler_status():
     """Retorna o status do agendador"""
     status = scheduler.get_scheduler_status()
+    status['leadership'] = scheduler_elector.get_status()
+    status['due_scheduler'] = due_scheduler.get_status()
+    status['backlog'] = due_scheduler.get_backlog()
     return jsonify(status)
 
+@scheduler_bp.route('/outbox', methods=['GET'])
+def get_outbox_status():
+    """Retorna contagem de mensagens do outbox por status"""
+    return jsonify(OutboxManager.get_stats())
+
+@scheduler_bp.route('/http-metrics', methods=['GET'])
+def get_http_metrics():
+    """Retorna latência e status das chamadas HTTP de saída por host"""
+    return jsonify(http_client.get_metrics())
+
+@scheduler_bp.route('/circuit-breakers', methods=['GET'])
+def get_circuit_breakers():
+    """Retorna o estado do circuit breaker de cada canal de publicação"""
+    return jsonify(publication_breaker.get_status())
+
+@scheduler_bp.route('/channel-registry', methods=['GET'])
+def get_channel_registry():
+    """Retorna os canais em cache e os contadores de acerto/invalidação"""
+    return jsonify(channel_registry.get_status())
+
+@scheduler_bp.route('/publications/requeue', methods=['POST'])
+def requeue_dead_publications():
+    """Reenfileira publicações em dead-letter (todas ou as informadas em 'ids')"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = PublicationManager().requeue_dead_publications(data.get('ids'))
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @scheduler_bp.route('/schedule-content', methods=['POST'])
 def schedule_content_generation():
     """Agenda geração de conteúdo específico"""
@@ -37,12 +86,12 @@ def schedule_content_generation():
     if 'scheduled_time' in data:
         scheduled_time = datetime.fromisoformat(data['scheduled_time'])
     
-    result = scheduler.schedule_content_generation(
-        topic=data['topic'],
-        content_type=data['content_type'],
-        target_sector=data.get('target_sector'),
-        scheduled_time=scheduled_time
-    )
+    # Gravado em scheduled_jobs e executado pelo agendador de heap no horário
+    result = due_scheduler.schedule_job('content_generation', {
+        'topic': data['topic'],
+        'content_type': data['content_type'],
+        'target_sector': data.get('target_sector')
+    }, due_at=scheduled_time)
     
     if result['success']:
         return jsonify(result), 201
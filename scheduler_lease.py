@@ -0,0 +1,30 @@
+from src.models.user import db
+from datetime import datetime
+
+class SchedulerLease(db.Model):
+    __tablename__ = 'scheduler_leases'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)  # 'scheduler'
+    holder = db.Column(db.String(120))  # 'hostname:pid:id' do processo líder
+    fencing_token = db.Column(db.Integer, default=0)  # incrementado a cada troca de líder
+    enabled = db.Column(db.Boolean, default=True, nullable=False)  # False: nenhum processo assume (POST /stop)
+    acquired_at = db.Column(db.DateTime)
+    renewed_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        now = datetime.utcnow()
+        return {
+            'name': self.name,
+            'holder': self.holder,
+            'fencing_token': self.fencing_token,
+            'enabled': self.enabled,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'renewed_at': self.renewed_at.isoformat() if self.renewed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'lease_age_seconds': round((now - self.acquired_at).total_seconds(), 1) if self.acquired_at else None,
+            'heartbeat_age_seconds': round((now - self.renewed_at).total_seconds(), 1) if self.renewed_at else None,
+            'expired': self.expires_at is None or self.expires_at < now
+        }
@@ -0,0 +1,440 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from typing import Dict, List, Optional
+
+# Erros que indicam conexão perdida: a conexão é descartada e o envio repetido em outra.
+# SMTPException herda de OSError, por isso os erros de mensagem são tratados antes.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+class SMTPDeliveryUnknown(smtplib.SMTPException):
+    """Conexão perdida depois do MAIL FROM aceito: a mensagem pode ter sido entregue"""
+
+def _as_bool(value, default: bool) -> bool:
+    # Configurações vindas de JSON/env podem trazer 'false', '0', 'no' como texto
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on', 'sim')
+    return bool(value)
+
+class _EnvelopeTrackingMixin:
+    """
+    Marca quando o servidor aceitou o MAIL FROM da transação atual
+
+    A partir daí uma queda de conexão pode acontecer depois do DATA aceito;
+    repetir o envio em outra conexão entregaria a mensagem duas vezes.
+    """
+
+    mail_accepted = False
+
+    def mail(self, *args, **kwargs):
+        reply = super().mail(*args, **kwargs)
+        self.mail_accepted = True
+        return reply
+
+class _SMTP(_EnvelopeTrackingMixin, smtplib.SMTP):
+    pass
+
+class _SMTP_SSL(_EnvelopeTrackingMixin, smtplib.SMTP_SSL):
+    pass
+
+class _PooledConnection:
+    """Conexão SMTP com metadados de uso"""
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.messages_sent = 0
+
+class SMTPConnectionPool:
+    """Pool de conexões SMTP autenticadas e reutilizadas entre mensagens"""
+
+    def __init__(self, host: str, port: int = 587, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = True, use_ssl: bool = False,
+                 pool_size: int = 4, timeout: float = 30, max_messages_per_connection: int = 500,
+                 max_idle_seconds: float = 60):
+        """
+        Args:
+            host: Servidor SMTP
+            port: Porta do servidor
+            username: Usuário para autenticação (opcional)
+            password: Senha para autenticação (opcional)
+            use_tls: Usa STARTTLS após conectar
+            use_ssl: Conecta diretamente via SSL (porta 465)
+            pool_size: Número máximo de conexões simultâneas
+            timeout: Timeout de rede em segundos
+            max_messages_per_connection: Reabre a conexão após N mensagens
+            max_idle_seconds: Conexões ociosas por mais tempo são verificadas com NOOP
+        """
+
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls and not use_ssl
+        self.use_ssl = use_ssl
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.max_messages_per_connection = max_messages_per_connection
+        self.max_idle_seconds = max_idle_seconds
+
+        self._idle: "queue.LifoQueue[_PooledConnection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'connections_opened': 0,
+            'reconnects': 0,
+            'messages_sent': 0,
+            'messages_failed': 0
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['SMTPConnectionPool']:
+        """Cria o pool a partir de um dict de configuração (ex.: api_config do canal)"""
+
+        host = config.get('smtp_host')
+        if not host:
+            return None
+
+        return cls(
+            host=host,
+            port=int(config.get('smtp_port', 587)),
+            username=config.get('smtp_username'),
+            password=config.get('smtp_password'),
+            use_tls=_as_bool(config.get('smtp_use_tls'), True),
+            use_ssl=_as_bool(config.get('smtp_use_ssl'), False),
+            pool_size=int(config.get('smtp_pool_size', 4))
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional['SMTPConnectionPool']:
+        """Cria o pool a partir das variáveis de ambiente SMTP_*"""
+
+        return cls.from_config({
+            'smtp_host': os.environ.get('SMTP_HOST'),
+            'smtp_port': os.environ.get('SMTP_PORT', 587),
+            'smtp_username': os.environ.get('SMTP_USERNAME'),
+            'smtp_password': os.environ.get('SMTP_PASSWORD'),
+            'smtp_use_tls': os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true',
+            'smtp_use_ssl': os.environ.get('SMTP_USE_SSL', 'false').lower() == 'true',
+            'smtp_pool_size': os.environ.get('SMTP_POOL_SIZE', 4)
+        })
+
+    def _connect(self) -> _PooledConnection:
+        if self.use_ssl:
+            smtp = _SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = _SMTP(self.host, self.port, timeout=self.timeout)
+
+        try:
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            # STARTTLS ou login recusados: fecha o socket antes de propagar
+            try:
+                smtp.close()
+            except Exception:
+                pass
+            raise
+
+        self.stats['connections_opened'] += 1
+        return _PooledConnection(smtp)
+
+    def _discard(self, connection: _PooledConnection):
+        try:
+            connection.smtp.close()
+        except Exception:
+            pass
+
+        with self._lock:
+            self._created -= 1
+
+    def _acquire(self) -> _PooledConnection:
+        """Retorna uma conexão ociosa saudável ou abre uma nova dentro do limite do pool"""
+
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = None
+
+            if connection is None:
+                with self._lock:
+                    can_create = self._created < self.pool_size
+                    if can_create:
+                        self._created += 1
+
+                if can_create:
+                    try:
+                        return self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+
+                connection = self._idle.get(timeout=self.timeout)
+
+            if time.monotonic() - connection.last_used_at > self.max_idle_seconds:
+                try:
+                    if connection.smtp.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected('NOOP falhou')
+                except Exception:
+                    self._discard(connection)
+                    continue
+
+            return connection
+
+    def _release(self, connection: _PooledConnection):
+        connection.last_used_at = time.monotonic()
+
+        if connection.messages_sent >= self.max_messages_per_connection:
+            try:
+                connection.smtp.quit()
+            except Exception:
+                pass
+            self._discard(connection)
+        else:
+            self._idle.put(connection)
+
+    def _send(self, message: EmailMessage, from_addr: Optional[str], to_addrs: Optional[List[str]]) -> Dict:
+        """
+        Envia usando uma conexão do pool
+
+        Uma conexão que caiu antes do MAIL FROM ser aceito (conexão ociosa
+        encerrada pelo servidor) é trocada e o envio repetido uma vez. Depois
+        disso o envio não é repetido e SMTPDeliveryUnknown é levantado: a
+        mensagem pode ter sido entregue.
+        """
+
+        for attempt in range(2):
+            connection = self._acquire()
+            connection.smtp.mail_accepted = False
+
+            try:
+                refused = connection.smtp.send_message(message, from_addr=from_addr, to_addrs=to_addrs)
+            except CONNECTION_ERRORS as e:
+                self._discard(connection)
+                if connection.smtp.mail_accepted:
+                    raise SMTPDeliveryUnknown(str(e)) from e
+                if attempt == 0:
+                    self.stats['reconnects'] += 1
+                    continue
+                raise
+            except smtplib.SMTPException:
+                # Erro da mensagem (destinatário recusado, dados rejeitados): a conexão continua válida
+                try:
+                    connection.smtp.rset()
+                    self._release(connection)
+                except Exception:
+                    self._discard(connection)
+                raise
+            except OSError as e:
+                # Falha de socket (reset, timeout)
+                self._discard(connection)
+                if connection.smtp.mail_accepted:
+                    raise SMTPDeliveryUnknown(str(e)) from e
+                if attempt == 0:
+                    self.stats['reconnects'] += 1
+                    continue
+                raise
+
+            connection.messages_sent += 1
+            self._release(connection)
+            return refused
+
+    def send_message(self, message: EmailMessage) -> Dict:
+        """
+        Envia uma mensagem
+
+        Returns:
+            Dict com status da mensagem ('unknown' quando a conexão caiu depois do MAIL FROM)
+        """
+
+        try:
+            refused = self._send(message, None, None)
+            self.stats['messages_sent'] += 1
+            return {
+                'success': True,
+                'message_id': message['Message-ID'],
+                'refused_recipients': {rcpt: str(reply) for rcpt, reply in refused.items()}
+            }
+        except SMTPDeliveryUnknown as e:
+            self.stats['messages_failed'] += 1
+            return {'success': False, 'message_id': message['Message-ID'], 'error': str(e), 'unknown': True}
+        except Exception as e:
+            self.stats['messages_failed'] += 1
+            return {'success': False, 'message_id': message['Message-ID'], 'error': str(e)}
+
+    def send_many(self, messages: List[EmailMessage]) -> List[Dict]:
+        """Envia várias mensagens reaproveitando as conexões, com status por mensagem"""
+        return [self.send_message(message) for message in messages]
+
+    def send_bulk(self, message: EmailMessage, from_addr: str, recipients: List[str],
+                  max_recipients_per_session: int = 100) -> Dict:
+        """
+        Envia a mesma mensagem para vários destinatários com vários RCPT por sessão
+
+        Args:
+            message: Mensagem (sem destinatários individuais no cabeçalho)
+            from_addr: Remetente do envelope
+            recipients: Destinatários do envelope
+            max_recipients_per_session: Limite de RCPT por transação SMTP
+
+        Returns:
+            Dict com status por destinatário
+        """
+
+        statuses = {}
+
+        for index in range(0, len(recipients), max_recipients_per_session):
+            batch = recipients[index:index + max_recipients_per_session]
+
+            try:
+                refused = self._send(message, from_addr, batch)
+                self.stats['messages_sent'] += 1
+                for rcpt in batch:
+                    if rcpt in refused:
+                        statuses[rcpt] = {'success': False, 'error': str(refused[rcpt])}
+                    else:
+                        statuses[rcpt] = {'success': True}
+            except smtplib.SMTPRecipientsRefused as e:
+                self.stats['messages_failed'] += 1
+                for rcpt in batch:
+                    statuses[rcpt] = {'success': False, 'error': str(e.recipients.get(rcpt, 'recusado'))}
+            except SMTPDeliveryUnknown as e:
+                self.stats['messages_failed'] += 1
+                for rcpt in batch:
+                    statuses[rcpt] = {'success': False, 'error': str(e), 'unknown': True}
+            except Exception as e:
+                self.stats['messages_failed'] += 1
+                for rcpt in batch:
+                    statuses[rcpt] = {'success': False, 'error': str(e)}
+
+        delivered = sum(1 for status in statuses.values() if status['success'])
+
+        return {
+            'success': delivered > 0,
+            'delivered': delivered,
+            'failed': len(statuses) - delivered,
+            'recipients': statuses
+        }
+
+    def close(self):
+        """Encerra todas as conexões ociosas"""
+
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                connection.smtp.quit()
+            except Exception:
+                pass
+            self._discard(connection)
+
+def build_message(from_addr: str, to_addr: Optional[str], subject: str, body: str,
+                  lead_id: Optional[int] = None, domain: Optional[str] = None,
+                  html_body: Optional[str] = None) -> EmailMessage:
+    """Monta uma mensagem de e-mail; o Message-ID identifica o lead para rastrear respostas"""
+
+    message = EmailMessage()
+    message['From'] = from_addr
+    if to_addr:
+        message['To'] = to_addr
+    message['Subject'] = subject
+    message['Date'] = formatdate(localtime=True)
+    message['Message-ID'] = make_msgid(
+        idstring=f'lead-{lead_id}' if lead_id is not None else None,
+        domain=domain or from_addr.split('@')[-1]
+    )
+    message.set_content(body)
+    if html_body:
+        message.add_alternative(html_body, subtype='html')
+    return message
+
+_default_pool: Optional[SMTPConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+def get_default_pool() -> Optional[SMTPConnectionPool]:
+    """Pool compartilhado configurado por variáveis de ambiente (None se SMTP não configurado)"""
+
+    global _default_pool
+
+    if _default_pool is None and os.environ.get('SMTP_HOST'):
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = SMTPConnectionPool.from_env()
+
+    return _default_pool
+
+def benchmark_smtp(count: int = 1000, pool_size: int = 4) -> Dict:
+    """
+    Mede mensagens por segundo contra um servidor aiosmtpd local,
+    comparando o pool com uma conexão nova por mensagem
+
+    As duas medições usam pool_size threads, de modo que a diferença
+    reflete só o reaproveitamento das conexões.
+    """
+
+    from concurrent.futures import ThreadPoolExecutor
+    from aiosmtpd.controller import Controller
+
+    class CountingHandler:
+        def __init__(self):
+            self.received = 0
+
+        async def handle_DATA(self, server, session, envelope):
+            self.received += len(envelope.rcpt_tos)
+            return '250 OK'
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=8025)
+    controller.start()
+
+    try:
+        messages = [
+            build_message('bench@jusfiscal.com.br', f'lead{i}@example.com', f'Benchmark {i}', 'Corpo ' * 200, lead_id=i)
+            for i in range(count)
+        ]
+
+        def send_unpooled(message):
+            with smtplib.SMTP('127.0.0.1', 8025) as smtp:
+                smtp.send_message(message)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            list(executor.map(send_unpooled, messages))
+        unpooled = time.perf_counter() - start
+
+        pool = SMTPConnectionPool('127.0.0.1', 8025, use_tls=False, pool_size=pool_size)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            results = list(executor.map(pool.send_message, messages))
+        pooled = time.perf_counter() - start
+        pool.close()
+
+        return {
+            'messages': count,
+            'concurrency': pool_size,
+            'connection_per_message_msgs_per_second': round(count / unpooled, 1),
+            'pooled_msgs_per_second': round(count / pooled, 1),
+            'pooled_failures': sum(1 for result in results if not result['success']),
+            'connections_opened': pool.stats['connections_opened'],
+            'received_by_server': handler.received
+        }
+    finally:
+        controller.stop()
+
+if __name__ == '__main__':
+    print(benchmark_smtp())
@@ -0,0 +1,31 @@
+from src.models.user import db
+from datetime import datetime
+
+class SuppressionEntry(db.Model):
+    __tablename__ = 'suppression_entries'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'value', name='uq_suppression_kind_value'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'email', 'domain', 'cnpj', 'handle'
+    value = db.Column(db.String(255), nullable=False)  # valor normalizado
+    reason = db.Column(db.String(50), default='manual')  # 'unsubscribe', 'bounce', 'complaint', 'manual', 'import'
+    source = db.Column(db.String(100))
+    lead_id = db.Column(db.Integer)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'value': self.value,
+            'reason': self.reason,
+            'source': self.source,
+            'lead_id': self.lead_id,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
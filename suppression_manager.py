@@ -0,0 +1,326 @@
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+from src.models.suppression import db, SuppressionEntry
+
+SUPPRESSION_KINDS = ('email', 'domain', 'cnpj', 'handle')
+# Perfis são gravados como 'plataforma:perfil': o mesmo nome em outra rede é outra pessoa
+HANDLE_PLATFORMS = ('linkedin', 'instagram')
+
+def normalize(kind: str, value: str, platform: Optional[str] = None) -> Optional[str]:
+    """
+    Normaliza um identificador para comparação
+
+    Args:
+        kind: 'email', 'domain', 'cnpj' ou 'handle'
+        value: Valor bruto (e-mail, domínio, CNPJ com ou sem máscara, URL do perfil,
+            'linkedin:perfil' ou @perfil)
+        platform: Rede do perfil ('linkedin', 'instagram') quando o valor não a indica
+
+    Returns:
+        Valor normalizado ou None se vazio/inválido (perfil sem rede identificável é inválido)
+    """
+
+    if not value:
+        return None
+    value = str(value).strip().lower()
+
+    if kind == 'email':
+        return value if '@' in value else None
+    if kind == 'domain':
+        value = value.split('@')[-1]
+        return value[4:] if value.startswith('www.') else value or None
+    if kind == 'cnpj':
+        digits = re.sub(r'\D', '', value)
+        return digits if len(digits) == 14 else None
+    if kind == 'handle':
+        platform = (platform or '').lower()
+        # URL de perfil (linkedin.com/in/fulano, instagram.com/fulano): a rede vem do endereço
+        if '/' in value:
+            parsed = urlparse(value if '://' in value else f'https://{value}')
+            platform = next((name for name in HANDLE_PLATFORMS if f'{name}.com' in parsed.netloc), platform)
+            value = parsed.path.rstrip('/').split('/')[-1]
+        elif value.partition(':')[0] in HANDLE_PLATFORMS:
+            platform, _, value = value.partition(':')
+        value = value.lstrip('@')
+        if not value or platform not in HANDLE_PLATFORMS:
+            return None
+        return f'{platform}:{value}'
+
+    raise ValueError(f'Tipo de supressão inválido: {kind}')
+
+class SuppressionList:
+    """
+    Lista de supressão consultada a cada envio
+
+    Os valores ativos ficam em sets em memória por tipo (consulta O(1)). O
+    conjunto é atualizado de forma incremental a partir do maior updated_at já
+    carregado, no máximo a cada refresh_interval segundos. Cada leitura volta
+    refresh_overlap antes da marca d'água: uma transação que gravou updated_at
+    antes da última leitura mas só fez commit depois (ou um servidor com o
+    relógio atrasado) ainda é vista na leitura seguinte.
+    """
+
+    def __init__(self, refresh_interval: float = 30.0, refresh_overlap: float = 300.0):
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = timedelta(seconds=refresh_overlap)
+        self._sets: Dict[str, set] = {kind: set() for kind in SUPPRESSION_KINDS}
+        self._watermark: Optional[datetime] = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self.metrics = {
+            'checks': 0,
+            'suppressed': 0,
+            'suppressed_by_kind': {kind: 0 for kind in SUPPRESSION_KINDS},
+            'suppressed_by_channel': {},
+            'refreshes': 0,
+            'loaded_entries': 0
+        }
+
+    def refresh(self, force: bool = False):
+        """Carrega entradas criadas ou alteradas desde a última atualização"""
+
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+
+            query = db.session.query(
+                SuppressionEntry.kind, SuppressionEntry.value, SuppressionEntry.is_active, SuppressionEntry.updated_at
+            )
+            if self._watermark is not None:
+                # Janela sobreposta: reaplicar uma entrada é inofensivo, perder um commit atrasado não
+                query = query.filter(SuppressionEntry.updated_at >= self._watermark - self.refresh_overlap)
+
+            loaded = 0
+            for kind, value, is_active, updated_at in query.yield_per(5000):
+                target = self._sets.setdefault(kind, set())
+                if is_active:
+                    target.add(value)
+                else:
+                    target.discard(value)
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+                loaded += 1
+
+            self._last_refresh = time.monotonic()
+            self.metrics['refreshes'] += 1
+            self.metrics['loaded_entries'] += loaded
+
+    def _contains(self, kind: str, value: Optional[str], platform: Optional[str] = None) -> bool:
+        normalized = normalize(kind, value, platform) if value else None
+        if normalized is None:
+            return False
+        if normalized in self._sets[kind]:
+            return True
+        # Perfis gravados antes da separação por rede (sem prefixo) continuam valendo para todas
+        return kind == 'handle' and normalized.partition(':')[2] in self._sets[kind]
+
+    def check(self, email: Optional[str] = None, cnpj: Optional[str] = None,
+              handles: Iterable[Tuple[str, str]] = (), channel: Optional[str] = None) -> Optional[str]:
+        """
+        Verifica se algum identificador está suprimido
+
+        Args:
+            email: E-mail do destinatário (confere também o domínio)
+            cnpj: CNPJ da empresa
+            handles: Pares (rede, perfil), ex.: ('instagram', 'https://instagram.com/fulano')
+            channel: Canal do envio, só para as métricas
+
+        Returns:
+            Tipo que causou a supressão ('email', 'domain', 'cnpj', 'handle') ou None
+        """
+
+        self.refresh()
+        self.metrics['checks'] += 1
+
+        matched = None
+        if self._contains('email', email):
+            matched = 'email'
+        elif email and self._contains('domain', email):
+            matched = 'domain'
+        elif self._contains('cnpj', cnpj):
+            matched = 'cnpj'
+        elif any(self._contains('handle', handle, platform) for platform, handle in handles if handle):
+            matched = 'handle'
+
+        if matched:
+            self.metrics['suppressed'] += 1
+            self.metrics['suppressed_by_kind'][matched] += 1
+            if channel:
+                by_channel = self.metrics['suppressed_by_channel']
+                by_channel[channel] = by_channel.get(channel, 0) + 1
+
+        return matched
+
+    def check_lead(self, lead, channel: Optional[str] = None) -> Optional[str]:
+        """Verifica todos os identificadores do lead (descadastro vale para todos os canais)"""
+
+        return self.check(
+            email=lead.email,
+            cnpj=getattr(lead, 'cnpj', None),
+            handles=(('linkedin', lead.linkedin_profile), ('instagram', lead.instagram_profile)),
+            channel=channel
+        )
+
+    def check_payload(self, channel: str, payload: Dict) -> Optional[str]:
+        """Verifica o destinatário de uma mensagem do outbox"""
+
+        if channel == 'publication':
+            return None
+
+        return self.check(
+            email=payload.get('to_email'),
+            handles=((channel, payload.get('profile_url')),),
+            channel=channel
+        )
+
+    def add(self, kind: str, value: str, reason: str = 'manual', source: Optional[str] = None,
+            lead_id: Optional[int] = None, platform: Optional[str] = None) -> Dict:
+        """Adiciona (ou reativa) uma entrada e a aplica imediatamente em memória"""
+
+        entry = {'kind': kind, 'value': value, 'lead_id': lead_id, 'platform': platform}
+        result = self.bulk_import([entry], reason, source)
+        if result['success'] and not (result['inserted'] or result['reactivated'] or result['existing']):
+            return {'success': False, 'error': 'Valor inválido para supressão'}
+        return result
+
+    def bulk_import(self, entries: List[Dict], reason: str = 'import', source: Optional[str] = None) -> Dict:
+        """
+        Importa entradas de supressão em lote
+
+        Args:
+            entries: Lista de dicts com kind, value, lead_id opcional e platform (perfis sem URL)
+            reason: Motivo registrado para as novas entradas
+            source: Origem da lista (nome do arquivo, fornecedor etc.)
+
+        Returns:
+            Dict com contagem de inseridos, reativados, existentes e inválidos
+        """
+
+        try:
+            normalized, invalid = self._normalize_entries(entries)
+            counts = {'inserted': 0, 'reactivated': 0, 'existing': 0}
+            items = list(normalized.items())
+
+            for start in range(0, len(items), 500):
+                chunk = dict(items[start:start + 500])
+                self._stage_chunk(chunk, reason, source, counts)
+                db.session.commit()
+                self.apply_staged(chunk)
+
+            return dict(counts, success=True, invalid=invalid)
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+
+    def stage(self, entries: List[Dict], reason: str = 'import', source: Optional[str] = None) -> Dict:
+        """
+        Grava entradas de supressão na transação atual, sem commit
+
+        Para quem grava a supressão junto com outros registros (ex.: lote do
+        ReplyIngestor). Erros sobem para o chamador, que faz rollback de tudo.
+        Depois do commit, chame apply_staged(result['staged']) para aplicar as
+        entradas em memória na hora.
+
+        Returns:
+            Dict com contagens e 'staged': pares (kind, value) gravados
+        """
+
+        normalized, invalid = self._normalize_entries(entries)
+        counts = {'inserted': 0, 'reactivated': 0, 'existing': 0}
+        items = list(normalized.items())
+
+        for start in range(0, len(items), 500):
+            self._stage_chunk(dict(items[start:start + 500]), reason, source, counts)
+
+        return dict(counts, invalid=invalid, staged=list(normalized))
+
+    def apply_staged(self, staged: Iterable[tuple]):
+        """Aplica em memória entradas já confirmadas no banco"""
+
+        with self._lock:
+            for kind, value in staged:
+                self._sets[kind].add(value)
+
+    @staticmethod
+    def _normalize_entries(entries: List[Dict]) -> tuple:
+        normalized = {}
+        invalid = 0
+        for entry in entries:
+            kind = entry.get('kind')
+            value = normalize(kind, entry.get('value'), entry.get('platform')) if kind in SUPPRESSION_KINDS else None
+            if value is None:
+                invalid += 1
+                continue
+            normalized[(kind, value)] = entry.get('lead_id')
+        return normalized, invalid
+
+    @staticmethod
+    def _stage_chunk(chunk: Dict, reason: str, source: Optional[str], counts: Dict):
+        """Insere as entradas novas e reativa as inativas de um bloco (sem commit)"""
+
+        now = datetime.utcnow()
+        found = {}
+        for kind in {kind for kind, _ in chunk}:
+            values = [value for k, value in chunk if k == kind]
+            for row in SuppressionEntry.query.filter(
+                SuppressionEntry.kind == kind, SuppressionEntry.value.in_(values)
+            ):
+                found[(row.kind, row.value)] = row
+
+        new_rows = []
+        for (kind, value), lead_id in chunk.items():
+            row = found.get((kind, value))
+            if row is None:
+                new_rows.append({
+                    'kind': kind, 'value': value, 'reason': reason, 'source': source,
+                    'lead_id': lead_id, 'is_active': True, 'created_at': now, 'updated_at': now
+                })
+            elif not row.is_active:
+                row.is_active = True
+                row.reason = reason
+                row.source = source
+                counts['reactivated'] += 1
+            else:
+                counts['existing'] += 1
+
+        if new_rows:
+            db.session.bulk_insert_mappings(SuppressionEntry, new_rows)
+            counts['inserted'] += len(new_rows)
+
+    def remove(self, kind: str, value: str, platform: Optional[str] = None) -> Dict:
+        """Desativa uma entrada (a remoção é propagada aos outros processos pela atualização incremental)"""
+
+        try:
+            normalized = normalize(kind, value, platform)
+            entry = SuppressionEntry.query.filter_by(kind=kind, value=normalized, is_active=True).first()
+            if not entry:
+                return {'success': False, 'error': 'Entrada de supressão não encontrada'}
+
+            entry.is_active = False
+            db.session.commit()
+
+            with self._lock:
+                self._sets[kind].discard(normalized)
+
+            return {'success': True, 'message': 'Entrada removida da lista de supressão'}
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+
+    def get_stats(self) -> Dict:
+        return dict(
+            self.metrics,
+            entries_in_memory={kind: len(values) for kind, values in self._sets.items()},
+            watermark=self._watermark.isoformat() if self._watermark else None
+        )
+
+suppression_list = SuppressionList()
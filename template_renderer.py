@@ -0,0 +1,146 @@
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import event
+from src.models.content import ContentTemplate
+
+# Variáveis no formato {nome_variavel}
+VARIABLE_PATTERN = re.compile(r'\{([A-Za-z_][A-Za-z0-9_]*)\}')
+
+class TemplateCompileError(ValueError):
+    """Template referencia variáveis que não serão fornecidas"""
+
+class CompiledTemplate:
+    """Template pré-processado em segmentos, renderizado em uma única passada"""
+
+    def __init__(self, source: str, known_variables: Optional[Iterable[str]] = None,
+                 template_id: Optional[int] = None, strict: bool = False):
+        """
+        Args:
+            source: Texto do template
+            known_variables: Variáveis que serão fornecidas na renderização
+            template_id: ID do template de origem (opcional)
+            strict: Se True, variáveis desconhecidas geram TemplateCompileError
+        """
+
+        self.template_id = template_id
+        self.source = source
+
+        # re.split com grupo alterna literal, variável, literal, ...
+        parts = VARIABLE_PATTERN.split(source)
+        self.variables = set(parts[1::2])
+
+        known = set(known_variables) if known_variables is not None else self.variables
+        self.unknown_variables = sorted(self.variables - known)
+
+        if strict and self.unknown_variables:
+            raise TemplateCompileError(
+                f"Variáveis desconhecidas no template: {', '.join(self.unknown_variables)}"
+            )
+
+        # Segmentos: ('text', literal) ou ('var', nome). Variáveis desconhecidas
+        # permanecem literais, como na substituição por str.replace.
+        self.segments: List[tuple] = []
+        for index, part in enumerate(parts):
+            if index % 2 and part in known:
+                self.segments.append(('var', part))
+            elif index % 2:
+                self._append_text('{' + part + '}')
+            elif part:
+                self._append_text(part)
+
+        # Os segmentos viram uma string de formatação: format_map percorre
+        # o template uma única vez, em C
+        self._format_string = ''.join(
+            value.replace('{', '{{').replace('}', '}}') if kind == 'text' else '{' + value + '}'
+            for kind, value in self.segments
+        )
+
+    def _append_text(self, text: str):
+        if self.segments and self.segments[-1][0] == 'text':
+            self.segments[-1] = ('text', self.segments[-1][1] + text)
+        else:
+            self.segments.append(('text', text))
+
+    def render(self, values: Dict) -> str:
+        """Renderiza o template com os valores fornecidos"""
+        return self._format_string.format_map(values)
+
+class TemplateCache:
+    """Cache de templates compilados por ID, invalidado quando o template é editado"""
+
+    def __init__(self):
+        self._entries: Dict[int, CompiledTemplate] = {}
+        self._lock = threading.Lock()
+
+    def get(self, template: ContentTemplate, known_variables: Optional[Iterable[str]] = None) -> CompiledTemplate:
+        """Retorna o template compilado, compilando apenas na primeira vez"""
+
+        source = template.template_content or ''
+        compiled = self._entries.get(template.id)
+
+        # A comparação de conteúdo protege contra edições feitas por outro processo
+        if compiled is not None and compiled.source == source:
+            return compiled
+
+        compiled = CompiledTemplate(source, known_variables, template_id=template.id)
+        if compiled.unknown_variables:
+            print(f"⚠️ Template {template.id} possui variáveis desconhecidas: {compiled.unknown_variables}")
+
+        with self._lock:
+            self._entries[template.id] = compiled
+
+        return compiled
+
+    def invalidate(self, template_id: Optional[int] = None):
+        """Remove um template (ou todos) do cache"""
+
+        with self._lock:
+            if template_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(template_id, None)
+
+template_cache = TemplateCache()
+
+@event.listens_for(ContentTemplate, 'after_update')
+@event.listens_for(ContentTemplate, 'after_delete')
+def _invalidate_compiled_template(mapper, connection, target):
+    template_cache.invalidate(target.id)
+
+def benchmark_render(source: str, count: int = 100000) -> Dict:
+    """Mede a renderização de e-mails personalizados a partir de um template"""
+
+    from src.services.outreach_manager import PERSONALIZATION_VARIABLES
+
+    start = time.perf_counter()
+    compiled = CompiledTemplate(source, PERSONALIZATION_VARIABLES)
+    compile_time = time.perf_counter() - start
+
+    values = {name: f'valor de {name}' for name in PERSONALIZATION_VARIABLES}
+
+    start = time.perf_counter()
+    for index in range(count):
+        values['nome_empresa'] = f'Empresa {index}'
+        compiled.render(values)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'rendered': count,
+        'template_length': len(source),
+        'compile_seconds': round(compile_time, 6),
+        'render_seconds': round(elapsed, 3),
+        'renders_per_second': round(count / elapsed) if elapsed else None
+    }
+
+if __name__ == '__main__':
+    from src.main import app
+    from src.services.template_manager import TemplateManager
+
+    with app.app_context():
+        template = TemplateManager.get_template_by_type('email')
+        if not template:
+            print("Template de e-mail não encontrado. Execute init_data.py primeiro.")
+        else:
+            print(benchmark_render(template.template_content))
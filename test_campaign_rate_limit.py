@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Testes do envio de campanha barrado pelo limite do canal
+
+O envio reservado na campanha não pode virar falha definitiva: vai para o
+outbox com a primeira tentativa no retry_after informado pelo backend.
+"""
+
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.models.lead import Lead, LeadInteraction
+from src.models.campaign import CampaignRun, CampaignSend
+from src.models.outbox import OutboxMessage
+from src.services.channel_backends import ChannelBackend, register_channel_backend
+from src.services.outreach_manager import OutreachManager
+
+class RateLimitedBackend(ChannelBackend):
+    """Backend que sempre responde como o reserve_send com o limite esgotado"""
+
+    name = 'instagram'
+
+    def __init__(self):
+        self.calls = 0
+
+    def send(self, payload, dedupe_key=None):
+        self.calls += 1
+        return {
+            'success': False,
+            'error': 'Limite de envio do instagram atingido; nova tentativa em 120s',
+            'retryable': True,
+            'rate_limited': True,
+            'retry_after': 120
+        }
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def backend():
+    backend = RateLimitedBackend()
+    previous = register_channel_backend('instagram', backend)
+    yield backend
+    register_channel_backend('instagram', previous)
+
+def _send_once(manager, run, lead):
+    """Reivindica e executa um envio como o _execute_run faz para cada lead"""
+
+    key = manager.run_manager.idempotency_key(run, lead.id, 'instagram', 'initial')
+    claimed = manager.run_manager.claim_sends(run, [(lead.id, 'instagram', 'initial')])
+    result = manager._deliver(
+        'instagram',
+        lead.id,
+        {'profile_url': lead.instagram_profile, 'message': 'Olá', 'lead_id': lead.id},
+        {'interaction_type': 'instagram', 'channel': 'instagram_dm', 'message': 'Olá', 'status': 'sent'},
+        key
+    )
+    if key in claimed:
+        manager.run_manager.complete_send(run, claimed[key], result)
+    db.session.commit()
+    return key, result
+
+def test_rate_limited_send_is_queued_not_failed(app, backend):
+    lead = Lead(company_name='Empresa Teste', instagram_profile='https://instagram.com/empresa')
+    run = CampaignRun(campaign_type='outreach', total_leads=1)
+    db.session.add_all([lead, run])
+    db.session.commit()
+
+    manager = OutreachManager(deferred_delivery=False)
+    before = datetime.utcnow()
+    key, result = _send_once(manager, run, lead)
+
+    assert backend.calls == 1
+    assert result['success'] and result['queued']
+
+    campaign_send = CampaignSend.query.filter_by(idempotency_key=key).one()
+    assert campaign_send.status == 'queued'
+    assert run.failed_count == 0
+
+    message = OutboxMessage.query.filter_by(dedupe_key=key).one()
+    assert message.status == 'pending'
+    assert message.available_at >= before.replace(microsecond=0)
+    assert (message.available_at - before).total_seconds() >= 119
+
+    interaction = LeadInteraction.query.filter_by(lead_id=lead.id).one()
+    assert interaction.status == 'queued'
+    assert message.interaction_id == interaction.id
+
+def test_resumed_run_does_not_duplicate_queued_send(app, backend):
+    lead = Lead(company_name='Empresa Teste', instagram_profile='https://instagram.com/empresa')
+    run = CampaignRun(campaign_type='outreach', total_leads=1)
+    db.session.add_all([lead, run])
+    db.session.commit()
+
+    manager = OutreachManager(deferred_delivery=False)
+    key, _ = _send_once(manager, run, lead)
+    _send_once(manager, run, lead)
+
+    assert OutboxMessage.query.filter_by(dedupe_key=key).count() == 1
+    assert LeadInteraction.query.filter_by(lead_id=lead.id).count() == 1
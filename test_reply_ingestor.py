@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Testes do ReplyIngestor com a caixa IMAP em memória (LocalMailbox)
+"""
+
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.models.lead import Lead, LeadInteraction
+from src.models.mailbox_sync import InboundReply, MailboxSyncState
+from src.models.suppression import SuppressionEntry
+from src.services.reply_ingestor import LocalMailbox, ReplyIngestor, classify_reply
+from src.services.suppression_manager import suppression_list
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def build_reply(sender: str, body: str, lead_id=None, date='Mon, 06 Oct 2025 09:30:00 -0300',
+                message_id=None) -> bytes:
+    headers = [
+        f'From: {sender}',
+        'To: contato@jusfiscal.com.br',
+        'Subject: Re: Proposta JusFiscal',
+        f'Date: {date}',
+        f'Message-ID: {message_id or f"<{abs(hash((sender, body)))}@cliente.com.br>"}',
+        'Content-Type: text/plain; charset=utf-8'
+    ]
+    if lead_id:
+        headers.append(f'In-Reply-To: <20251001.abc.lead-{lead_id}@jusfiscal.com.br>')
+    return ('\r\n'.join(headers) + '\r\n\r\n' + body).encode('utf-8')
+
+@pytest.mark.parametrize('body,expected', [
+    ('Tenho interesse, podemos conversar na quinta?', 'interested'),
+    ('Estamos interessados em saber mais.', 'interested'),
+    ('Não estou interessado.', 'not_interested'),
+    ('Não estamos interessados, obrigado.', 'not_interested'),
+    ('Obrigado, mas não tenho mais interesse.', 'not_interested'),
+    ("Thanks, I'm not really interested.", 'not_interested'),
+    ('Por favor, me remova da lista.', 'unsubscribe'),
+])
+def test_classify_reply(body, expected):
+    assert classify_reply('cliente@empresa.com.br', 'Re: Recuperação tributária', body, {}) == expected
+
+def test_sync_applies_replies_incrementally(app):
+    interested = Lead(company_name='Empresa A', email='ana@empresa-a.com.br', status='contacted')
+    declined = Lead(company_name='Empresa B', email='bruno@empresa-b.com.br', status='contacted')
+    unsubscribed = Lead(company_name='Empresa C', email='carla@empresa-c.com.br', status='contacted')
+    db.session.add_all([interested, declined, unsubscribed])
+    db.session.commit()
+
+    mailbox = LocalMailbox(uidvalidity=7)
+    mailbox.append(build_reply('Ana <ana@empresa-a.com.br>', 'Tenho interesse, vamos conversar.', lead_id=interested.id))
+    mailbox.append(build_reply('bruno@empresa-b.com.br', 'Não estamos interessados no momento.'))
+    mailbox.append(build_reply('carla@empresa-c.com.br', 'Quero descadastrar este e-mail.', lead_id=unsubscribed.id))
+
+    ingestor = ReplyIngestor('imap.local', 'respostas', 'senha', batch_size=2, imap_factory=lambda: mailbox)
+    summary = ingestor.sync()
+
+    assert summary['success']
+    assert summary['fetched'] == 3 and summary['matched'] == 3
+    assert summary['last_uid'] == 3
+
+    assert db.session.get(Lead, interested.id).status == 'qualified'
+    assert db.session.get(Lead, declined.id).status == 'lost'
+    assert db.session.get(Lead, unsubscribed.id).status == 'unsubscribed'
+    assert LeadInteraction.query.count() == 3
+
+    # Descadastro gravado junto com o lote e aplicado em memória
+    assert SuppressionEntry.query.filter_by(kind='email', value='carla@empresa-c.com.br').count() == 1
+    assert suppression_list.check(email='carla@empresa-c.com.br') == 'email'
+
+    # Date com fuso -03:00 gravado em UTC
+    reply = InboundReply.query.filter_by(lead_id=interested.id).one()
+    assert reply.received_at == datetime(2025, 10, 6, 12, 30)
+
+    # Segunda execução só lê o que chegou depois do último UID
+    mailbox.append(build_reply('ana@empresa-a.com.br', 'Pode ligar amanhã às 10h.', lead_id=interested.id))
+    summary = ingestor.sync()
+
+    assert summary['success'] and summary['fetched'] == 1
+    assert MailboxSyncState.query.one().last_uid == 4
+    assert InboundReply.query.count() == 4
+
+def test_uidvalidity_change_skips_known_messages(app):
+    lead = Lead(company_name='Empresa A', email='ana@empresa-a.com.br', status='contacted')
+    db.session.add(lead)
+    db.session.commit()
+
+    mailbox = LocalMailbox(uidvalidity=1)
+    mailbox.append(build_reply('ana@empresa-a.com.br', 'Tenho interesse.', message_id='<resposta-1@empresa-a.com.br>'))
+    ingestor = ReplyIngestor('imap.local', 'respostas', 'senha', imap_factory=lambda: mailbox)
+    assert ingestor.sync()['fetched'] == 1
+
+    # Caixa recriada: os UIDs recomeçam e a mensagem já registrada é ignorada pelo Message-ID
+    mailbox.uidvalidity = 2
+    summary = ingestor.sync()
+
+    assert summary['success'] and summary['duplicates'] == 1
+    assert InboundReply.query.count() == 1
+    assert LeadInteraction.query.count() == 1
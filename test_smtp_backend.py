@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Testes do SMTPConnectionPool contra um servidor aiosmtpd local
+
+O handler do servidor pode derrubar a conexão no MAIL FROM (antes de o
+remetente ser aceito) ou no DATA (depois), e recusa destinatários cujo
+endereço começa com 'bounce'.
+"""
+
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from src.services.smtp_backend import SMTPConnectionPool, build_message
+
+class StubSMTPHandler:
+    """Servidor SMTP mínimo; as quedas são disparadas pelos contadores drop_*"""
+
+    def __init__(self):
+        self.drop_on_mail = 0
+        self.drop_on_data = 0
+        self.mail_commands = 0
+        self.data_commands = 0
+        self.delivered = []
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        self.mail_commands += 1
+        if self.drop_on_mail:
+            self.drop_on_mail -= 1
+            server.transport.close()
+            return '421 Conexão encerrada'
+        envelope.mail_from = address
+        envelope.mail_options.extend(mail_options)
+        return '250 OK'
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('bounce'):
+            return '550 Caixa postal inexistente'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.data_commands += 1
+        if self.drop_on_data:
+            # Mensagem recebida, mas a conexão cai antes da resposta ao DATA
+            self.drop_on_data -= 1
+            server.transport.close()
+            return '250 OK'
+        self.delivered.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def server():
+    handler = StubSMTPHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+@pytest.fixture
+def pool(server):
+    pool = SMTPConnectionPool('127.0.0.1', server[1], use_tls=False, pool_size=1, timeout=5)
+    yield pool
+    pool.close()
+
+def message(to_addr: str = 'lead@empresa.com.br', lead_id: int = 1):
+    return build_message('contato@jusfiscal.com.br', to_addr, 'Proposta JusFiscal', 'Olá', lead_id=lead_id)
+
+def test_connection_is_reused(server, pool):
+    handler, _ = server
+
+    results = pool.send_many([message(f'lead{index}@empresa.com.br', index) for index in range(3)])
+
+    assert all(result['success'] for result in results)
+    assert pool.stats['connections_opened'] == 1
+    assert handler.delivered == [f'lead{index}@empresa.com.br' for index in range(3)]
+
+def test_drop_before_mail_accepted_reconnects_and_sends(server, pool):
+    handler, _ = server
+    handler.drop_on_mail = 1
+
+    result = pool.send_message(message())
+
+    assert result['success']
+    assert pool.stats['reconnects'] == 1
+    assert pool.stats['connections_opened'] == 2
+    assert handler.delivered == ['lead@empresa.com.br']
+
+def test_drop_after_mail_accepted_is_unknown_and_not_resent(server, pool):
+    handler, _ = server
+    handler.drop_on_data = 1
+
+    result = pool.send_message(message())
+
+    assert not result['success'] and result['unknown']
+    # O DATA chegou ao servidor uma única vez: nenhum reenvio em outra conexão
+    assert handler.data_commands == 1
+    assert pool.stats['reconnects'] == 0
+
+    # A conexão derrubada foi descartada: o próximo envio abre outra
+    assert pool.send_message(message(lead_id=2))['success']
+    assert pool.stats['connections_opened'] == 2
+
+def test_send_bulk_reports_each_recipient(server, pool):
+    handler, _ = server
+    message_for_all = build_message('contato@jusfiscal.com.br', None, 'Novidades', 'Texto')
+    recipients = ['ana@empresa.com.br', 'bounce@empresa.com.br', 'bruno@empresa.com.br']
+
+    result = pool.send_bulk(message_for_all, 'contato@jusfiscal.com.br', recipients, max_recipients_per_session=2)
+
+    assert result['delivered'] == 2 and result['failed'] == 1
+    assert result['recipients']['ana@empresa.com.br'] == {'success': True}
+    assert result['recipients']['bruno@empresa.com.br'] == {'success': True}
+    assert not result['recipients']['bounce@empresa.com.br']['success']
+    assert '550' in result['recipients']['bounce@empresa.com.br']['error']
+    assert sorted(handler.delivered) == ['ana@empresa.com.br', 'bruno@empresa.com.br']
+
+def test_send_bulk_session_with_every_recipient_refused(server, pool):
+    message_for_all = build_message('contato@jusfiscal.com.br', None, 'Novidades', 'Texto')
+
+    result = pool.send_bulk(message_for_all, 'contato@jusfiscal.com.br', ['bounce1@empresa.com.br', 'bounce2@empresa.com.br'])
+
+    assert not result['success'] and result['failed'] == 2
+    assert all('550' in status['error'] for status in result['recipients'].values())
+
+    # Recusa de destinatários não derruba a conexão
+    assert pool.send_message(message())['success']
+    assert pool.stats['connections_opened'] == 1
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Testes do WordPressBatchClient contra um WordPress local (http.server)
+
+O servidor de teste implementa só o que o cliente usa: OPTIONS e POST em
+/wp-json/batch/v1 e POST em /wp-json/wp/v2/posts.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.services import wordpress_batch
+from src.services.wordpress_batch import WordPressBatchClient
+
+class StubWordPress(BaseHTTPRequestHandler):
+    """WordPress mínimo; o comportamento é ajustado pelos atributos de classe"""
+
+    batch_enabled = True
+    max_items = 2
+    drop_responses = 0  # sub-respostas omitidas no fim de cada lote
+    close_on_batch = False  # fecha a conexão sem responder ao POST do lote
+    calls = []
+    next_id = 100
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _create(self, post):
+        if not post.get('title'):
+            return 400, {'code': 'empty_content', 'message': 'Conteúdo, título e resumo estão vazios.'}
+        StubWordPress.next_id += 1
+        post_id = StubWordPress.next_id
+        return 201, {'id': post_id, 'link': f'http://wordpress.local/?p={post_id}'}
+
+    def do_OPTIONS(self):
+        self.calls.append(('OPTIONS', self.path))
+        if not self.batch_enabled:
+            return self._send(404, {'code': 'rest_no_route'})
+        self._send(200, {'endpoints': [{'args': {'requests': {'maxItems': self.max_items}}}]})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.calls.append(('POST', self.path))
+
+        if self.path == '/wp-json/batch/v1':
+            if not self.batch_enabled:
+                return self._send(404, {'code': 'rest_no_route'})
+            if self.close_on_batch:
+                self.close_connection = True
+                self.connection.close()
+                return
+            responses = []
+            for request in payload['requests']:
+                status, body = self._create(request['body'])
+                responses.append({'status': status, 'body': body, 'headers': {}})
+            if self.drop_responses:
+                responses = responses[:-self.drop_responses]
+            return self._send(207, {'responses': responses})
+
+        status, body = self._create(payload)
+        self._send(status, body)
+
+@pytest.fixture
+def site():
+    StubWordPress.batch_enabled = True
+    StubWordPress.drop_responses = 0
+    StubWordPress.close_on_batch = False
+    StubWordPress.calls = []
+    wordpress_batch._batch_sizes.clear()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWordPress)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield {'site_url': f'http://127.0.0.1:{server.server_address[1]}/', 'username': 'editor', 'password': 'senha'}
+    server.shutdown()
+    server.server_close()
+
+def posts(count: int):
+    return [{'title': f'Post {index}', 'content': 'Texto', 'status': 'publish'} for index in range(count)]
+
+def test_batches_follow_server_limit(site):
+    client = WordPressBatchClient(site)
+    results = client.create_posts(posts(4) + [{'title': '', 'content': ''}])
+
+    assert client.mode == 'batch'
+    assert [result['success'] for result in results] == [True, True, True, True, False]
+    assert results[0]['url'].startswith('http://wordpress.local/?p=')
+    assert 'empty_content' in results[-1]['error']
+
+    # maxItems=2: cinco posts em três lotes, limite consultado uma vez
+    assert StubWordPress.calls.count(('POST', '/wp-json/batch/v1')) == 3
+    assert StubWordPress.calls.count(('OPTIONS', '/wp-json/batch/v1')) == 1
+
+def test_site_without_batch_api_posts_individually(site):
+    StubWordPress.batch_enabled = False
+
+    client = WordPressBatchClient(site)
+    results = client.create_posts(posts(3))
+
+    assert client.mode == 'single'
+    assert all(result['success'] for result in results)
+    assert StubWordPress.calls.count(('POST', '/wp-json/wp/v2/posts')) == 3
+
+def test_missing_sub_response_is_unknown(site):
+    StubWordPress.drop_responses = 1
+
+    results = WordPressBatchClient(site).create_posts(posts(2))
+
+    assert results[0]['success']
+    assert not results[1]['success']
+    assert results[1]['unknown'] and results[1]['retryable'] is False
+
+def test_dropped_batch_connection_is_unknown_and_not_repeated(site):
+    StubWordPress.close_on_batch = True
+
+    results = WordPressBatchClient(site).create_posts(posts(2))
+
+    assert all(result['unknown'] and result['retryable'] is False for result in results)
+    # O POST do lote não é repetido: o site pode já ter criado os posts
+    assert StubWordPress.calls.count(('POST', '/wp-json/batch/v1')) == 1
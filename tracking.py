@@ -0,0 +1,51 @@
+from flask import Blueprint, request, jsonify, Response, redirect, abort
+from src.services.tracking_manager import tracking_buffer, verify_token
+
+tracking_bp = Blueprint('tracking', __name__)
+
+# GIF transparente 1x1
+PIXEL = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+         b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+
+NO_CACHE_HEADERS = {
+    'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
+    'Pragma': 'no-cache'
+}
+
+def _client_ip():
+    forwarded = request.headers.get('X-Forwarded-For')
+    return forwarded.split(',')[0].strip() if forwarded else request.remote_addr
+
+@tracking_bp.route('/o/<token>.gif', methods=['GET'])
+def track_open(token):
+    """Pixel de abertura: registra o evento em memória e responde sem acessar o banco"""
+
+    verified = verify_token(token)
+    if verified:
+        tracking_buffer.record('open', verified[0], verified[1],
+                               user_agent=request.headers.get('User-Agent'), ip_address=_client_ip())
+
+    # Token inválido também recebe o pixel, para não quebrar a exibição do e-mail
+    return Response(PIXEL, mimetype='image/gif', headers=NO_CACHE_HEADERS)
+
+@tracking_bp.route('/c/<token>', methods=['GET'])
+def track_click(token):
+    """Redireciona para a URL assinada no token e registra o clique"""
+
+    url = request.args.get('u', '')
+    verified = verify_token(token, url)
+
+    # A URL faz parte da assinatura: sem token válido não há redirecionamento (evita open redirect)
+    if not verified or not url.startswith(('http://', 'https://')):
+        abort(404)
+
+    tracking_buffer.record('click', verified[0], verified[1], url=url,
+                           user_agent=request.headers.get('User-Agent'), ip_address=_client_ip())
+
+    return redirect(url, code=302)
+
+@tracking_bp.route('/stats', methods=['GET'])
+def get_tracking_stats():
+    """Retorna contadores do buffer de rastreamento"""
+
+    return jsonify(tracking_buffer.get_stats())
@@ -0,0 +1,45 @@
+from src.models.user import db
+from datetime import datetime
+
+class TrackingEvent(db.Model):
+    __tablename__ = 'tracking_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, nullable=False, index=True)
+    tracking_id = db.Column(db.String(32), nullable=False, index=True)  # identifica o e-mail enviado
+    interaction_id = db.Column(db.Integer, index=True)  # preenchido no rollup
+    event_type = db.Column(db.String(10), nullable=False)  # 'open', 'click'
+    url = db.Column(db.String(1000))
+    user_agent = db.Column(db.String(300))
+    ip_address = db.Column(db.String(45))
+    occurred_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lead_id': self.lead_id,
+            'tracking_id': self.tracking_id,
+            'interaction_id': self.interaction_id,
+            'event_type': self.event_type,
+            'url': self.url,
+            'user_agent': self.user_agent,
+            'ip_address': self.ip_address,
+            'occurred_at': self.occurred_at.isoformat() if self.occurred_at else None
+        }
+
+class TrackedEmail(db.Model):
+    __tablename__ = 'tracked_emails'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tracking_id = db.Column(db.String(32), unique=True, nullable=False)  # índice de busca do rollup
+    lead_id = db.Column(db.Integer, nullable=False)
+    interaction_id = db.Column(db.Integer, nullable=False)  # LeadInteraction do envio
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'tracking_id': self.tracking_id,
+            'lead_id': self.lead_id,
+            'interaction_id': self.interaction_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
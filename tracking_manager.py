@@ -0,0 +1,313 @@
+import atexit
+import base64
+import hashlib
+import hmac
+import html
+import os
+import re
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+from sqlalchemy import event, insert, update
+from src.models.lead import db, Lead, LeadInteraction
+from src.models.tracking_event import TrackingEvent, TrackedEmail
+
+# Pontos somados ao score do lead na primeira abertura/clique de cada e-mail
+OPEN_SCORE = 5
+CLICK_SCORE = 10
+
+# Status a partir dos quais cada evento avança a interação (não rebaixa 'clicked' nem respostas)
+OPENABLE_STATUSES = ('sent', 'delivered')
+CLICKABLE_STATUSES = ('sent', 'delivered', 'opened')
+
+# Pontuação final (ponto, vírgula, parêntese) não faz parte do link
+URL_PATTERN = re.compile(r'https?://[^\s<>"]*[^\s<>".,;:!?)]')
+
+_secret: Optional[bytes] = None
+
+def _get_secret() -> bytes:
+    global _secret
+    if _secret is None:
+        secret = os.environ.get('TRACKING_SECRET')
+        if not secret:
+            from flask import current_app
+            secret = current_app.config['SECRET_KEY']
+        _secret = secret.encode()
+    return _secret
+
+def _signature(lead_id: int, tracking_id: str, url: str = '') -> str:
+    digest = hmac.new(_get_secret(), f'{lead_id}.{tracking_id}|{url}'.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b'=').decode()
+
+def new_tracking_id() -> str:
+    return uuid.uuid4().hex
+
+def make_token(lead_id: int, tracking_id: str, url: str = '') -> str:
+    """Token assinado '<lead>.<tracking_id>.<assinatura>'; em cliques a URL de destino entra na assinatura"""
+    return f'{lead_id}.{tracking_id}.{_signature(lead_id, tracking_id, url)}'
+
+def verify_token(token: str, url: str = '') -> Optional[Tuple[int, str]]:
+    """Valida o token sem acessar o banco; retorna (lead_id, tracking_id) ou None"""
+
+    try:
+        lead_id, tracking_id, signature = token.split('.')
+        lead_id = int(lead_id)
+    except ValueError:
+        return None
+
+    if not hmac.compare_digest(signature, _signature(lead_id, tracking_id, url)):
+        return None
+    return lead_id, tracking_id
+
+def render_tracked_html(text: str, lead_id: int, tracking_id: str, base_url: Optional[str] = None) -> Optional[str]:
+    """
+    Versão HTML do e-mail com links rastreados e pixel de abertura
+
+    Args:
+        text: Corpo em texto do e-mail
+        lead_id: ID do lead
+        tracking_id: Identificador do envio (gravado nos metadados da interação)
+        base_url: URL pública da aplicação (padrão: TRACKING_BASE_URL)
+
+    Returns:
+        HTML ou None se o rastreamento não estiver configurado
+    """
+
+    base_url = (base_url or os.environ.get('TRACKING_BASE_URL', '')).rstrip('/')
+    if not base_url:
+        return None
+
+    def tracked_link(match):
+        url = html.unescape(match.group(0))
+        href = f"{base_url}/t/c/{make_token(lead_id, tracking_id, url)}?u={quote(url, safe='')}"
+        return f'<a href="{html.escape(href)}">{match.group(0)}</a>'
+
+    body = URL_PATTERN.sub(tracked_link, html.escape(text, quote=False)).replace('\n', '<br>\n')
+    pixel = f'<img src="{base_url}/t/o/{make_token(lead_id, tracking_id)}.gif" width="1" height="1" alt="" style="display:none">'
+
+    return f'<html><body>{body}\n{pixel}</body></html>'
+
+class TrackingBuffer:
+    """
+    Buffer circular de eventos de rastreamento gravado em lotes
+
+    O endpoint só valida o token e faz append no deque; uma thread grava os
+    eventos em tracking_events e aplica o rollup (status da interação e score
+    do lead) em uma transação por lote, sem lock de escrita por requisição.
+    A thread é iniciada no primeiro evento de cada processo (workers criados
+    por fork não herdam threads).
+    """
+
+    def __init__(self, capacity: int = 100000, batch_size: int = 1000, flush_interval: float = 1.0):
+        """
+        Args:
+            capacity: Eventos mantidos em memória; acima disso os mais antigos são descartados
+            batch_size: Eventos por transação
+            flush_interval: Intervalo máximo (segundos) entre gravações
+        """
+
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._events = deque(maxlen=capacity)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._app = None
+        self.stats = {
+            'received': 0,
+            'dropped': 0,
+            'written': 0,
+            'transactions': 0,
+            'failed_transactions': 0,
+            'interactions_updated': 0,
+            'last_error': None
+        }
+
+    def record(self, event_type: str, lead_id: int, tracking_id: str, url: Optional[str] = None,
+               user_agent: Optional[str] = None, ip_address: Optional[str] = None):
+        """Enfileira um evento (O(1), sem acesso ao banco)"""
+
+        if len(self._events) >= self.capacity:
+            self.stats['dropped'] += 1
+        self._events.append((event_type, lead_id, tracking_id, url, user_agent, ip_address, datetime.utcnow()))
+        self.stats['received'] += 1
+
+        if self._pid != os.getpid():
+            from flask import current_app
+            self.start(current_app._get_current_object())
+
+        if len(self._events) >= self.batch_size:
+            self._wake.set()
+
+    def start(self, app):
+        """Inicia a thread de gravação (uma por processo)"""
+
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+
+            if self._pid is not None:
+                # Processo filho de um fork: a thread do pai não existe aqui e os
+                # eventos copiados do pai são gravados por ele
+                self._events.clear()
+                self._stop = threading.Event()
+                self._wake = threading.Event()
+
+            self._pid = os.getpid()
+            self._app = app
+            self._thread = threading.Thread(target=self._run, name='tracking-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._app.app_context():
+                self.flush()
+
+        # Grava o que restou ao encerrar o processo
+        with self._app.app_context():
+            self.flush()
+
+    def flush(self) -> int:
+        """Grava os eventos pendentes em lotes; retorna quantos foram gravados"""
+
+        written = 0
+
+        while self._events:
+            batch = []
+            while self._events and len(batch) < self.batch_size:
+                batch.append(self._events.popleft())
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                db.session.rollback()
+                # Devolve o lote ao início do buffer para a próxima tentativa
+                self._events.extendleft(reversed(batch))
+                self.stats['failed_transactions'] += 1
+                self.stats['last_error'] = str(e)
+                print(f"Erro ao gravar eventos de rastreamento: {e}")
+                break
+
+            written += len(batch)
+            self.stats['written'] += len(batch)
+            self.stats['transactions'] += 1
+
+        return written
+
+    def _write_batch(self, batch: List[tuple]):
+        """Grava eventos e aplica o rollup em interações e leads em uma transação"""
+
+        interactions = self._find_interactions(batch)
+
+        rows = []
+        score_delta: Dict[int, int] = {}
+        updated = 0
+
+        for event_type, lead_id, tracking_id, url, user_agent, ip_address, occurred_at in batch:
+            interaction = interactions.get(tracking_id)
+            if interaction is not None and interaction.lead_id != lead_id:
+                interaction = None
+
+            rows.append({
+                'lead_id': lead_id,
+                'tracking_id': tracking_id,
+                'interaction_id': interaction.id if interaction else None,
+                'event_type': event_type,
+                'url': url[:1000] if url else None,
+                'user_agent': user_agent[:300] if user_agent else None,
+                'ip_address': ip_address,
+                'occurred_at': occurred_at
+            })
+
+            if interaction is None:
+                continue
+
+            delta = 0
+            if event_type == 'open' and interaction.status in OPENABLE_STATUSES:
+                interaction.status = 'opened'
+                delta = OPEN_SCORE
+            elif event_type == 'click' and interaction.status in CLICKABLE_STATUSES:
+                # Clique sem abertura registrada (pixel bloqueado) também conta a abertura
+                delta = CLICK_SCORE + (OPEN_SCORE if interaction.status in OPENABLE_STATUSES else 0)
+                interaction.status = 'clicked'
+
+            if delta:
+                updated += 1
+                score_delta[lead_id] = score_delta.get(lead_id, 0) + delta
+
+        db.session.execute(insert(TrackingEvent), rows)
+
+        if score_delta:
+            db.session.execute(update(Lead), [
+                {'id': lead_id, 'score': min(100, (score or 0) + score_delta[lead_id])}
+                for lead_id, score in db.session.query(Lead.id, Lead.score).filter(Lead.id.in_(list(score_delta)))
+            ])
+
+        db.session.commit()
+        self.stats['interactions_updated'] += updated
+
+    @staticmethod
+    def _find_interactions(batch: List[tuple]) -> Dict[str, LeadInteraction]:
+        """Interações de e-mail do lote por tracking_id (índice em tracked_emails)"""
+
+        tracking_ids = {event[2] for event in batch}
+
+        interaction_ids = dict(
+            db.session.query(TrackedEmail.tracking_id, TrackedEmail.interaction_id).filter(
+                TrackedEmail.tracking_id.in_(list(tracking_ids))
+            )
+        )
+        by_id = {}
+        if interaction_ids:
+            by_id = {
+                interaction.id: interaction
+                for interaction in LeadInteraction.query.filter(LeadInteraction.id.in_(list(interaction_ids.values())))
+            }
+        interactions = {
+            tracking_id: by_id[interaction_id]
+            for tracking_id, interaction_id in interaction_ids.items() if interaction_id in by_id
+        }
+
+        # E-mails enviados antes de tracked_emails existir: procura nos metadados e grava o índice
+        legacy = {event[2]: event[1] for event in batch if event[2] not in interaction_ids}
+        if legacy:
+            for interaction in LeadInteraction.query.filter(
+                LeadInteraction.lead_id.in_(list(set(legacy.values()))),
+                LeadInteraction.interaction_type == 'email'
+            ):
+                tracking_id = interaction.get_metadata().get('tracking_id')
+                if tracking_id in legacy and tracking_id not in interactions:
+                    interactions[tracking_id] = interaction
+                    db.session.add(TrackedEmail(tracking_id=tracking_id, lead_id=interaction.lead_id,
+                                                interaction_id=interaction.id))
+
+        return interactions
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, pending=len(self._events), capacity=self.capacity)
+
+tracking_buffer = TrackingBuffer()
+
+@event.listens_for(LeadInteraction, 'after_insert')
+def _index_tracking_id(mapper, connection, target):
+    # Mesma transação da interação: o rollup acha o envio pelo índice, sem ler os metadados
+    tracking_id = target.get_metadata().get('tracking_id') if target.interaction_type == 'email' else None
+    if tracking_id:
+        connection.execute(TrackedEmail.__table__.insert().values(
+            tracking_id=tracking_id, lead_id=target.lead_id, interaction_id=target.id, created_at=datetime.utcnow()
+        ))
@@ -0,0 +1,179 @@
+import hashlib
+import html
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import event, inspect
+from src.models.content import GeneratedContent
+from src.models.content_variant import db, ContentVariant
+from src.services.instagram_manager import InstagramManager
+
+# Incrementar ao mudar as regras abaixo: variantes gravadas com outra versão são renderizadas de novo
+RENDERER_VERSION = 1
+
+CHANNEL_TYPES = ('linkedin', 'instagram', 'wordpress', 'email')
+
+LINKEDIN_MAX_CHARS = 1300
+INSTAGRAM_MAX_CHARS = 2200
+INSTAGRAM_MAX_HASHTAGS = 30
+
+# Campos cuja alteração invalida as variantes gravadas
+SOURCE_FIELDS = ('title', 'content', 'keywords')
+
+def content_hash(title: str, body: str, keywords: List[str]) -> str:
+    payload = json.dumps([RENDERER_VERSION, title or '', body or '', keywords or []], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def _wordpress_html(body: str) -> str:
+    # Parágrafos separados por linha em branco; quebras simples viram <br>
+    paragraphs = [block.strip() for block in (body or '').split('\n\n') if block.strip()]
+    return '\n'.join(f"<p>{html.escape(block).replace(chr(10), '<br>')}</p>" for block in paragraphs)
+
+def render_variants(title: str, body: str, keywords: Optional[List[str]]) -> Dict[str, Dict]:
+    """
+    Renderiza o conteúdo no formato de cada canal
+
+    Args:
+        title: Título do conteúdo
+        body: Texto do conteúdo
+        keywords: Palavras-chave (viram hashtags/tags)
+
+    Returns:
+        Dict canal -> campos prontos para a API do canal
+    """
+
+    keywords = keywords or []
+    post_text = f"{title}\n\n{body}"
+
+    # LinkedIn: texto limitado + hashtags das keywords
+    linkedin_text = _truncate(post_text, LINKEDIN_MAX_CHARS)
+    if keywords:
+        linkedin_text += "\n\n" + " ".join([f"#{keyword.replace(' ', '')}" for keyword in keywords[:5]])
+
+    # Instagram: legenda limitada + hashtags tributárias e das keywords
+    hashtags = InstagramManager.generate_hashtags_for_tax_content()
+    for keyword in keywords[:5]:
+        clean_keyword = keyword.replace(' ', '').lower()
+        if clean_keyword not in hashtags:
+            hashtags.append(clean_keyword)
+
+    return {
+        'linkedin': {'text': linkedin_text},
+        'instagram': {
+            'caption': _truncate(post_text, INSTAGRAM_MAX_CHARS),
+            'hashtags': hashtags[:INSTAGRAM_MAX_HASHTAGS]
+        },
+        'wordpress': {'title': title, 'content': _wordpress_html(body), 'tags': keywords},
+        'email': {'subject': title, 'body': body}
+    }
+
+def _source(content: GeneratedContent):
+    return content.title, content.content, content.get_keywords()
+
+def _store(connection, content_id: int, variants: Dict[str, Dict], digest: str):
+    table = ContentVariant.__table__
+    connection.execute(table.delete().where(table.c.content_id == content_id))
+    connection.execute(table.insert(), [
+        {
+            'content_id': content_id,
+            'channel_type': channel_type,
+            'content_hash': digest,
+            'payload': json.dumps(payload, ensure_ascii=False),
+            'rendered_at': datetime.utcnow()
+        }
+        for channel_type, payload in variants.items()
+    ])
+
+def _after_content_insert(mapper, connection, target):
+    title, body, keywords = _source(target)
+    _store(connection, target.id, render_variants(title, body, keywords), content_hash(title, body, keywords))
+
+def _after_content_update(mapper, connection, target):
+    # Mudanças só de status/datas (ex.: ao publicar) não renderizam de novo
+    state = inspect(target)
+    changed = any(
+        state.attrs[field].history.has_changes()
+        for field in SOURCE_FIELDS if field in state.attrs
+    )
+    if changed:
+        _after_content_insert(mapper, connection, target)
+
+# Renderiza na mesma transação em que o conteúdo é criado ou editado
+event.listen(GeneratedContent, 'after_insert', _after_content_insert)
+event.listen(GeneratedContent, 'after_update', _after_content_update)
+
+def get_variants(content: GeneratedContent) -> Dict[str, Dict]:
+    """
+    Variantes do conteúdo para todos os canais
+
+    Usa as gravadas se o hash confere; caso contrário (conteúdo anterior ao
+    cache ou regras alteradas) renderiza em memória sem gravar.
+    """
+
+    title, body, keywords = _source(content)
+    digest = content_hash(title, body, keywords)
+
+    stored = {
+        variant.channel_type: variant.get_payload()
+        for variant in ContentVariant.query.filter_by(content_id=content.id, content_hash=digest)
+    }
+    if all(channel_type in stored for channel_type in CHANNEL_TYPES):
+        return stored
+
+    return render_variants(title, body, keywords)
+
+def get_variant(content: GeneratedContent, channel_type: str) -> Dict:
+    """Variante gravada do canal, ou renderizada na hora se estiver desatualizada"""
+
+    title, body, keywords = _source(content)
+    digest = content_hash(title, body, keywords)
+
+    variant = ContentVariant.query.filter_by(
+        content_id=content.id, channel_type=channel_type, content_hash=digest
+    ).first()
+    if variant:
+        return variant.get_payload()
+
+    return render_variants(title, body, keywords).get(channel_type, {})
+
+def refresh_variants(content: GeneratedContent) -> Dict[str, Dict]:
+    """Renderiza e grava as variantes do conteúdo (sem commit)"""
+
+    title, body, keywords = _source(content)
+    variants = render_variants(title, body, keywords)
+    _store(db.session.connection(), content.id, variants, content_hash(title, body, keywords))
+    return variants
+
+def backfill_variants(batch_size: int = 500) -> int:
+    """Grava variantes de conteúdos criados antes do cache; retorna quantos foram renderizados"""
+
+    rendered = 0
+    last_id = 0
+
+    while True:
+        batch = GeneratedContent.query.filter(
+            GeneratedContent.id > last_id
+        ).order_by(GeneratedContent.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        hashes = {
+            content_id: digest
+            for content_id, digest in db.session.query(ContentVariant.content_id, ContentVariant.content_hash).filter(
+                ContentVariant.content_id.in_([content.id for content in batch]),
+                ContentVariant.channel_type == CHANNEL_TYPES[0]
+            )
+        }
+
+        for content in batch:
+            if hashes.get(content.id) != content_hash(*_source(content)):
+                refresh_variants(content)
+                rendered += 1
+
+        db.session.commit()
+        last_id = batch[-1].id
+
+    return rendered
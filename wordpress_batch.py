@@ -0,0 +1,175 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from src.services.http_client import http_client
+from src.services.wordpress_taxonomy import site_key
+
+BATCH_PATH = '/wp-json/batch/v1'
+POSTS_PATH = '/wp/v2/posts'
+DEFAULT_BATCH_SIZE = 25  # limite padrão do WordPress (filtro rest_get_max_batch_size)
+
+# Tamanho máximo de lote por site; None = site sem a API de lote (WordPress < 5.6)
+_batch_sizes: Dict[str, Optional[int]] = {}
+_batch_sizes_lock = threading.Lock()
+
+def post_result(status_code: int, data, text: str = '') -> Dict:
+    """Converte a resposta da criação de um post (avulsa ou de um lote) no resultado da publicação"""
+
+    if status_code == 201 and isinstance(data, dict):
+        return {
+            'success': True,
+            'url': data.get('link'),
+            'post_id': str(data.get('id')),
+            'response_data': data
+        }
+
+    if isinstance(data, dict) and data.get('message'):
+        text = f"{data.get('code')}: {data['message']}"
+
+    return {
+        'success': False,
+        'error': f'Erro na API do WordPress: {status_code} - {text}',
+        'status_code': status_code
+    }
+
+class WordPressBatchClient:
+    """
+    Cria vários posts em um site usando a API de lote (/wp-json/batch/v1)
+
+    Os posts são agrupados em lotes do tamanho aceito pelo servidor; sites
+    sem a API de lote recebem requisições avulsas em paralelo. Os resultados
+    voltam na mesma ordem dos posts enviados. Posts cujo desfecho não se sabe
+    (conexão perdida durante o POST, resposta ausente no lote) voltam com
+    'unknown' e sem nova tentativa: podem já ter sido criados no site.
+    """
+
+    def __init__(self, config: Dict, max_workers: int = 4):
+        """
+        Args:
+            config: api_config do canal (site_url, username, password)
+            max_workers: Requisições avulsas simultâneas no modo sem lote
+        """
+
+        self.site = site_key(config.get('site_url'))
+        self.auth = (config.get('username'), config.get('password'))
+        self.max_workers = max_workers
+        self.mode: Optional[str] = None  # 'batch' ou 'single', conforme o último envio
+
+    def batch_size(self) -> Optional[int]:
+        """Limite de lote anunciado pelo servidor (None se o site não tem a API de lote)"""
+
+        if self.site in _batch_sizes:
+            return _batch_sizes[self.site]
+
+        try:
+            response = http_client.request('OPTIONS', f'{self.site}{BATCH_PATH}', auth=self.auth)
+        except Exception as e:
+            # Sem cache: tenta de novo no próximo envio
+            print(f"Erro ao consultar a API de lote de {self.site}: {e}")
+            return None
+
+        if response.status_code == 404:
+            size = None
+        elif response.status_code == 200:
+            try:
+                endpoint = response.json()['endpoints'][0]
+                size = int(endpoint['args']['requests']['maxItems'])
+            except (ValueError, KeyError, IndexError, TypeError):
+                size = DEFAULT_BATCH_SIZE
+        else:
+            return None
+
+        with _batch_sizes_lock:
+            _batch_sizes[self.site] = size
+        return size
+
+    def create_posts(self, posts: List[Dict]) -> List[Dict]:
+        """
+        Cria os posts e devolve um resultado por post, na mesma ordem
+
+        Args:
+            posts: Corpos de POST /wp/v2/posts
+
+        Returns:
+            Lista de resultados no formato de _publish_to_wordpress
+        """
+
+        size = self.batch_size()
+        if not size:
+            self.mode = 'single'
+            return self._create_individually(posts)
+
+        self.mode = 'batch'
+        results: List[Dict] = []
+        for start in range(0, len(posts), size):
+            chunk = posts[start:start + size]
+            chunk_results = self._post_batch(chunk)
+            if chunk_results is None:
+                # O site recusou a rota de lote: o restante vai em requisições avulsas
+                self.mode = 'single'
+                results.extend(self._create_individually(posts[start:]))
+                break
+            results.extend(chunk_results)
+
+        return results
+
+    def _post_batch(self, posts: List[Dict]) -> Optional[List[Dict]]:
+        """Envia um lote; None se o servidor não tem a API de lote"""
+
+        payload = {
+            # 'normal': cada post é validado e criado de forma independente
+            'validation': 'normal',
+            'requests': [{'method': 'POST', 'path': POSTS_PATH, 'body': post} for post in posts]
+        }
+
+        try:
+            # POST não é repetido pelo cliente HTTP: um lote repetido duplicaria posts
+            response = http_client.post(f'{self.site}{BATCH_PATH}', auth=self.auth, json=payload)
+        except Exception as e:
+            # O servidor pode ter processado o lote antes da falha: repetir duplicaria posts
+            error = {'success': False, 'error': f'Erro ao conectar com WordPress: {str(e)}', 'retryable': False, 'unknown': True}
+            return [dict(error) for _ in posts]
+
+        if response.status_code == 404:
+            with _batch_sizes_lock:
+                _batch_sizes[self.site] = None
+            return None
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+
+        if response.status_code not in (200, 207) or not isinstance(data, dict):
+            # Lote inteiro recusado (autenticação, tamanho, erro do servidor)
+            failure = post_result(response.status_code, data, response.text[:200])
+            return [dict(failure) for _ in posts]
+
+        responses = data.get('responses') or []
+        results = []
+        for index in range(len(posts)):
+            if index >= len(responses):
+                results.append({'success': False, 'error': 'Resposta ausente no lote do WordPress', 'retryable': False, 'unknown': True})
+                continue
+            sub_response = responses[index] or {}
+            results.append(post_result(int(sub_response.get('status') or 0), sub_response.get('body')))
+
+        return results
+
+    def _create_individually(self, posts: List[Dict]) -> List[Dict]:
+        if not posts:
+            return []
+
+        def create(post: Dict) -> Dict:
+            try:
+                response = http_client.post(f'{self.site}/wp-json{POSTS_PATH}', auth=self.auth, json=post)
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = None
+                return post_result(response.status_code, data, response.text[:200])
+            except Exception as e:
+                return {'success': False, 'error': f'Erro ao conectar com WordPress: {str(e)}', 'retryable': False, 'unknown': True}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(posts)), thread_name_prefix='wp-posts') as executor:
+            return list(executor.map(create, posts))
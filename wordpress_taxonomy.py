@@ -0,0 +1,396 @@
+import html
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from src.models.wordpress_term import db, WordPressTerm
+from src.services.http_client import http_client
+
+TAXONOMIES = ('tags', 'categories')
+TERMS_PER_PAGE = 100  # máximo aceito pela API REST do WordPress
+
+def normalize_term(name: str) -> str:
+    # A API devolve nomes com entidades HTML (&amp;); a busca ignora caixa e espaços extras
+    return ' '.join(html.unescape(name or '').split()).lower()
+
+def site_key(site_url: Optional[str]) -> str:
+    return (site_url or '').rstrip('/')
+
+class WordPressTaxonomy:
+    """
+    Cache local de tags e categorias (nome → ID) por site WordPress
+
+    Posts só aceitam IDs de termos. O cache é aquecido com leitura paginada
+    (páginas em paralelo), gravado em wordpress_terms e mantido em memória.
+    Termos desconhecidos disparam uma atualização incremental (só IDs acima
+    do maior conhecido) e, se ainda faltarem, são criados no site com
+    concorrência limitada. Com o cache quente, resolver os termos de um post
+    não faz nenhuma chamada ao site.
+    """
+
+    def __init__(self, fetch_workers: int = 4, create_workers: int = 4,
+                 full_refresh_seconds: float = 86400):
+        """
+        Args:
+            fetch_workers: Páginas lidas em paralelo no aquecimento
+            create_workers: Termos criados em paralelo
+            full_refresh_seconds: Idade máxima da última leitura completa (renomeações/remoções)
+        """
+
+        self.fetch_workers = fetch_workers
+        self.create_workers = create_workers
+        self.full_refresh_seconds = full_refresh_seconds
+        self._terms: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._full_sync_at: Dict[Tuple[str, str], datetime] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'pages_fetched': 0,
+            'full_syncs': 0,
+            'incremental_syncs': 0,
+            'created': 0,
+            'errors': 0,
+            'last_error': None
+        }
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def resolve(self, config: Dict, taxonomy: str, names: List, create: bool = True) -> Dict:
+        """
+        Converte nomes de termos em IDs
+
+        Args:
+            config: api_config do canal (site_url, username, password)
+            taxonomy: 'tags' ou 'categories'
+            names: Nomes dos termos (IDs inteiros são mantidos)
+            create: Cria no site os termos que não existirem
+
+        Returns:
+            Dict com os IDs (na ordem dos nomes, sem repetição) e os nomes não resolvidos
+        """
+
+        if taxonomy not in TAXONOMIES:
+            return {'success': False, 'error': f'Taxonomia não suportada: {taxonomy}', 'ids': []}
+
+        key = (site_key(config.get('site_url')), taxonomy)
+        auth = (config.get('username'), config.get('password'))
+
+        ids = []
+        wanted: Dict[str, str] = {}
+        for name in names or []:
+            if isinstance(name, int):
+                ids.append(name)
+                continue
+            name_key = normalize_term(str(name))
+            if name_key:
+                wanted.setdefault(name_key, str(name).strip())
+
+        if not wanted:
+            return {'success': True, 'ids': list(dict.fromkeys(ids)), 'missing': [], 'created': 0}
+
+        try:
+            terms = self._ensure_loaded(key, auth)
+            missing = [name_key for name_key in wanted if name_key not in terms]
+            created = 0
+
+            with self._lock:
+                self.stats['hits'] += len(wanted) - len(missing)
+                self.stats['misses'] += len(missing)
+
+            if missing:
+                # Um sync/criação por site e taxonomia por vez: evita criar o mesmo termo duas vezes
+                with self._key_lock(key):
+                    missing, created = self._resolve_missing(key, auth, wanted, missing, create)
+                terms = self._terms[key]
+
+            ids.extend(terms[name_key] for name_key in wanted if name_key in terms)
+
+            return {
+                'success': True,
+                'ids': list(dict.fromkeys(ids)),
+                'missing': [wanted[name_key] for name_key in missing],
+                'created': created
+            }
+
+        except Exception as e:
+            self._record_error(e)
+            return {'success': False, 'error': str(e), 'ids': list(dict.fromkeys(ids))}
+
+    def _resolve_missing(self, key: Tuple[str, str], auth: Tuple, wanted: Dict[str, str],
+                         missing: List[str], create: bool) -> Tuple[List[str], int]:
+        def still_missing():
+            terms = self._terms.get(key, {})
+            return [name_key for name_key in missing if name_key not in terms]
+
+        # Outra thread pode ter resolvido enquanto esperávamos o lock
+        missing = still_missing()
+
+        if missing:
+            # Outro processo pode ter sincronizado ou criado o termo
+            stored, _ = self._read_terms(key)
+            self._merge(key, stored)
+            missing = still_missing()
+
+        if missing:
+            self._sync_incremental(key, auth)
+            missing = still_missing()
+
+        created = 0
+        if missing and create:
+            created = self._create_terms(key, auth, [wanted[name_key] for name_key in missing])
+            missing = still_missing()
+
+        return missing, created
+
+    def _ensure_loaded(self, key: Tuple[str, str], auth: Tuple) -> Dict[str, int]:
+        if key in self._terms and not self._is_stale(key):
+            return self._terms[key]
+
+        with self._key_lock(key):
+            if key not in self._terms:
+                stored, full_sync_at = self._read_terms(key)
+                if stored:
+                    with self._lock:
+                        self._terms[key] = stored
+                        self._full_sync_at[key] = full_sync_at
+
+            if key not in self._terms or self._is_stale(key):
+                self._sync_full(key, auth)
+
+        return self._terms[key]
+
+    def _is_stale(self, key: Tuple[str, str]) -> bool:
+        synced_at = self._full_sync_at.get(key)
+        return synced_at is None or datetime.utcnow() - synced_at > timedelta(seconds=self.full_refresh_seconds)
+
+    def refresh(self, config: Dict, full: bool = False) -> Dict:
+        """
+        Atualiza o cache de tags e categorias de um site
+
+        Args:
+            config: api_config do canal
+            full: Relê todos os termos (senão só os criados depois do último sync)
+
+        Returns:
+            Dict com a quantidade de termos em cache por taxonomia
+        """
+
+        site = site_key(config.get('site_url'))
+        auth = (config.get('username'), config.get('password'))
+        result = {'success': True, 'site_url': site, 'terms': {}}
+
+        try:
+            for taxonomy in TAXONOMIES:
+                key = (site, taxonomy)
+                with self._key_lock(key):
+                    if full or key not in self._terms:
+                        self._sync_full(key, auth)
+                    else:
+                        self._sync_incremental(key, auth)
+                result['terms'][taxonomy] = len(self._terms[key])
+        except Exception as e:
+            self._record_error(e)
+            result.update({'success': False, 'error': str(e)})
+
+        return result
+
+    def _fetch_page(self, key: Tuple[str, str], auth: Tuple, page: int, order: str) -> Tuple[List[Dict], int]:
+        site, taxonomy = key
+        response = http_client.get(
+            f'{site}/wp-json/wp/v2/{taxonomy}',
+            params={
+                'per_page': TERMS_PER_PAGE,
+                'page': page,
+                'orderby': 'id',
+                'order': order,
+                '_fields': 'id,name,slug'
+            },
+            auth=auth if all(auth) else None
+        )
+
+        if response.status_code == 400 and page > 1:
+            # Página além do fim (termos removidos durante a leitura)
+            return [], page - 1
+
+        if response.status_code != 200:
+            raise RuntimeError(f'Erro na API do WordPress ({taxonomy}): {response.status_code} - {response.text[:200]}')
+
+        with self._lock:
+            self.stats['pages_fetched'] += 1
+
+        return response.json(), int(response.headers.get('X-WP-TotalPages') or 1)
+
+    def _sync_full(self, key: Tuple[str, str], auth: Tuple):
+        """Lê todos os termos (primeira página define o total; as demais em paralelo)"""
+
+        items, total_pages = self._fetch_page(key, auth, 1, 'asc')
+
+        if total_pages > 1:
+            with ThreadPoolExecutor(max_workers=min(self.fetch_workers, total_pages - 1),
+                                    thread_name_prefix='wp-terms') as executor:
+                pages = executor.map(lambda page: self._fetch_page(key, auth, page, 'asc')[0],
+                                     range(2, total_pages + 1))
+                for page_items in pages:
+                    items.extend(page_items)
+
+        now = datetime.utcnow()
+        self._write_terms(key, items, now, replace=True)
+
+        terms: Dict[str, int] = {}
+        for item in sorted(items, key=lambda item: item['id']):
+            # Categorias homônimas (pais diferentes): fica a mais antiga
+            terms.setdefault(normalize_term(item.get('name')), item['id'])
+
+        with self._lock:
+            self._terms[key] = terms
+            self._full_sync_at[key] = now
+            self.stats['full_syncs'] += 1
+
+    def _sync_incremental(self, key: Tuple[str, str], auth: Tuple):
+        """Busca só os termos com ID acima do maior conhecido (mais novos primeiro)"""
+
+        known_max = max(self._terms.get(key, {}).values(), default=0)
+        new_items = []
+        page = 1
+
+        while True:
+            items, total_pages = self._fetch_page(key, auth, page, 'desc')
+            fresh = [item for item in items if item['id'] > known_max]
+            new_items.extend(fresh)
+            if len(fresh) < len(items) or page >= total_pages:
+                break
+            page += 1
+
+        if new_items:
+            self._write_terms(key, new_items, datetime.utcnow())
+            self._merge(key, {normalize_term(item.get('name')): item['id'] for item in new_items})
+
+        with self._lock:
+            self.stats['incremental_syncs'] += 1
+
+    def _create_terms(self, key: Tuple[str, str], auth: Tuple, names: List[str]) -> int:
+        """Cria os termos no site em paralelo; retorna quantos foram criados"""
+
+        site, taxonomy = key
+
+        def create(name: str) -> Optional[Dict]:
+            try:
+                response = http_client.post(f'{site}/wp-json/wp/v2/{taxonomy}', auth=auth, json={'name': name})
+
+                if response.status_code == 201:
+                    data = response.json()
+                    return {'id': data['id'], 'name': data.get('name') or name, 'slug': data.get('slug'), 'created': True}
+
+                data = response.json() if response.content else {}
+                if isinstance(data, dict) and data.get('code') == 'term_exists':
+                    # Criado por outro cliente depois do último sync
+                    return {'id': int(data.get('data', {}).get('term_id')), 'name': name, 'slug': None, 'created': False}
+
+                print(f"Erro ao criar termo '{name}' em {site} ({taxonomy}): {response.status_code} - {response.text[:200]}")
+            except Exception as e:
+                print(f"Erro ao criar termo '{name}' em {site} ({taxonomy}): {e}")
+            return None
+
+        with ThreadPoolExecutor(max_workers=min(self.create_workers, len(names)),
+                                thread_name_prefix='wp-terms') as executor:
+            items = [item for item in executor.map(create, names) if item]
+
+        if items:
+            self._write_terms(key, items, datetime.utcnow())
+            self._merge(key, {normalize_term(item['name']): item['id'] for item in items})
+
+        created = sum(1 for item in items if item['created'])
+        with self._lock:
+            self.stats['created'] += created
+        return created
+
+    def _merge(self, key: Tuple[str, str], terms: Dict[str, int]):
+        with self._lock:
+            cached = self._terms.setdefault(key, {})
+            for name_key, term_id in terms.items():
+                cached.setdefault(name_key, term_id)
+
+    @staticmethod
+    def _read_terms(key: Tuple[str, str]) -> Tuple[Dict[str, int], Optional[datetime]]:
+        """Termos gravados do site; a data mais antiga é a da última leitura completa"""
+
+        site, taxonomy = key
+        table = WordPressTerm.__table__
+
+        try:
+            with db.engine.connect() as connection:
+                rows = connection.execute(
+                    table.select().with_only_columns(table.c.name_key, table.c.term_id, table.c.synced_at).where(
+                        table.c.site_url == site, table.c.taxonomy == taxonomy
+                    ).order_by(table.c.term_id)
+                ).fetchall()
+        except Exception as e:
+            print(f"Erro ao ler termos de {site} ({taxonomy}): {e}")
+            return {}, None
+
+        terms: Dict[str, int] = {}
+        for name_key, term_id, _ in rows:
+            terms.setdefault(name_key, term_id)
+
+        return terms, min((row[2] for row in rows if row[2]), default=None)
+
+    @staticmethod
+    def _write_terms(key: Tuple[str, str], items: List[Dict], synced_at: datetime, replace: bool = False):
+        """Grava os termos em conexão própria (não interfere na sessão de quem publica)"""
+
+        site, taxonomy = key
+        table = WordPressTerm.__table__
+        scope = (table.c.site_url == site) & (table.c.taxonomy == taxonomy)
+        term_ids = [item['id'] for item in items]
+
+        try:
+            with db.engine.begin() as connection:
+                if replace:
+                    connection.execute(table.delete().where(scope))
+                elif term_ids:
+                    connection.execute(table.delete().where(scope & table.c.term_id.in_(term_ids)))
+
+                if items:
+                    connection.execute(table.insert(), [
+                        {
+                            'site_url': site,
+                            'taxonomy': taxonomy,
+                            'term_id': item['id'],
+                            'name': html.unescape(item.get('name') or '')[:200],
+                            'name_key': normalize_term(item.get('name'))[:200],
+                            'slug': item.get('slug'),
+                            'synced_at': synced_at
+                        }
+                        for item in items
+                    ])
+        except Exception as e:
+            # O cache em memória continua válido; o próximo processo relê do site
+            print(f"Erro ao gravar termos de {site} ({taxonomy}): {e}")
+
+    def _record_error(self, error: Exception):
+        with self._lock:
+            self.stats['errors'] += 1
+            self.stats['last_error'] = str(error)
+        print(f"Erro ao resolver termos do WordPress: {error}")
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            sites: Dict[str, Dict] = {}
+            for (site, taxonomy), terms in self._terms.items():
+                synced_at = self._full_sync_at.get((site, taxonomy))
+                sites.setdefault(site, {})[taxonomy] = {
+                    'terms': len(terms),
+                    'full_sync_at': synced_at.isoformat() if synced_at else None
+                }
+            return dict(self.stats, sites=sites)
+
+wordpress_taxonomy = WordPressTaxonomy(
+    fetch_workers=int(os.environ.get('WORDPRESS_TERM_FETCH_WORKERS', 4)),
+    create_workers=int(os.environ.get('WORDPRESS_TERM_CREATE_WORKERS', 4)),
+    full_refresh_seconds=float(os.environ.get('WORDPRESS_TERMS_REFRESH_SECONDS', 86400))
+)
@@ -0,0 +1,29 @@
+from src.models.user import db
+from datetime import datetime
+
+class WordPressTerm(db.Model):
+    __tablename__ = 'wordpress_terms'
+    __table_args__ = (
+        db.UniqueConstraint('site_url', 'taxonomy', 'term_id', name='uq_wordpress_terms_site_term'),
+        db.Index('ix_wordpress_terms_lookup', 'site_url', 'taxonomy', 'name_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    site_url = db.Column(db.String(255), nullable=False)
+    taxonomy = db.Column(db.String(20), nullable=False)  # 'tags', 'categories'
+    term_id = db.Column(db.Integer, nullable=False)  # ID do termo no WordPress
+    name = db.Column(db.String(200), nullable=False)
+    name_key = db.Column(db.String(200), nullable=False)  # nome normalizado usado na busca
+    slug = db.Column(db.String(200))
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'site_url': self.site_url,
+            'taxonomy': self.taxonomy,
+            'term_id': self.term_id,
+            'name': self.name,
+            'slug': self.slug,
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None
+        }